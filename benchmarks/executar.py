@@ -0,0 +1,230 @@
+"""
+Benchmark do pipeline de avaliação: gera uma turma sintética, sobe um servidor
+de modelo simulado e executa o mesmo caminho do /avaliar (ingestão em memória
++ avaliar_espaco) nos modos por palavras-chave e por IA.
+
+O resultado (percentis por etapa, alunos por segundo e pico de memória) é
+impresso em JSON, ou gravado com --saida, para comparar execuções.
+
+Uso:
+    python -m benchmarks.executar --alunos 40 --lixo-mb 1 --latencia 0.2 --saida bench_output.txt
+"""
+import os
+import io
+import sys
+import json
+import time
+import asyncio
+import argparse
+import resource
+import tempfile
+import threading
+import tracemalloc
+import contextlib
+from types import SimpleNamespace
+
+from benchmarks.gerar_turma import gerar_turma
+
+ENUNCIADO = (
+    "Crie um programa em C# que gerencie a fila de clientes de um banco. "
+    "O programa deve exibir um menu, adicionar clientes na fila, remover o próximo "
+    "cliente atendido e exibir a lista de clientes aguardando."
+)
+
+class Cronometro:
+    """Acumula a duração de cada chamada, por etapa, de forma thread-safe."""
+
+    def __init__(self):
+        self.duracoes = {}
+        self._lock = threading.Lock()
+
+    def registrar(self, etapa, segundos):
+        with self._lock:
+            self.duracoes.setdefault(etapa, []).append(segundos)
+
+    def medir(self, etapa, func):
+        """Retorna func envolvida por uma medição de tempo na etapa indicada."""
+        def medida(*args, **kwargs):
+            inicio = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.registrar(etapa, time.perf_counter() - inicio)
+        return medida
+
+    def resumo(self) -> dict:
+        return {etapa: resumir(valores) for etapa, valores in sorted(self.duracoes.items())}
+
+def percentil(ordenados, p):
+    """Percentil pelo método do posto mais próximo (lista já ordenada)."""
+    indice = max(0, min(len(ordenados) - 1, int(round(p / 100 * len(ordenados) + 0.5)) - 1))
+    return ordenados[indice]
+
+def resumir(valores) -> dict:
+    ordenados = sorted(valores)
+    return {
+        "chamadas": len(ordenados),
+        "total_s": round(sum(ordenados), 6),
+        "p50_ms": round(percentil(ordenados, 50) * 1000, 3),
+        "p90_ms": round(percentil(ordenados, 90) * 1000, 3),
+        "p99_ms": round(percentil(ordenados, 99) * 1000, 3),
+        "max_ms": round(ordenados[-1] * 1000, 3),
+    }
+
+def _configurar_ambiente(args, diretorio):
+    """
+    Isola o benchmark dos bancos e limites reais. Precisa acontecer antes de
+    importar os módulos de corretor, que leem a configuração na importação.
+    """
+    os.environ["CORRETOR_CACHE"] = os.path.join(diretorio, "cache_avaliacoes.db")
+    os.environ["CORRETOR_CRITERIOS"] = os.path.join(diretorio, "criterios.db")
+    os.environ["CORRETOR_TAREFAS"] = os.path.join(diretorio, "tarefas.db")
+    # Cota diária nova a cada execução (a persistente se esgotaria entre repetições)
+    os.environ["CORRETOR_COTA"] = os.path.join(diretorio, "cota.db")
+    os.environ["CORRETOR_PROVEDOR"] = "benchmark"
+    os.environ["CORRETOR_LIMITE_MINUTO"] = str(args.limite_minuto)
+    os.environ["CORRETOR_LIMITE_DIA"] = str(args.limite_dia)
+
+async def _executar_uma_vez(arquivos, enunciado, usar_ia_direta, concorrencia, cronometro):
+    """Executa uma avaliação completa, como o /avaliar, e retorna o número de alunos."""
+    from corretor.espaco_trabalho import EspacoTrabalho
+    from corretor.ingestao import extrair_codigos
+    from corretor.pipeline import avaliar_espaco
+
+    extrair = cronometro.medir("extracao", extrair_codigos)
+    with EspacoTrabalho() as espaco:
+        for caminho in arquivos:
+            with open(caminho, "rb") as f:
+                aluno_pasta = os.path.splitext(os.path.basename(caminho))[0]
+                espaco.adicionar_entrega(aluno_pasta, extrair(f, caminho))
+
+        inicio = time.perf_counter()
+        await avaliar_espaco(espaco, enunciado, usar_ia_direta, concorrencia)
+        cronometro.registrar("avaliacao", time.perf_counter() - inicio)
+        return len(espaco.entregas)
+
+def executar_modo(args, arquivos, usar_ia_direta, servidor) -> dict:
+    """Executa as repetições de um modo e retorna as métricas agregadas."""
+    from corretor import avaliador, pipeline, modelo_ia
+
+    cronometro = Cronometro()
+    originais = {
+        (avaliador, "normalizar_texto"): avaliador.normalizar_texto,
+        (avaliador, "extrair_keywords"): avaliador.extrair_keywords,
+        (pipeline, "preparar_codigo"): pipeline.preparar_codigo,
+    }
+    avaliador.normalizar_texto = cronometro.medir("normalizar_texto", avaliador.normalizar_texto)
+    avaliador.extrair_keywords = cronometro.medir("extrair_keywords", avaliador.extrair_keywords)
+    pipeline.preparar_codigo = cronometro.medir("preparar_codigo", pipeline.preparar_codigo)
+
+    limitador = modelo_ia.limitador
+    adquirir_original = limitador.adquirir
+    limitador.adquirir = cronometro.medir("espera_cota", adquirir_original)
+    _registrar_cliente(servidor.url, cronometro)
+
+    chamadas_antes, recusadas_antes = servidor.chamadas, servidor.recusadas
+    execucoes = []
+    saida = io.StringIO() if not args.verboso else sys.stdout
+    try:
+        if args.tracemalloc:
+            tracemalloc.start()
+        for i in range(args.repeticoes):
+            # Enunciado diferente a cada repetição: critérios e cache de avaliações nunca acertam
+            enunciado = f"{ENUNCIADO} (benchmark {time.time_ns()}-{i})"
+            inicio = time.perf_counter()
+            with contextlib.redirect_stdout(saida):
+                alunos = asyncio.run(_executar_uma_vez(arquivos, enunciado, usar_ia_direta, args.concorrencia, cronometro))
+            segundos = time.perf_counter() - inicio
+            cronometro.registrar("total", segundos)
+            execucoes.append({"segundos": round(segundos, 6), "alunos_por_segundo": round(alunos / segundos, 3)})
+            if saida is not sys.stdout:
+                saida.seek(0)
+                saida.truncate()
+        pico_tracemalloc = tracemalloc.get_traced_memory()[1] if args.tracemalloc else None
+    finally:
+        if args.tracemalloc:
+            tracemalloc.stop()
+        for (modulo, nome), funcao in originais.items():
+            setattr(modulo, nome, funcao)
+        limitador.adquirir = adquirir_original
+
+    vazoes = sorted(e["alunos_por_segundo"] for e in execucoes)
+    resultado = {
+        "execucoes": execucoes,
+        "alunos_por_segundo_p50": percentil(vazoes, 50),
+        "etapas": cronometro.resumo(),
+        "modelo": {
+            "chamadas": servidor.chamadas - chamadas_antes,
+            "rate_limits": servidor.recusadas - recusadas_antes,
+        },
+    }
+    if pico_tracemalloc is not None:
+        resultado["pico_memoria_python_mb"] = round(pico_tracemalloc / (1024 * 1024), 3)
+    return resultado
+
+def _registrar_cliente(url, cronometro):
+    """Registra o provedor "benchmark": cliente openai real apontando para o servidor simulado."""
+    from openai import OpenAI
+    from corretor.provedores import registrar_provedor
+
+    def criar():
+        cliente = OpenAI(base_url=url, api_key="benchmark", max_retries=0)
+        create = cronometro.medir("chamada_modelo", cliente.chat.completions.create)
+        return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+
+    registrar_provedor("benchmark", criar)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do pipeline de avaliação")
+    parser.add_argument("--alunos", type=int, default=40)
+    parser.add_argument("--arquivos", type=int, default=3, help="Arquivos .cs por aluno")
+    parser.add_argument("--tamanho-kb", type=float, default=4, help="Tamanho de cada arquivo .cs")
+    parser.add_argument("--lixo-mb", type=float, default=0, help="bin/obj/.vs/imagens por aluno")
+    parser.add_argument("--formato", choices=["zip", "rar"], default="zip")
+    parser.add_argument("--modos", default="palavras,ia", help="Modos separados por vírgula: palavras, ia")
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--concorrencia", type=int, default=None)
+    parser.add_argument("--latencia", type=float, default=0.2, help="Latência do modelo simulado (segundos)")
+    parser.add_argument("--taxa-rate-limit", type=float, default=0.0, help="Fração de respostas 429 (0 a 1)")
+    parser.add_argument("--espera-rate-limit", type=int, default=1, help="Segundos sugeridos no 429")
+    parser.add_argument("--limite-minuto", type=int, default=100000)
+    parser.add_argument("--limite-dia", type=int, default=1000000)
+    parser.add_argument("--tracemalloc", action="store_true", help="Mede o pico de memória Python (mais lento)")
+    parser.add_argument("--verboso", action="store_true", help="Mostra as mensagens do pipeline")
+    parser.add_argument("--saida", help="Arquivo para gravar o JSON (padrão: saída padrão)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="corretor_bench_") as diretorio:
+        _configurar_ambiente(args, diretorio)
+        from benchmarks.servidor_modelo import ServidorModelo
+
+        inicio = time.perf_counter()
+        arquivos = gerar_turma(os.path.join(diretorio, "turma"), args.alunos, args.arquivos,
+                               args.tamanho_kb, args.lixo_mb, args.formato)
+        geracao = time.perf_counter() - inicio
+
+        modos = {}
+        with ServidorModelo(args.latencia, args.taxa_rate_limit, args.espera_rate_limit) as servidor:
+            for modo in args.modos.split(","):
+                modo = modo.strip()
+                if modo not in ("palavras", "ia"):
+                    raise SystemExit(f"Modo desconhecido: {modo}")
+                modos[modo] = executar_modo(args, arquivos, modo == "ia", servidor)
+
+    relatorio = {
+        "parametros": {k: v for k, v in vars(args).items() if k not in ("saida", "verboso")},
+        "geracao_turma_s": round(geracao, 3),
+        "modos": modos,
+        # ru_maxrss é informado em KB no Linux
+        "pico_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 3),
+    }
+    texto = json.dumps(relatorio, ensure_ascii=False, indent=2)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            f.write(texto + "\n")
+        print(f"Resultado gravado em {args.saida}")
+    else:
+        print(texto)
+
+if __name__ == "__main__":
+    main()
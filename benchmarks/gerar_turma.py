@@ -0,0 +1,128 @@
+"""
+Gerador de turmas sintéticas: cria um ZIP (ou RAR) por aluno com código C#
+de iniciante e, opcionalmente, pastas de "lixo" (bin/, obj/, .vs/, imagens)
+como as que os alunos costumam enviar junto com o projeto.
+
+Uso:
+    python -m benchmarks.gerar_turma destino --alunos 40 --arquivos 3 --tamanho-kb 4 --lixo-mb 2
+"""
+import os
+import shutil
+import random
+import zipfile
+import argparse
+import tempfile
+import subprocess
+
+TRECHOS = [
+    'Console.Write("Digite seu nome: ");\n            string nome = Console.ReadLine();\n',
+    'Console.WriteLine($"Olá, {nome}!");\n',
+    'int idade = int.Parse(Console.ReadLine());\n',
+    'for (int i = 0; i < {n}; i++)\n            {{\n                soma += i;\n            }}\n',
+    'while (opcao != 0)\n            {{\n                opcao = LerOpcao();\n            }}\n',
+    'List<string> fila = new List<string>();\n            fila.Add("cliente {n}");\n',
+    'if (valor > {n})\n            {{\n                Console.WriteLine("Maior");\n            }}\n            else\n            {{\n                Console.WriteLine("Menor");\n            }}\n',
+    '// Exibir o menu de opções para o usuário\n            Console.WriteLine("1 - Adicionar cliente");\n',
+    'double media = (nota1 + nota2) / 2;\n            Console.WriteLine("Média: " + media);\n',
+    'string[] nomes = new string[{n}];\n            nomes[0] = "Maria";\n',
+]
+
+def gerar_codigo(rng: random.Random, tamanho_kb: float, indice: int) -> str:
+    """Gera um arquivo C# sintético com aproximadamente tamanho_kb kilobytes."""
+    corpo = []
+    alvo = int(tamanho_kb * 1024)
+    total = 0
+    while total < alvo:
+        trecho = rng.choice(TRECHOS).replace("{n}", str(rng.randint(1, 100)))
+        corpo.append("            " + trecho)
+        total += len(trecho) + 12
+    return (
+        "using System;\nusing System.Collections.Generic;\n\n"
+        f"namespace Exercicio\n{{\n    class Programa{indice}\n    {{\n"
+        "        static void Main(string[] args)\n        {\n"
+        "            int soma = 0, opcao = 1, valor = 0;\n"
+        + "".join(corpo) +
+        "        }\n    }\n}\n"
+    )
+
+def _arquivos_lixo(rng: random.Random, lixo_mb: float):
+    """Gera (caminho, conteúdo) de arquivos que não são código: binários, cache da IDE, imagens."""
+    if lixo_mb <= 0:
+        return
+    caminhos = [
+        "Projeto/bin/Debug/net8.0/Projeto.dll",
+        "Projeto/obj/Debug/net8.0/Projeto.AssemblyInfo.cs",
+        "Projeto/obj/project.assets.json",
+        "Projeto/.vs/Projeto/v17/.suo",
+        "Projeto/packages/Newtonsoft.Json/lib/Newtonsoft.Json.dll",
+        "Projeto/imagens/captura.png",
+    ]
+    por_arquivo = int(lixo_mb * 1024 * 1024 / len(caminhos))
+    for caminho in caminhos:
+        yield caminho, rng.randbytes(por_arquivo)
+
+def gerar_turma(destino: str, alunos: int = 40, arquivos: int = 3, tamanho_kb: float = 4,
+                lixo_mb: float = 0, formato: str = "zip", semente: int = 42) -> list:
+    """
+    Gera os arquivos compactados de uma turma sintética.
+
+    Args:
+        destino: Diretório onde os arquivos serão criados
+        alunos: Número de alunos (um arquivo compactado por aluno)
+        arquivos: Número de arquivos .cs por aluno
+        tamanho_kb: Tamanho aproximado de cada arquivo .cs
+        lixo_mb: Tamanho total das pastas de lixo por aluno (0 para nenhuma)
+        formato: "zip" ou "rar" (RAR exige o executável `rar` instalado)
+        semente: Semente do gerador aleatório, para turmas reproduzíveis
+
+    Returns:
+        Lista com o caminho de cada arquivo gerado
+    """
+    if formato == "rar" and shutil.which("rar") is None:
+        raise Exception("Executável 'rar' não encontrado: não é possível gerar arquivos RAR")
+
+    rng = random.Random(semente)
+    os.makedirs(destino, exist_ok=True)
+    gerados = []
+
+    for i in range(alunos):
+        membros = [
+            (f"Projeto/{'Program' if j == 0 else f'Classe{j}'}.cs", gerar_codigo(rng, tamanho_kb, j).encode("utf-8"))
+            for j in range(arquivos)
+        ]
+        membros.extend(_arquivos_lixo(rng, lixo_mb))
+        nome = os.path.join(destino, f"aluno_{i:04d}.{formato}")
+
+        if formato == "zip":
+            with zipfile.ZipFile(nome, "w", zipfile.ZIP_DEFLATED) as zip_ref:
+                for caminho, conteudo in membros:
+                    zip_ref.writestr(caminho, conteudo)
+        else:
+            with tempfile.TemporaryDirectory() as tmp:
+                for caminho, conteudo in membros:
+                    completo = os.path.join(tmp, caminho)
+                    os.makedirs(os.path.dirname(completo), exist_ok=True)
+                    with open(completo, "wb") as f:
+                        f.write(conteudo)
+                subprocess.run(["rar", "a", "-r", "-idq", os.path.abspath(nome), "Projeto"], cwd=tmp, check=True)
+        gerados.append(nome)
+
+    return gerados
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera uma turma sintética de entregas em C#")
+    parser.add_argument("destino")
+    parser.add_argument("--alunos", type=int, default=40)
+    parser.add_argument("--arquivos", type=int, default=3)
+    parser.add_argument("--tamanho-kb", type=float, default=4)
+    parser.add_argument("--lixo-mb", type=float, default=0)
+    parser.add_argument("--formato", choices=["zip", "rar"], default="zip")
+    parser.add_argument("--semente", type=int, default=42)
+    args = parser.parse_args()
+
+    gerados = gerar_turma(args.destino, args.alunos, args.arquivos, args.tamanho_kb,
+                          args.lixo_mb, args.formato, args.semente)
+    print(f"{len(gerados)} arquivo(s) gerado(s) em {args.destino}")
+
+if __name__ == "__main__":
+    main()
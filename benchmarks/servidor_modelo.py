@@ -0,0 +1,107 @@
+"""
+Servidor de modelo simulado para benchmarks: responde a POST /chat/completions
+no formato da API da OpenAI, com latência configurável e uma fração das
+requisições recusadas com rate limit (HTTP 429), como faz o GitHub Models.
+"""
+import json
+import time
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from corretor.provedores import ClienteLocal
+
+class ServidorModelo:
+    """
+    Servidor HTTP local que imita o endpoint de chat do modelo.
+
+    Args:
+        latencia: Tempo de resposta de cada chamada (segundos)
+        taxa_rate_limit: Fração das chamadas respondidas com rate limit (0 a 1)
+        espera: Segundos sugeridos na mensagem de rate limit
+        semente: Semente do sorteio dos rate limits
+    """
+
+    def __init__(self, latencia=0.2, taxa_rate_limit=0.0, espera=1, semente=42):
+        self.latencia = latencia
+        self.taxa_rate_limit = taxa_rate_limit
+        self.espera = espera
+        self.chamadas = 0
+        self.recusadas = 0
+        self._rng = random.Random(semente)
+        self._lock = threading.Lock()
+        self._respostas = ClienteLocal()
+        self._servidor = ThreadingHTTPServer(("127.0.0.1", 0), self._criar_handler())
+        self._servidor.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        """URL base para usar como base_url do cliente openai."""
+        host, porta = self._servidor.server_address[:2]
+        return f"http://{host}:{porta}"
+
+    def _sortear_rate_limit(self) -> bool:
+        with self._lock:
+            self.chamadas += 1
+            recusar = self._rng.random() < self.taxa_rate_limit
+            if recusar:
+                self.recusadas += 1
+            return recusar
+
+    def _criar_handler(self):
+        servidor = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                corpo = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                time.sleep(servidor.latencia)
+
+                if servidor._sortear_rate_limit():
+                    self._enviar(429, {"error": {
+                        "code": "RateLimitReached",
+                        "message": f"Rate limit of 10 per 60s exceeded. Please wait {servidor.espera} seconds before retrying."
+                    }})
+                    return
+
+                resposta = servidor._respostas._responder(corpo["messages"][-1]["content"])
+                self._enviar(200, {
+                    "id": "bench",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": corpo.get("model", ""),
+                    "choices": [{
+                        "index": 0,
+                        "finish_reason": "stop",
+                        "message": {"role": "assistant", "content": resposta}
+                    }]
+                })
+
+            def _enviar(self, status, dados):
+                conteudo = json.dumps(dados, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(conteudo)))
+                self.end_headers()
+                self.wfile.write(conteudo)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def iniciar(self):
+        self._thread = threading.Thread(target=self._servidor.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def parar(self):
+        self._servidor.shutdown()
+        self._servidor.server_close()
+
+    def __enter__(self):
+        return self.iniciar()
+
+    def __exit__(self, *exc):
+        self.parar()
+        return False
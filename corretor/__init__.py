@@ -0,0 +1,4 @@
+from dotenv import load_dotenv
+
+# Carregar variáveis de ambiente antes que os módulos do pacote leiam suas configurações
+load_dotenv()
@@ -0,0 +1,3 @@
+from corretor.cli import main
+
+main()
@@ -0,0 +1,54 @@
+import os
+import sys
+import asyncio
+import functools
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+# Número padrão de avaliações executadas ao mesmo tempo (configurável via .env)
+CONCORRENCIA_PADRAO = int(os.getenv("CORRETOR_CONCORRENCIA", "4"))
+
+async def executar_concorrente(func, itens, max_concorrencia=None):
+    """
+    Executa func(item) para cada item em um pool de threads limitado,
+    sem bloquear o loop de eventos.
+
+    Args:
+        func: Função bloqueante que recebe um item e retorna seu resultado
+        itens: Lista de itens a processar
+        max_concorrencia: Número máximo de execuções simultâneas (padrão: CONCORRENCIA_PADRAO)
+
+    Returns:
+        Lista de resultados na mesma ordem dos itens recebidos
+    """
+    itens = list(itens)
+    if not itens:
+        return []
+
+    limite = max(1, min(max_concorrencia or CONCORRENCIA_PADRAO, len(itens)))
+    loop = asyncio.get_running_loop()
+
+    executor = ThreadPoolExecutor(max_workers=limite, thread_name_prefix="corretor")
+    tarefas = []
+    try:
+        # Cada item roda com uma cópia do contexto atual (ex: o resumo de tempos da execução)
+        tarefas = [
+            loop.run_in_executor(executor, contextvars.copy_context().run, func, item)
+            for item in itens
+        ]
+        # gather preserva a ordem de entrada, independente da ordem de término
+        return await asyncio.gather(*tarefas)
+    finally:
+        # Não espera as threads: se a requisição for cancelada, o loop de eventos segue livre e os
+        # itens que ainda não começaram são descartados (os em andamento terminam em segundo plano)
+        for tarefa in tarefas:
+            tarefa.cancel()
+        if sys.version_info >= (3, 9):
+            executor.shutdown(wait=False, cancel_futures=True)
+        else:
+            executor.shutdown(wait=False)
+
+async def executar_em_thread(func, *args):
+    """Executa uma função bloqueante no pool de threads padrão, sem bloquear o loop de eventos."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, functools.partial(contextvars.copy_context().run, func, *args))
@@ -1,6 +1,20 @@
 import os
 import re
+import hashlib
+import logging
 import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+
+from corretor.metricas import log, CACHE_ARQUIVOS
+from corretor.cache_arquivos import obter_cache_arquivos
+from corretor.ingestao import PASTAS_IGNORADAS
+from corretor.preparacao import caminho_gerado, conteudo_gerado
+
+# Número padrão de processos para a avaliação por palavras-chave (0 = processo atual)
+PROCESSOS_PADRAO = int(os.getenv("CORRETOR_PROCESSOS", "0"))
+
+# Acima deste número de palavras-chave distintas, o casador usa uma única expressão regular
+LIMITE_BUSCA_DIRETA = 200
 
 def normalizar_texto(txt):
     txt = txt.lower()
@@ -43,49 +57,244 @@ def extrair_keywords(criterio):
 def is_criterio_valido(linha):
     return linha.strip().startswith("[ ]") and len(linha.split()) >= 4
 
-def avaliar_entregas(pasta_entregas, criterios_texto):
-    resultados = {}
-
-    criterios_linha = [
+def filtrar_criterios(criterios_texto):
+    return [
         c.strip("-• \n")
         for c in criterios_texto.split("\n")
         if is_criterio_valido(c)
     ]
 
-    print("Critérios filtrados:")
-    for c in criterios_linha:
-        print("-", c)
+def _regex_trie(palavras):
+    """Monta uma expressão regular em forma de árvore de prefixos (ex: nome, nomes -> nome(?:s)?)."""
+    trie = {}
+    for palavra in palavras:
+        no = trie
+        for letra in palavra:
+            no = no.setdefault(letra, {})
+        no[""] = {}
+
+    def montar(no):
+        fim = "" in no
+        ramos = [re.escape(letra) + montar(filho) for letra, filho in sorted(no.items()) if letra]
+        if not ramos:
+            return ""
+        corpo = ramos[0] if len(ramos) == 1 else "(?:" + "|".join(ramos) + ")"
+        # Quantificador guloso: prefere a palavra mais longa e recua para a mais curta
+        if fim:
+            return "(?:" + corpo + ")?" if len(ramos) == 1 else corpo + "?"
+        return corpo
+
+    return montar(trie)
+
+class CasadorPalavras:
+    """
+    Casador de palavras-chave pré-compilado para um checklist.
+
+    Cada arquivo é normalizado uma única vez e só as palavras ainda não
+    encontradas são procuradas nele. Com até LIMITE_BUSCA_DIRETA palavras,
+    a busca direta por substring (feita em C) é mais rápida; acima disso,
+    todas as palavras viram uma única expressão regular (árvore de prefixos)
+    e o arquivo é percorrido uma única vez. O resultado é idêntico a testar
+    `palavra in texto` para cada palavra.
+
+    Args:
+        criterios_keywords: Dicionário critério -> lista de palavras-chave
+    """
 
-    criterios_keywords = {c: extrair_keywords(c) for c in criterios_linha}
+    def __init__(self, criterios_keywords):
+        self.criterios_keywords = criterios_keywords
+        palavras = sorted({p for lista in criterios_keywords.values() for p in lista})
+        self._palavras = palavras
+        # Identifica o conjunto de palavras nos caches (checklists diferentes com as mesmas palavras coincidem)
+        self.assinatura = hashlib.sha256("\n".join(palavras).encode("utf-8")).hexdigest()
+        self._padrao = None
+        if len(palavras) > LIMITE_BUSCA_DIRETA:
+            # Lookahead para testar todas as posições, inclusive palavras sobrepostas
+            self._padrao = re.compile("(?=(" + _regex_trie(palavras) + "))")
+            # Em cada posição só a palavra mais longa é reportada; as contidas nela também estão presentes
+            self._contidas = {p: [q for q in palavras if q in p] for p in palavras}
 
-    for aluno_pasta in os.listdir(pasta_entregas):
-        aluno_path = os.path.join(pasta_entregas, aluno_pasta)
-        if not os.path.isdir(aluno_path):
-            continue
+    @classmethod
+    def de_checklist(cls, criterios_texto):
+        """Cria o casador a partir do texto do checklist."""
+        return cls({c: extrair_keywords(c) for c in filtrar_criterios(criterios_texto)})
 
-        resultado_aluno = {"criterios": {}}
-        conteudo_total = ""
+    def encontrar(self, conteudos):
+        """
+        Retorna o conjunto de palavras-chave presentes em algum dos conteúdos.
 
-        for root, _, files in os.walk(aluno_path):
-            for file in files:
-                if file.endswith(".cs"):
-                    with open(os.path.join(root, file), encoding="utf-8", errors="ignore") as f:
-                        conteudo_total += f.read().lower() + "\n"
+        Args:
+            conteudos: Iterável com o conteúdo de cada arquivo (lido sob demanda)
+        """
+        encontradas = set()
 
-        texto_codigo = normalizar_texto(conteudo_total)
+        for conteudo in conteudos:
+            if len(encontradas) == len(self._palavras):
+                break
+            # A normalização nunca remove quebras de linha, então cada arquivo pode ser tratado isoladamente
+            texto = normalizar_texto(conteudo)
+            if self._padrao is None:
+                encontradas.update(p for p in self._palavras if p not in encontradas and p in texto)
+            else:
+                for palavra in set(self._padrao.findall(texto)):
+                    encontradas.update(self._contidas[palavra])
+        return encontradas
 
-        for crit, palavras in criterios_keywords.items():
+    def avaliar(self, encontradas):
+        """
+        Aplica a regra dos critérios ao conjunto de palavras encontradas.
+
+        Returns:
+            Dicionário critério -> "OK" ou "FALHA"
+        """
+        resultado = {}
+        # Verificado uma vez: com o log de depuração desligado, as falhas não geram nenhuma mensagem
+        depurar = log.isEnabledFor(logging.DEBUG)
+        for crit, palavras in self.criterios_keywords.items():
             # Um critério é atendido se pelo menos 40% das palavras-chave estão no código
             # e pelo menos uma palavra está presente
-            achou = sum(1 for p in palavras if p in texto_codigo) >= max(1, len(palavras) * 0.4)
-            resultado_aluno["criterios"][crit] = "OK" if achou else "FALHA"
+            achou = sum(1 for p in palavras if p in encontradas) >= max(1, len(palavras) * 0.4)
+            resultado[crit] = "OK" if achou else "FALHA"
+
+            if depurar and not achou:
+                log.debug(
+                    "FALHA em: %s | Palavras-chave: %s | Não encontradas: %s",
+                    crit, palavras, [p for p in palavras if p not in encontradas]
+                )
+        return resultado
+
+def listar_arquivos_cs(aluno_path):
+    """
+    Retorna (caminho absoluto, tamanho, mtime_ns) de cada arquivo .cs da pasta do aluno, sem lê-los.
+
+    Como na leitura dos arquivos compactados, pastas de IDE e de compilação (bin/, obj/, .vs/ etc.)
+    e arquivos gerados pelo caminho (AssemblyInfo.cs, *.Designer.cs etc.) ficam de fora.
+    """
+    arquivos = []
+    raiz = os.path.abspath(aluno_path)
+    for root, dirs, files in os.walk(raiz):
+        dirs[:] = [d for d in dirs if d.lower() not in PASTAS_IGNORADAS]
+        for file in files:
+            caminho = os.path.join(root, file)
+            if file.lower().endswith(".cs") and not caminho_gerado(os.path.relpath(caminho, raiz)):
+                estado = os.stat(caminho)
+                arquivos.append((caminho, estado.st_size, estado.st_mtime_ns))
+    return arquivos
+
+def analisar_arquivo(caminho, casador):
+    """
+    Lê um arquivo .cs e retorna o hash do conteúdo e as palavras-chave encontradas nele
+    (nenhuma, se o arquivo foi gerado por ferramentas).
+    """
+    with open(caminho, "rb") as f:
+        conteudo = f.read()
+    texto = conteudo.decode("utf-8", errors="ignore")
+    encontradas = set() if conteudo_gerado(texto) else casador.encontrar([texto])
+    return hashlib.sha256(conteudo).hexdigest(), encontradas
+
+# Casador usado pelos processos do pool (criado uma vez por processo em _iniciar_processo)
+_casador_processo = None
+
+def _iniciar_processo(criterios_keywords):
+    global _casador_processo
+    _casador_processo = CasadorPalavras(criterios_keywords)
+
+def _analisar_no_processo(caminho):
+    return analisar_arquivo(caminho, _casador_processo)
+
+def avaliar_entregas(pasta_entregas, criterios_texto, processos=PROCESSOS_PADRAO, usar_cache=True):
+    """
+    Avalia por palavras-chave cada subpasta (aluno) de pasta_entregas.
+
+    As palavras encontradas em cada arquivo ficam no cache de arquivos: em uma
+    nova execução sobre a mesma pasta, só os arquivos novos ou com tamanho ou
+    mtime diferentes são lidos, e o resultado de cada aluno é montado com as
+    palavras já conhecidas dos demais.
+
+    Args:
+        pasta_entregas: Diretório com uma subpasta por aluno
+        criterios_texto: Checklist de critérios
+        processos: Número de processos para dividir os arquivos a ler
+            (0 ou 1 avalia no processo atual)
+        usar_cache: Se False, lê e busca todos os arquivos sem consultar nem atualizar o cache
 
-            if not achou:
-                print(f"FALHA em: {crit}")
-                print(f"  Palavras-chave: {palavras}")
-                nao_encontradas = [p for p in palavras if p not in texto_codigo]
-                print(f"  Não encontradas: {nao_encontradas}")
+    Returns:
+        Dicionário aluno -> {"criterios": {critério: "OK"/"FALHA"}}
+    """
+    resultados = {}
+
+    casador = CasadorPalavras.de_checklist(criterios_texto)
+
+    print("Critérios filtrados:")
+    for c in casador.criterios_keywords:
+        print("-", c)
+
+    alunos = [
+        aluno_pasta for aluno_pasta in os.listdir(pasta_entregas)
+        if os.path.isdir(os.path.join(pasta_entregas, aluno_pasta))
+    ]
+    arquivos_por_aluno = [listar_arquivos_cs(os.path.join(pasta_entregas, aluno_pasta)) for aluno_pasta in alunos]
+    estados = {caminho: (tamanho, mtime_ns) for arquivos in arquivos_por_aluno for caminho, tamanho, mtime_ns in arquivos}
+
+    cache = obter_cache_arquivos() if usar_cache else None
+    por_arquivo = cache.encontradas(estados, casador.assinatura) if cache else {}
+    pendentes = [caminho for caminho in estados if caminho not in por_arquivo]
+    CACHE_ARQUIVOS.incrementar(len(por_arquivo), resultado="acerto")
+    CACHE_ARQUIVOS.incrementar(len(pendentes), resultado="falha")
+    print(f"Arquivos .cs: {len(por_arquivo)} do cache, {len(pendentes)} a ler")
+
+    if processos > 1 and len(pendentes) > 1:
+        # Cada processo recebe apenas as palavras-chave e monta seu próprio casador
+        processos = min(processos, len(pendentes))
+        with ProcessPoolExecutor(max_workers=processos, initializer=_iniciar_processo,
+                                 initargs=(casador.criterios_keywords,)) as executor:
+            tamanho_bloco = max(1, len(pendentes) // (processos * 4))
+            analisados = list(executor.map(_analisar_no_processo, pendentes, chunksize=tamanho_bloco))
+    else:
+        analisados = [analisar_arquivo(caminho, casador) for caminho in pendentes]
+
+    for caminho, (_, encontradas) in zip(pendentes, analisados):
+        por_arquivo[caminho] = encontradas
+    if cache:
+        if pendentes:
+            cache.guardar(
+                [(caminho, *estados[caminho], *analisado) for caminho, analisado in zip(pendentes, analisados)],
+                casador.assinatura
+            )
+        cache.remover_ausentes(pasta_entregas, estados)
+
+    # Cada palavra é procurada em cada arquivo isoladamente: a união por aluno equivale à busca na pasta inteira
+    encontradas_por_aluno = [
+        set().union(*(por_arquivo[caminho] for caminho, _, _ in arquivos)) for arquivos in arquivos_por_aluno
+    ]
+
+    # A regra dos critérios (e as mensagens de FALHA) é aplicada aqui, na ordem original
+    for aluno_pasta, encontradas in zip(alunos, encontradas_por_aluno):
+        resultados[aluno_pasta] = {"criterios": casador.avaliar(encontradas)}
+
+    return resultados
+
+def avaliar_codigos(codigos_por_aluno, criterios_texto):
+    """
+    Avalia por palavras-chave o código já carregado em memória.
+
+    Args:
+        codigos_por_aluno: Dicionário aluno -> {caminho relativo: conteúdo dos arquivos .cs}
+        criterios_texto: Checklist de critérios
+
+    Returns:
+        Dicionário aluno -> {"criterios": {critério: "OK"/"FALHA"}}
+    """
+    resultados = {}
+
+    casador = CasadorPalavras.de_checklist(criterios_texto)
+
+    print("Critérios filtrados:")
+    for c in casador.criterios_keywords:
+        print("-", c)
 
-        resultados[aluno_pasta] = resultado_aluno
+    for aluno_pasta, arquivos in codigos_por_aluno.items():
+        encontradas = casador.encontrar(arquivos.values())
+        resultados[aluno_pasta] = {"criterios": casador.avaliar(encontradas)}
 
     return resultados
@@ -0,0 +1,47 @@
+import os
+import sqlite3
+import threading
+
+class RepositorioSQLite:
+    """
+    Base dos repositórios persistidos em SQLite: uma única conexão, compartilhada
+    pelas threads do processo e protegida por `_lock`, com o esquema criado na abertura.
+
+    Args:
+        caminho: Arquivo do banco SQLite (":memory:" para um banco temporário); a pasta é criada se necessário
+        esquema: Comandos SQL (CREATE ... IF NOT EXISTS) executados na abertura
+        timeout: Segundos de espera quando outro processo está gravando no banco
+    """
+
+    def __init__(self, caminho, esquema, timeout=5.0):
+        if caminho != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(caminho)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(caminho, check_same_thread=False, timeout=timeout)
+        self._conn.executescript(esquema)
+        self._conn.commit()
+
+def compartilhado(fabrica, descricao: str):
+    """
+    Cria a função obter_*() de um objeto único no processo (repositório, cache), criado
+    no primeiro uso e não na importação, e reaproveitado pelas chamadas seguintes.
+
+    Args:
+        fabrica: Função sem argumentos que cria o objeto (ex: a classe do repositório)
+        descricao: Descrição do objeto para a docstring (ex: "o repositório de tarefas")
+
+    Returns:
+        Função sem argumentos que retorna o objeto compartilhado
+    """
+    instancia = None
+    lock = threading.Lock()
+
+    def obter():
+        nonlocal instancia
+        with lock:
+            if instancia is None:
+                instancia = fabrica()
+            return instancia
+
+    obter.__doc__ = f"Retorna {descricao} compartilhado, criando-o no primeiro uso."
+    return obter
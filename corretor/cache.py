@@ -0,0 +1,77 @@
+import os
+import json
+import time
+import hashlib
+
+from corretor.banco import RepositorioSQLite, compartilhado
+from corretor.preparacao import remover_comentarios
+
+# Arquivo do cache de avaliações e número máximo de entradas (ajustáveis via .env)
+CAMINHO_CACHE = os.getenv("CORRETOR_CACHE", "./results/cache_avaliacoes.db")
+MAX_ENTRADAS_CACHE = int(os.getenv("CORRETOR_CACHE_MAX", "5000"))
+
+def normalizar_codigo(codigo: str) -> str:
+    """
+    Remove comentários e espaços redundantes do código C#, para que
+    reenvios que diferem apenas em formatação gerem a mesma chave.
+    """
+    return " ".join(remover_comentarios(codigo).split())
+
+def chave_avaliacao(enunciado: str, checklist: str, modelo: str, codigo: str) -> str:
+    """Calcula a chave do cache a partir do enunciado, checklist, modelo e código normalizado."""
+    h = hashlib.sha256()
+    for parte in (enunciado.strip(), checklist.strip(), modelo, normalizar_codigo(codigo)):
+        h.update(parte.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+class CacheAvaliacoes(RepositorioSQLite):
+    """
+    Cache persistente (SQLite) de avaliações por IA, com remoção LRU.
+
+    Args:
+        caminho: Arquivo do banco SQLite (":memory:" para um cache temporário)
+        max_entradas: Número máximo de avaliações mantidas
+    """
+
+    def __init__(self, caminho=CAMINHO_CACHE, max_entradas=MAX_ENTRADAS_CACHE):
+        self.max_entradas = max_entradas
+        super().__init__(caminho, (
+            "CREATE TABLE IF NOT EXISTS avaliacoes ("
+            " chave TEXT PRIMARY KEY,"
+            " avaliacao TEXT NOT NULL,"
+            " acessado_em REAL NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS idx_acessado_em ON avaliacoes (acessado_em);"
+        ))
+
+    def obter(self, chave: str):
+        """Retorna a avaliação armazenada para a chave, ou None se não existir."""
+        with self._lock:
+            linha = self._conn.execute(
+                "SELECT avaliacao FROM avaliacoes WHERE chave = ?", (chave,)
+            ).fetchone()
+            if linha is None:
+                return None
+            self._conn.execute(
+                "UPDATE avaliacoes SET acessado_em = ? WHERE chave = ?", (time.time(), chave)
+            )
+            self._conn.commit()
+        return json.loads(linha[0])
+
+    def guardar(self, chave: str, avaliacao: dict):
+        """Armazena a avaliação, removendo as entradas menos usadas se o limite for excedido."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO avaliacoes (chave, avaliacao, acessado_em) VALUES (?, ?, ?)",
+                (chave, json.dumps(avaliacao, ensure_ascii=False), time.time())
+            )
+            excesso = self._conn.execute("SELECT COUNT(*) FROM avaliacoes").fetchone()[0] - self.max_entradas
+            if excesso > 0:
+                self._conn.execute(
+                    "DELETE FROM avaliacoes WHERE chave IN "
+                    "(SELECT chave FROM avaliacoes ORDER BY acessado_em LIMIT ?)",
+                    (excesso,)
+                )
+            self._conn.commit()
+
+obter_cache = compartilhado(CacheAvaliacoes, "o cache de avaliações")
@@ -0,0 +1,121 @@
+import os
+import json
+import time
+
+from corretor.banco import RepositorioSQLite, compartilhado
+
+# Arquivo do cache de arquivos .cs e número máximo de conjuntos de palavras guardados (ajustáveis via .env)
+CAMINHO_CACHE_ARQUIVOS = os.getenv("CORRETOR_CACHE_ARQUIVOS", "./results/cache_arquivos.db")
+MAX_ENTRADAS_CACHE_ARQUIVOS = int(os.getenv("CORRETOR_CACHE_ARQUIVOS_MAX", "200000"))
+
+# Arquivos modificados há menos que isto (segundos) podem mudar de novo sem alterar tamanho e mtime
+MARGEM_MTIME = 2.0
+
+class CacheArquivos(RepositorioSQLite):
+    """
+    Cache persistente (SQLite) da busca por palavras-chave em arquivos .cs de uma pasta.
+
+    Guarda, para cada caminho, o tamanho, o mtime e o hash do conteúdo e, para
+    cada conteúdo (hash) e conjunto de palavras-chave, as palavras encontradas.
+    Arquivos com o mesmo tamanho e mtime da última leitura não são lidos de
+    novo; conteúdos iguais (inclusive em pastas diferentes) são buscados uma
+    única vez por checklist.
+
+    Args:
+        caminho: Arquivo do banco SQLite (":memory:" para um cache temporário)
+        max_entradas: Número máximo de conjuntos de palavras (conteúdo × checklist) mantidos
+    """
+
+    def __init__(self, caminho=CAMINHO_CACHE_ARQUIVOS, max_entradas=MAX_ENTRADAS_CACHE_ARQUIVOS):
+        self.max_entradas = max_entradas
+        super().__init__(caminho, (
+            "CREATE TABLE IF NOT EXISTS arquivos ("
+            " caminho TEXT PRIMARY KEY,"
+            " tamanho INTEGER NOT NULL,"
+            " mtime_ns INTEGER NOT NULL,"
+            " hash TEXT NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS palavras ("
+            " hash TEXT NOT NULL,"
+            " assinatura TEXT NOT NULL,"
+            " encontradas TEXT NOT NULL,"
+            " criado_em REAL NOT NULL,"
+            " PRIMARY KEY (hash, assinatura));"
+            "CREATE INDEX IF NOT EXISTS idx_palavras_criado ON palavras (criado_em);"
+        ))
+
+    def encontradas(self, estados: dict, assinatura: str) -> dict:
+        """
+        Retorna as palavras já encontradas nos arquivos que não mudaram desde a última leitura.
+
+        Args:
+            estados: Dicionário caminho absoluto -> (tamanho, mtime_ns) atual do arquivo
+            assinatura: Identificador do conjunto de palavras-chave (CasadorPalavras.assinatura)
+
+        Returns:
+            Dicionário caminho -> conjunto de palavras, apenas para os arquivos resolvidos pelo cache
+        """
+        resultado = {}
+        with self._lock:
+            for caminho, (tamanho, mtime_ns) in estados.items():
+                linha = self._conn.execute(
+                    "SELECT p.encontradas FROM arquivos a JOIN palavras p ON p.hash = a.hash "
+                    "WHERE a.caminho = ? AND a.tamanho = ? AND a.mtime_ns = ? AND p.assinatura = ?",
+                    (caminho, tamanho, mtime_ns, assinatura)
+                ).fetchone()
+                if linha is not None:
+                    resultado[caminho] = set(json.loads(linha[0]))
+        return resultado
+
+    def guardar(self, arquivos: list, assinatura: str):
+        """
+        Registra os arquivos lidos e as palavras encontradas em cada um.
+
+        Args:
+            arquivos: Lista de (caminho, tamanho, mtime_ns, hash, conjunto de palavras)
+            assinatura: Identificador do conjunto de palavras-chave
+        """
+        agora = time.time()
+        # Um arquivo alterado agora pode mudar de novo no mesmo tique do mtime: fica para ser relido
+        recente = int((agora - MARGEM_MTIME) * 1e9)
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO arquivos (caminho, tamanho, mtime_ns, hash) VALUES (?, ?, ?, ?)",
+                [
+                    (caminho, tamanho, mtime_ns if mtime_ns < recente else -1, hash_conteudo)
+                    for caminho, tamanho, mtime_ns, hash_conteudo, _ in arquivos
+                ]
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO palavras (hash, assinatura, encontradas, criado_em) VALUES (?, ?, ?, ?)",
+                [
+                    (hash_conteudo, assinatura, json.dumps(sorted(encontradas)), agora)
+                    for _, _, _, hash_conteudo, encontradas in arquivos
+                ]
+            )
+            excesso = self._conn.execute("SELECT COUNT(*) FROM palavras").fetchone()[0] - self.max_entradas
+            if excesso > 0:
+                self._conn.execute(
+                    "DELETE FROM palavras WHERE rowid IN "
+                    "(SELECT rowid FROM palavras ORDER BY criado_em LIMIT ?)",
+                    (excesso,)
+                )
+            self._conn.commit()
+
+    def remover_ausentes(self, pasta: str, presentes):
+        """Esquece os arquivos registrados dentro de `pasta` que não estão mais em `presentes`."""
+        prefixo = os.path.join(os.path.abspath(pasta), "")
+        # Intervalo de texto que contém exatamente os caminhos que começam com o prefixo
+        fim = prefixo[:-1] + chr(ord(prefixo[-1]) + 1)
+        presentes = set(presentes)
+        with self._lock:
+            ausentes = [
+                (caminho,) for (caminho,) in self._conn.execute(
+                    "SELECT caminho FROM arquivos WHERE caminho >= ? AND caminho < ?", (prefixo, fim)
+                )
+                if caminho not in presentes
+            ]
+            if ausentes:
+                self._conn.executemany("DELETE FROM arquivos WHERE caminho = ?", ausentes)
+                self._conn.commit()
+
+obter_cache_arquivos = compartilhado(CacheArquivos, "o cache de arquivos")
@@ -0,0 +1,288 @@
+"""
+Linha de comando do corretor: avalia arquivos ZIP/RAR direto do disco, com o
+mesmo fluxo do /avaliar (extração, critérios, execução, avaliação), sem o
+servidor HTTP, o upload multipart e a cópia dos arquivos.
+
+O resultado de cada aluno é emitido em NDJSON assim que fica pronto; a última
+linha traz o status e o resumo da execução. As mensagens do pipeline vão para
+a saída de erro, para não misturar com o NDJSON.
+
+Com --pastas, as entradas são pastas já extraídas (uma subpasta por aluno) e a
+avaliação por palavras-chave usa o cache de arquivos: só os arquivos novos ou
+alterados desde a última execução são lidos.
+
+Uso:
+    python -m corretor grade entregas/ --enunciado enunciado.txt
+    python -m corretor grade "turmas/**/*.zip" --enunciado enunciado.txt --ia --saida resultado.ndjson
+    python -m corretor grade exportacao_ava/ --pastas --enunciado enunciado.txt
+"""
+import os
+import sys
+import glob
+import json
+import asyncio
+import argparse
+import threading
+import contextlib
+
+from corretor.ingestao import EXTENSOES_SUPORTADAS, ErroExtracao
+from corretor.entregas import ler_entrega
+from corretor.espaco_trabalho import EspacoTrabalho
+from corretor.pipeline import avaliar_espaco, registrar_execucao
+from corretor.avaliador import avaliar_entregas
+from corretor.modelo_ia import obter_criterios
+from corretor.resultados import obter_repositorio_resultados
+from corretor.agendador import executar_concorrente, executar_em_thread
+from corretor.metricas import execucao, etapa, configurar_log, log
+
+def listar_arquivos(entradas) -> list:
+    """
+    Expande diretórios (arquivos ZIP/RAR diretamente dentro deles) e padrões glob
+    (`**` percorre subpastas) na lista de arquivos a avaliar, sem repetições.
+    """
+    arquivos = {}
+    for entrada in entradas:
+        if os.path.isdir(entrada):
+            candidatos = [os.path.join(entrada, nome) for nome in sorted(os.listdir(entrada))]
+        else:
+            candidatos = sorted(glob.glob(entrada, recursive=True)) or [entrada]
+        encontrados = [
+            caminho for caminho in candidatos
+            if os.path.isfile(caminho) and os.path.splitext(caminho)[1].lower() in EXTENSOES_SUPORTADAS
+        ]
+        if not encontrados:
+            print(f"Nenhum arquivo ZIP/RAR em {entrada}", file=sys.stderr)
+        for caminho in encontrados:
+            arquivos.setdefault(os.path.abspath(caminho), caminho)
+    return list(arquivos.values())
+
+def nome_aluno(caminho: str) -> str:
+    """Identificador do aluno: o nome do arquivo, sem a extensão."""
+    return os.path.splitext(os.path.basename(caminho))[0]
+
+def listar_pastas(entradas) -> list:
+    """Lista as subpastas (uma por aluno) dos diretórios de entregas já extraídas."""
+    pastas = []
+    for entrada in entradas:
+        if not os.path.isdir(entrada):
+            raise SystemExit(f"{entrada} não é um diretório (--pastas espera pastas com uma subpasta por aluno)")
+        pastas.extend(
+            os.path.join(entrada, nome) for nome in sorted(os.listdir(entrada))
+            if os.path.isdir(os.path.join(entrada, nome))
+        )
+    return pastas
+
+def conferir_nomes(arquivos, nome=nome_aluno):
+    """
+    Interrompe com uma mensagem clara se dois arquivos identificam o mesmo aluno
+    (ex: turmaA/joao.zip e turmaB/joao.zip), em vez de juntar as entregas.
+    """
+    caminhos = {}
+    for caminho in arquivos:
+        caminhos.setdefault(nome(caminho), []).append(caminho)
+    repetidos = {aluno: lista for aluno, lista in caminhos.items() if len(lista) > 1}
+    if repetidos:
+        linhas = [f"  {aluno}: {', '.join(lista)}" for aluno, lista in sorted(repetidos.items())]
+        raise SystemExit(
+            "Arquivos com o mesmo nome identificariam o mesmo aluno; avalie cada turma separadamente "
+            "ou renomeie os arquivos:\n" + "\n".join(linhas)
+        )
+
+def _ler_texto(caminho: str) -> str:
+    """Lê um arquivo de texto ("-" lê a entrada padrão)."""
+    if caminho == "-":
+        return sys.stdin.read()
+    with open(caminho, encoding="utf-8") as f:
+        return f.read()
+
+def _ler_casos(caminho):
+    if caminho is None:
+        return None
+    try:
+        lista = json.loads(_ler_texto(caminho))
+    except json.JSONDecodeError as e:
+        raise SystemExit(f"Casos de teste inválidos: {e}")
+    if not isinstance(lista, list) or not all(isinstance(caso, dict) for caso in lista):
+        raise SystemExit("Casos de teste devem ser uma lista de objetos com 'entrada' e 'saida'")
+    # Casos sem saída esperada não têm o que conferir
+    return [
+        {"entrada": str(caso.get("entrada", "")), "saida": str(caso.get("saida", ""))}
+        for caso in lista if str(caso.get("saida", "")).strip()
+    ]
+
+def _carregar_arquivo(caminho):
+    with open(caminho, "rb") as f:
+        try:
+            return ler_entrega(f, os.path.basename(caminho))
+        except ErroExtracao as e:
+            # O aluno continua no resultado, sem código; o arquivo não é guardado
+            log.warning("%s", e)
+            return None, {}
+
+async def avaliar_arquivos(arquivos, enunciado, destino, usar_ia_direta=False, concorrencia=None,
+                           extracao=None, criterios=None, executar_codigo=None, casos=None,
+                           turma=None, registrar=True) -> dict:
+    """
+    Avalia os arquivos ZIP/RAR informados e escreve o resultado em NDJSON.
+
+    Args:
+        arquivos: Caminhos dos arquivos ZIP/RAR (o nome de cada arquivo, sem extensão, identifica o aluno)
+        enunciado: Texto descritivo da atividade
+        destino: Arquivo de texto aberto onde as linhas NDJSON são escritas
+        usar_ia_direta: Se True, usa avaliação direta por IA; se False, usa busca por palavras-chave
+        concorrencia: Número máximo de chamadas de avaliação por IA ao mesmo tempo (padrão: CORRETOR_CONCORRENCIA)
+        extracao: Número de arquivos lidos e extraídos ao mesmo tempo (padrão: número de núcleos)
+        criterios: Checklist a usar no lugar do gerado para o enunciado (opcional)
+        executar_codigo: Se False, não executa as entregas mesmo com CORRETOR_EXECUTAR_CODIGO=1
+        casos: Casos de teste [{"entrada", "saida"}] (padrão: gerados a partir do enunciado)
+        turma: Rótulo opcional da turma, usado nos resumos de /resultados/turmas
+        registrar: Se True, registra a execução nos repositórios de entregas e resultados
+
+    Returns:
+        Resultado completo, no mesmo formato do /avaliar
+    """
+    lock = threading.Lock()
+
+    def emitir(linha):
+        texto = json.dumps(linha, ensure_ascii=False) + "\n"
+        with lock:
+            destino.write(texto)
+            destino.flush()
+
+    with execucao(), EspacoTrabalho() as espaco:
+        with etapa("upload"):
+            # Leitura e descompressão em paralelo; arquivos já recebidos vêm do repositório de entregas
+            lidos = await executar_concorrente(_carregar_arquivo, arquivos, max_concorrencia=extracao or os.cpu_count())
+        for caminho, (hash_conteudo, arquivos_cs) in zip(arquivos, lidos):
+            espaco.adicionar_entrega(nome_aluno(caminho), arquivos_cs, origem=hash_conteudo)
+
+        output = await avaliar_espaco(
+            espaco, enunciado, usar_ia_direta, concorrencia,
+            ao_concluir=lambda aluno, resultado: emitir({"aluno": aluno, "resultado": resultado}),
+            criterios=criterios, executar_codigo=executar_codigo, casos=casos
+        )
+        if registrar:
+            await executar_em_thread(registrar_execucao, espaco, enunciado, usar_ia_direta, output, turma)
+        output = {"id_execucao": espaco.id, **output}
+
+    alunos = output["avaliacoes_ia"] if usar_ia_direta else output["relatorio"]
+    emitir({
+        "status": "concluida",
+        "alunos": len(alunos),
+        **{chave: valor for chave, valor in output.items() if chave not in ("avaliacoes_ia", "relatorio", "preparacao")},
+    })
+    return output
+
+async def avaliar_pastas(diretorios, enunciado, destino, criterios=None, turma=None, registrar=True) -> dict:
+    """
+    Avalia por palavras-chave pastas de entregas já extraídas e escreve o resultado em NDJSON.
+
+    Usa avaliador.avaliar_entregas: as palavras encontradas em cada arquivo ficam no
+    cache de arquivos (CORRETOR_CACHE_ARQUIVOS), e a leitura dos arquivos novos ou
+    alterados pode ser dividida entre processos (CORRETOR_PROCESSOS).
+
+    Args:
+        diretorios: Diretórios com uma subpasta por aluno (o nome da subpasta identifica o aluno)
+        enunciado: Texto descritivo da atividade
+        destino: Arquivo de texto aberto onde as linhas NDJSON são escritas
+        criterios: Checklist a usar no lugar do gerado para o enunciado (opcional)
+        turma: Rótulo opcional da turma, usado nos resumos de /resultados/turmas
+        registrar: Se True, registra os resultados no repositório de resultados (sem os arquivos,
+            a execução não pode ser reavaliada)
+
+    Returns:
+        Resultado completo, no formato do /avaliar por palavras-chave
+    """
+    def emitir(linha):
+        destino.write(json.dumps(linha, ensure_ascii=False) + "\n")
+        destino.flush()
+
+    with execucao() as tempos, EspacoTrabalho() as espaco:
+        if criterios is None:
+            with etapa("criterios"):
+                criterios = await executar_em_thread(obter_criterios, enunciado)
+        relatorio = {}
+        with etapa("palavras_chave"):
+            for diretorio in diretorios:
+                resultados = await executar_em_thread(avaliar_entregas, diretorio, criterios)
+                for aluno in sorted(resultados):
+                    relatorio[aluno] = resultados[aluno]
+                    emitir({"aluno": aluno, "resultado": resultados[aluno]})
+        if registrar:
+            await executar_em_thread(
+                obter_repositorio_resultados().registrar, espaco.id, enunciado, "palavras_chave", relatorio, turma
+            )
+        output = {"id_execucao": espaco.id, "criterios": criterios, "relatorio": relatorio, "tempos": tempos.resumo()}
+
+    emitir({
+        "status": "concluida",
+        "alunos": len(relatorio),
+        **{chave: valor for chave, valor in output.items() if chave != "relatorio"},
+    })
+    return output
+
+def _comando_avaliar(args):
+    if args.pastas:
+        if args.ia:
+            raise SystemExit("--pastas avalia apenas por palavras-chave (não use --ia)")
+        # Alunos com o mesmo nome em diretórios diferentes seriam misturados no resultado
+        conferir_nomes(listar_pastas(args.entradas), nome=os.path.basename)
+    else:
+        arquivos = listar_arquivos(args.entradas)
+        if not arquivos:
+            raise SystemExit("Nenhum arquivo ZIP/RAR para avaliar")
+        conferir_nomes(arquivos)
+    enunciado = _ler_texto(args.enunciado).strip()
+    criterios = _ler_texto(args.criterios) if args.criterios else None
+    casos = _ler_casos(args.casos)
+
+    with contextlib.ExitStack() as pilha:
+        if args.saida:
+            destino = pilha.enter_context(open(args.saida, "w", encoding="utf-8"))
+        else:
+            destino = sys.stdout
+            # O NDJSON ocupa a saída padrão: as mensagens do pipeline vão para a saída de erro
+            pilha.enter_context(contextlib.redirect_stdout(sys.stderr))
+        if args.pastas:
+            asyncio.run(avaliar_pastas(args.entradas, enunciado, destino, criterios, args.turma, not args.sem_registro))
+            return
+        print(f"Avaliando {len(arquivos)} arquivo(s)...")
+        asyncio.run(avaliar_arquivos(
+            arquivos, enunciado, destino, args.ia, args.concorrencia, args.extracao,
+            criterios, args.executar_codigo, casos, args.turma, not args.sem_registro
+        ))
+
+def main(argv=None):
+    configurar_log()
+    parser = argparse.ArgumentParser(prog="python -m corretor", description="Corretor de atividades em C#")
+    comandos = parser.add_subparsers(dest="comando", required=True)
+
+    avaliar = comandos.add_parser(
+        "grade", aliases=["avaliar"], help="Avalia arquivos ZIP/RAR sem o servidor HTTP",
+        description="Avalia arquivos ZIP/RAR (um por aluno) e escreve o resultado de cada aluno em NDJSON"
+    )
+    avaliar.add_argument("entradas", nargs="+", help="Diretórios, arquivos ou padrões glob (ex: 'turma/**/*.zip')")
+    avaliar.add_argument("--enunciado", required=True, help="Arquivo com o enunciado (- lê da entrada padrão)")
+    avaliar.add_argument("--ia", action="store_true", help="Avaliação por IA (padrão: palavras-chave)")
+    avaliar.add_argument("--pastas", action="store_true",
+                         help="Entradas são pastas já extraídas, uma subpasta por aluno (palavras-chave, "
+                              "relendo só os arquivos novos ou alterados)")
+    avaliar.add_argument("--criterios", help="Arquivo com o checklist (padrão: gerado a partir do enunciado)")
+    avaliar.add_argument("--casos", help="Arquivo JSON com os casos de teste [{\"entrada\", \"saida\"}]")
+    avaliar.add_argument("--nao-executar-codigo", dest="executar_codigo", action="store_const", const=False,
+                         default=None, help="Não executa as entregas, mesmo com CORRETOR_EXECUTAR_CODIGO=1")
+    avaliar.add_argument("--concorrencia", type=int, default=None,
+                         help="Chamadas de avaliação por IA ao mesmo tempo (padrão: CORRETOR_CONCORRENCIA)")
+    avaliar.add_argument("--extracao", type=int, default=None,
+                         help="Arquivos extraídos ao mesmo tempo (padrão: número de núcleos)")
+    avaliar.add_argument("--turma", help="Rótulo da turma, usado nos resumos de /resultados/turmas")
+    avaliar.add_argument("--saida", help="Arquivo NDJSON de saída (padrão: saída padrão)")
+    avaliar.add_argument("--sem-registro", action="store_true",
+                         help="Não registra a execução (sem reavaliação nem estatísticas depois)")
+    avaliar.set_defaults(funcao=_comando_avaliar)
+
+    args = parser.parse_args(argv)
+    args.funcao(args)
+
+if __name__ == "__main__":
+    main()
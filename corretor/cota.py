@@ -0,0 +1,93 @@
+import os
+import time
+
+from corretor.banco import RepositorioSQLite, compartilhado
+
+# Arquivo da cota diária de chamadas ao modelo, compartilhada pelos processos (ajustável via .env;
+# vazio mantém a cota só na memória de cada processo)
+CAMINHO_COTA = os.getenv("CORRETOR_COTA", "./results/cota.db")
+
+def _reabastecido(linha, capacidade, periodo, agora) -> float:
+    """Fichas do balde (linha fichas, atualizado_em do banco; None = cheio) reabastecidas até `agora`."""
+    fichas, atualizado_em = linha if linha else (float(capacidade), agora)
+    decorrido = max(0.0, agora - atualizado_em)
+    return min(float(capacidade), fichas + decorrido * capacidade / periodo)
+
+class RepositorioCotas(RepositorioSQLite):
+    """
+    Repositório persistente (SQLite) dos baldes de fichas da cota diária de cada modelo.
+
+    O saldo sobrevive a reinícios e é um só para todos os processos (workers,
+    execuções da linha de comando) que usam o mesmo arquivo: cada consumo lê,
+    reabastece e grava o saldo em uma única transação exclusiva; consultas apenas
+    leem, sem disputar a escrita.
+
+    Args:
+        caminho: Arquivo do banco SQLite (":memory:" para um repositório temporário)
+    """
+
+    def __init__(self, caminho=CAMINHO_COTA):
+        super().__init__(caminho, (
+            "CREATE TABLE IF NOT EXISTS cotas ("
+            " chave TEXT PRIMARY KEY,"
+            " fichas REAL NOT NULL,"
+            " atualizado_em REAL NOT NULL);"
+        ), timeout=30)
+
+    def consultar(self, chave, capacidade, periodo, agora=None) -> float:
+        """
+        Retorna as fichas do balde da chave, já reabastecidas, sem gravar nada.
+
+        Args:
+            chave: Identificador do balde (ex: o modelo)
+            capacidade: Fichas do balde cheio
+            periodo: Segundos para reabastecer o balde vazio
+            agora: Tempo atual em segundos desde a época (padrão: time.time())
+        """
+        agora = time.time() if agora is None else agora
+        with self._lock:
+            linha = self._conn.execute(
+                "SELECT fichas, atualizado_em FROM cotas WHERE chave = ?", (chave,)
+            ).fetchone()
+        return _reabastecido(linha, capacidade, periodo, agora)
+
+    def consumir(self, chave, capacidade, periodo, n=1, agora=None) -> float:
+        """
+        Reabastece o balde da chave e, se houver fichas, consome `n` delas.
+
+        Args:
+            chave: Identificador do balde (ex: o modelo)
+            capacidade: Fichas do balde cheio
+            periodo: Segundos para reabastecer o balde vazio
+            n: Fichas a consumir
+            agora: Tempo atual em segundos desde a época (padrão: time.time())
+
+        Returns:
+            Fichas restantes, após o consumo; se forem insuficientes para `n`, nada é consumido
+            e o valor retornado é negativo: -(fichas que faltam)
+        """
+        agora = time.time() if agora is None else agora
+        with self._lock:
+            # Transação exclusiva: outro processo não consome entre a leitura e a gravação
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                linha = self._conn.execute(
+                    "SELECT fichas, atualizado_em FROM cotas WHERE chave = ?", (chave,)
+                ).fetchone()
+                fichas = _reabastecido(linha, capacidade, periodo, agora)
+                if fichas < n:
+                    faltam = n - fichas
+                    self._conn.rollback()
+                    return -faltam
+                fichas -= n
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO cotas (chave, fichas, atualizado_em) VALUES (?, ?, ?)",
+                    (chave, fichas, agora)
+                )
+                self._conn.commit()
+            except BaseException:
+                self._conn.rollback()
+                raise
+        return fichas
+
+obter_repositorio_cotas = compartilhado(RepositorioCotas, "o repositório de cotas")
@@ -0,0 +1,119 @@
+import os
+import time
+import hashlib
+import threading
+
+from corretor.banco import RepositorioSQLite, compartilhado
+
+# Arquivo do repositório de critérios (ajustável via .env)
+CAMINHO_CRITERIOS = os.getenv("CORRETOR_CRITERIOS", "./results/criterios.db")
+
+def chave_enunciado(enunciado: str, escopo: str = "") -> str:
+    """
+    Identificador do enunciado (mesmo hash usado pelos antigos criteria_cache_<md5>.txt).
+    Um escopo não vazio (ex: o provedor local) separa critérios que não devem ser compartilhados.
+    """
+    if escopo:
+        enunciado = f"{escopo}\0{enunciado}"
+    return hashlib.md5(enunciado.encode()).hexdigest()
+
+class RepositorioCriterios(RepositorioSQLite):
+    """
+    Repositório único de critérios gerados por enunciado, persistido em SQLite.
+
+    Mantém uma cópia em memória dos critérios já consultados e garante que,
+    se várias requisições pedirem ao mesmo tempo os critérios de um enunciado
+    novo, apenas uma delas chame o modelo; as demais aguardam o resultado.
+
+    Args:
+        caminho: Arquivo do banco SQLite (":memory:" para um repositório temporário)
+    """
+
+    def __init__(self, caminho=CAMINHO_CRITERIOS):
+        self._dir_legado = None if caminho == ":memory:" else os.path.dirname(os.path.abspath(caminho))
+        self._memoria = {}
+        self._locks_geracao = {}
+        super().__init__(caminho, (
+            "CREATE TABLE IF NOT EXISTS criterios ("
+            " chave TEXT PRIMARY KEY,"
+            " enunciado TEXT NOT NULL,"
+            " criterios TEXT NOT NULL,"
+            " modelo TEXT,"
+            " gerado_em REAL NOT NULL)"
+        ))
+
+    def _consultar(self, chave):
+        with self._lock:
+            if chave in self._memoria:
+                return self._memoria[chave]
+            linha = self._conn.execute(
+                "SELECT criterios FROM criterios WHERE chave = ?", (chave,)
+            ).fetchone()
+            if linha is not None:
+                self._memoria[chave] = linha[0]
+                return linha[0]
+        return None
+
+    def _importar_legado(self, chave, enunciado, escopo=""):
+        """Importa um criteria_cache_<md5>.txt gerado por versões anteriores, se existir."""
+        if self._dir_legado is None or escopo:
+            return None
+        arquivo = os.path.join(self._dir_legado, f"criteria_cache_{chave}.txt")
+        if not os.path.exists(arquivo):
+            return None
+        with open(arquivo, "r", encoding="utf-8") as f:
+            criterios = f.read()
+        self.guardar(enunciado, criterios, modelo=None)
+        return criterios
+
+    def guardar(self, enunciado: str, criterios: str, modelo=None, escopo: str = ""):
+        """Armazena (ou substitui) os critérios de um enunciado."""
+        chave = chave_enunciado(enunciado, escopo)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO criterios (chave, enunciado, criterios, modelo, gerado_em) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (chave, enunciado, criterios, modelo, time.time())
+            )
+            self._conn.commit()
+            self._memoria[chave] = criterios
+
+    def obter(self, enunciado: str, escopo: str = ""):
+        """Retorna os critérios armazenados para o enunciado, ou None."""
+        chave = chave_enunciado(enunciado, escopo)
+        return self._consultar(chave) or self._importar_legado(chave, enunciado, escopo)
+
+    def obter_ou_gerar(self, enunciado: str, gerar, modelo=None, escopo: str = "") -> str:
+        """
+        Retorna os critérios do enunciado, gerando-os com `gerar(enunciado)` se ainda não existirem.
+
+        Args:
+            enunciado: Texto do enunciado da atividade
+            gerar: Função que gera os critérios a partir do enunciado
+            modelo: Nome do modelo usado na geração (registrado junto aos critérios)
+            escopo: Separa critérios que não devem ser compartilhados (ex: provedor local)
+
+        Returns:
+            String com os critérios em formato de checklist
+        """
+        chave = chave_enunciado(enunciado, escopo)
+        criterios = self._consultar(chave)
+        if criterios is not None:
+            return criterios
+
+        with self._lock:
+            lock_geracao = self._locks_geracao.setdefault(chave, threading.Lock())
+
+        # Apenas uma thread gera os critérios de cada enunciado; as outras esperam
+        with lock_geracao:
+            criterios = self.obter(enunciado, escopo)
+            if criterios is None:
+                criterios = gerar(enunciado)
+                if criterios:
+                    self.guardar(enunciado, criterios, modelo, escopo)
+
+        with self._lock:
+            self._locks_geracao.pop(chave, None)
+        return criterios
+
+obter_repositorio = compartilhado(RepositorioCriterios, "o repositório de critérios")
@@ -0,0 +1,159 @@
+import os
+import json
+import time
+import hashlib
+
+from corretor.banco import RepositorioSQLite, compartilhado
+from corretor.ingestao import extrair_codigos
+
+# Arquivo do repositório de entregas e execuções (ajustável via .env)
+CAMINHO_ENTREGAS = os.getenv("CORRETOR_ENTREGAS", "./results/entregas.db")
+
+def hash_arquivo(arquivo, tamanho_bloco: int = 1024 * 1024) -> str:
+    """
+    Calcula o SHA-256 do conteúdo de um arquivo aberto em modo binário,
+    devolvendo a posição de leitura ao início.
+    """
+    digest = hashlib.sha256()
+    arquivo.seek(0)
+    while True:
+        bloco = arquivo.read(tamanho_bloco)
+        if not bloco:
+            break
+        digest.update(bloco)
+    arquivo.seek(0)
+    return digest.hexdigest()
+
+class RepositorioEntregas(RepositorioSQLite):
+    """
+    Repositório persistente (SQLite) das entregas e das execuções de avaliação.
+
+    Os arquivos .cs extraídos de cada ZIP/RAR são guardados pelo hash do
+    arquivo compactado: o mesmo arquivo enviado de novo não é extraído outra
+    vez. Cada execução registra o enunciado, o checklist e, por aluno, os
+    hashes das entregas e o resultado, o que permite reavaliar uma execução
+    anterior refazendo apenas o que mudou.
+
+    Args:
+        caminho: Arquivo do banco SQLite (":memory:" para um repositório temporário)
+    """
+
+    def __init__(self, caminho=CAMINHO_ENTREGAS):
+        super().__init__(caminho, (
+            "CREATE TABLE IF NOT EXISTS arquivos ("
+            " hash TEXT PRIMARY KEY,"
+            " nome TEXT NOT NULL,"
+            " arquivos TEXT NOT NULL,"
+            " criado_em REAL NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS execucoes ("
+            " id TEXT PRIMARY KEY,"
+            " origem TEXT,"
+            " enunciado TEXT NOT NULL,"
+            " criterios TEXT,"
+            " usar_ia_direta INTEGER NOT NULL,"
+            " criado_em REAL NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS execucoes_alunos ("
+            " execucao_id TEXT NOT NULL,"
+            " aluno TEXT NOT NULL,"
+            " hashes TEXT NOT NULL,"
+            " resultado TEXT,"
+            " PRIMARY KEY (execucao_id, aluno));"
+        ))
+
+    def guardar_arquivo(self, hash_conteudo: str, nome: str, arquivos_cs: dict):
+        """Armazena os arquivos .cs extraídos do arquivo compactado com o hash informado."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO arquivos (hash, nome, arquivos, criado_em) VALUES (?, ?, ?, ?)",
+                (hash_conteudo, nome, json.dumps(arquivos_cs, ensure_ascii=False), time.time())
+            )
+            self._conn.commit()
+
+    def obter_arquivo(self, hash_conteudo: str):
+        """Retorna os arquivos .cs guardados para o hash, ou None se o arquivo nunca foi recebido."""
+        with self._lock:
+            linha = self._conn.execute(
+                "SELECT arquivos FROM arquivos WHERE hash = ?", (hash_conteudo,)
+            ).fetchone()
+        return json.loads(linha[0]) if linha else None
+
+    def registrar_execucao(self, id_execucao, enunciado, criterios, usar_ia_direta, alunos, origem=None):
+        """
+        Registra uma execução concluída.
+
+        Args:
+            id_execucao: Identificador da execução
+            enunciado: Texto do enunciado avaliado
+            criterios: Checklist usado na avaliação
+            usar_ia_direta: Modo de avaliação usado
+            alunos: Dicionário aluno -> (lista de hashes das entregas, resultado)
+            origem: Id da execução reavaliada, se for uma reavaliação
+        """
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO execucoes (id, origem, enunciado, criterios, usar_ia_direta, criado_em) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (id_execucao, origem, enunciado, criterios, int(bool(usar_ia_direta)), time.time())
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO execucoes_alunos (execucao_id, aluno, hashes, resultado) VALUES (?, ?, ?, ?)",
+                [
+                    (id_execucao, aluno, json.dumps(hashes), json.dumps(resultado, ensure_ascii=False))
+                    for aluno, (hashes, resultado) in alunos.items()
+                ]
+            )
+            self._conn.commit()
+
+    def obter_execucao(self, id_execucao):
+        """Retorna a execução com os hashes e o resultado de cada aluno, ou None se não existir."""
+        with self._lock:
+            execucao = self._conn.execute(
+                "SELECT origem, enunciado, criterios, usar_ia_direta, criado_em FROM execucoes WHERE id = ?",
+                (id_execucao,)
+            ).fetchone()
+            if execucao is None:
+                return None
+            alunos = self._conn.execute(
+                "SELECT aluno, hashes, resultado FROM execucoes_alunos WHERE execucao_id = ? ORDER BY aluno",
+                (id_execucao,)
+            ).fetchall()
+
+        origem, enunciado, criterios, usar_ia_direta, criado_em = execucao
+        return {
+            "id": id_execucao,
+            "origem": origem,
+            "enunciado": enunciado,
+            "criterios": criterios,
+            "usar_ia_direta": bool(usar_ia_direta),
+            "criado_em": criado_em,
+            "alunos": {
+                aluno: {"hashes": json.loads(hashes), "resultado": json.loads(resultado) if resultado else None}
+                for aluno, hashes, resultado in alunos
+            },
+        }
+
+obter_repositorio_entregas = compartilhado(RepositorioEntregas, "o repositório de entregas")
+
+def ler_entrega(arquivo, nome_arquivo: str, repositorio=None) -> tuple:
+    """
+    Lê os .cs de um ZIP/RAR, reaproveitando a extração guardada se o mesmo arquivo já foi recebido.
+
+    Args:
+        arquivo: Objeto de arquivo binário (com seek) contendo o ZIP/RAR
+        nome_arquivo: Nome original do arquivo (define o formato)
+        repositorio: Repositório de entregas (padrão: o compartilhado)
+
+    Returns:
+        Tupla (hash do arquivo compactado, dicionário caminho -> conteúdo dos .cs)
+
+    Raises:
+        ErroExtracao: Se o arquivo não puder ser lido; nada é guardado, e um novo envio é extraído de novo
+    """
+    repositorio = repositorio or obter_repositorio_entregas()
+    hash_conteudo = hash_arquivo(arquivo)
+    arquivos_cs = repositorio.obter_arquivo(hash_conteudo)
+    if arquivos_cs is None:
+        # Só extrações bem-sucedidas são guardadas: uma falha (ex: UnRAR ausente) não vira "sem código"
+        arquivos_cs = extrair_codigos(arquivo, nome_arquivo)
+        repositorio.guardar_arquivo(hash_conteudo, nome_arquivo, arquivos_cs)
+    return hash_conteudo, arquivos_cs
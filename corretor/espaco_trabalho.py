@@ -0,0 +1,54 @@
+import uuid
+
+class EspacoTrabalho:
+    """
+    Área isolada de uma execução de avaliação.
+
+    Guarda em memória as entregas da execução, sem arquivos em disco.
+    Execuções simultâneas (na mesma instância ou em vários workers) nunca
+    compartilham estado, e as entregas são liberadas ao final com `limpar()`
+    ou ao sair do bloco `with`.
+
+    Args:
+        id_execucao: Identificador da execução (padrão: gerado aleatoriamente)
+    """
+
+    def __init__(self, id_execucao=None):
+        self.id = id_execucao or uuid.uuid4().hex[:12]
+        self.entregas = {}
+        self.origens = {}
+
+    def adicionar_entrega(self, aluno: str, arquivos_cs: dict, origem: str = None):
+        """
+        Registra os arquivos .cs de um aluno; envios repetidos do mesmo aluno são mesclados.
+
+        Args:
+            aluno: Nome do aluno
+            arquivos_cs: Dicionário caminho -> conteúdo dos arquivos .cs
+            origem: Hash do arquivo compactado de onde vieram os arquivos (opcional)
+        """
+        self.entregas.setdefault(aluno, {}).update(arquivos_cs)
+        origens = self.origens.setdefault(aluno, [])
+        if origem is not None and origem not in origens:
+            origens.append(origem)
+
+    def substituir_entrega(self, aluno: str, arquivos_cs: dict, origens: list):
+        """Substitui por completo a entrega de um aluno (ex: reenvio em uma reavaliação)."""
+        self.entregas[aluno] = dict(arquivos_cs)
+        self.origens[aluno] = list(origens)
+
+    def entregas_ordenadas(self) -> dict:
+        """Retorna as entregas em ordem alfabética de aluno."""
+        return dict(sorted(self.entregas.items()))
+
+    def limpar(self):
+        """Libera as entregas da memória."""
+        self.entregas = {}
+        self.origens = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.limpar()
+        return False
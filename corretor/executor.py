@@ -0,0 +1,405 @@
+import os
+import re
+import glob
+import json
+import time
+import shlex
+import shutil
+import signal
+import difflib
+import hashlib
+import tempfile
+import threading
+import subprocess
+import unicodedata
+
+from corretor.preparacao import filtrar_arquivos
+from corretor.metricas import log, EXECUCOES_CODIGO
+
+# Compila e executa as entregas antes do modelo (ajustável via .env; uma requisição só pode desligar)
+EXECUTAR_CODIGO = os.getenv("CORRETOR_EXECUTAR_CODIGO", "0") == "1"
+# Ferramenta usada: "dotnet", "mono" ou "auto" (a primeira encontrada)
+COMPILADOR = os.getenv("CORRETOR_COMPILADOR", "auto")
+# Limites de cada execução: tempo (segundos), memória gerenciada (MB) e bytes de saída
+TEMPO_LIMITE = float(os.getenv("CORRETOR_TEMPO_LIMITE", "5"))
+MEMORIA_LIMITE_MB = int(os.getenv("CORRETOR_MEMORIA_LIMITE_MB", "256"))
+SAIDA_LIMITE = int(os.getenv("CORRETOR_SAIDA_LIMITE", "65536"))
+# Espaço de endereçamento de cada execução (MB; o runtime do .NET não inicia com menos de 4 GB)
+MEMORIA_VIRTUAL_MB = int(os.getenv("CORRETOR_MEMORIA_VIRTUAL_MB", "4096"))
+# Entregas compiladas/executadas ao mesmo tempo (0 = número de núcleos)
+PARALELISMO_EXECUCAO = int(os.getenv("CORRETOR_EXECUCAO_PARALELA", "0")) or os.cpu_count() or 1
+# Diretório do cache de compilações, por hash do código
+CAMINHO_COMPILACOES = os.getenv("CORRETOR_COMPILACOES", "./results/compilacoes")
+# Prefixo opcional para isolar a execução (ex: "unshare -rn" ou "firejail --quiet --net=none")
+SANDBOX = os.getenv("CORRETOR_SANDBOX", "")
+# Sem isolamento, o código do aluno lê os arquivos do servidor e acessa a rede: só com opção explícita
+EXECUCAO_SEM_ISOLAMENTO = os.getenv("CORRETOR_EXECUCAO_SEM_ISOLAMENTO", "0") == "1"
+
+# Erros de compilação que indicam falta de algo no ambiente (pacotes NuGet, WinForms,
+# vários projetos no mesmo ZIP), e não um erro do aluno: a decisão fica com o modelo
+ERROS_AMBIENTE = {"CS0006", "CS0017", "CS0234", "CS0246", "CS0518", "CS2001", "CS5001"}
+_PADRAO_ERRO = re.compile(r"error (CS\d{4})")
+# Mensagens do runtime que não conseguiu iniciar o programa (memória, instalação): falha do ambiente, não do aluno
+_PADRAO_FALHA_AMBIENTE = re.compile(
+    r"Failed to (?:create|initialize) CoreCLR|GC heap initialization failed|"
+    r"You must install or update \.NET|Cannot open assembly"
+)
+
+# Usings implícitos dos projetos .NET 6+ (os alunos costumam omiti-los)
+USINGS_IMPLICITOS = "\n".join(f"global using {ns};" for ns in (
+    "System", "System.Collections.Generic", "System.IO", "System.Linq",
+    "System.Net.Http", "System.Threading", "System.Threading.Tasks",
+))
+
+def _versao(texto):
+    return tuple(int(parte) for parte in re.findall(r"\d+", texto))
+
+class CompiladorDotnet:
+    """Compila com o Roslyn (csc) do .NET SDK, usando o servidor de compilação compartilhado."""
+
+    nome = "dotnet"
+
+    def __init__(self, dotnet):
+        self.dotnet = dotnet
+        raiz = os.path.dirname(os.path.realpath(dotnet))
+        sdk = max(os.listdir(os.path.join(raiz, "sdk")), key=_versao)
+        self.csc = os.path.join(raiz, "sdk", sdk, "Roslyn", "bincore", "csc.dll")
+        if not os.path.exists(self.csc):
+            raise ValueError(f"csc.dll não encontrado no SDK {sdk}")
+        runtime = max(os.listdir(os.path.join(raiz, "shared", "Microsoft.NETCore.App")), key=_versao)
+        self.tfm = "net{}.{}".format(*_versao(runtime)[:2])
+        # Assemblies de referência da mesma versão do runtime que vai executar o programa
+        pacotes = glob.glob(os.path.join(raiz, "packs", "Microsoft.NETCore.App.Ref", "*", "ref", self.tfm))
+        self.referencias = sorted(glob.glob(os.path.join(max(pacotes, key=_versao), "*.dll")))
+        self.versao = f"dotnet {sdk}/{runtime}"
+        self._runtime = runtime
+
+    def comando_compilacao(self, fontes, saida):
+        return [
+            self.dotnet, self.csc, "-shared", "-nologo", "-target:exe", "-langversion:latest",
+            f"-out:{saida}", *(f"-r:{ref}" for ref in self.referencias), *fontes
+        ]
+
+    def fontes_extras(self):
+        return {"UsingsImplicitos.cs": USINGS_IMPLICITOS}
+
+    def finalizar(self, saida):
+        # Sem o runtimeconfig, "dotnet exec" não sabe qual runtime carregar
+        with open(os.path.splitext(saida)[0] + ".runtimeconfig.json", "w", encoding="utf-8") as f:
+            json.dump({"runtimeOptions": {"tfm": self.tfm, "framework": {
+                "name": "Microsoft.NETCore.App", "version": self._runtime
+            }}}, f)
+
+    def comando_execucao(self, programa):
+        return [self.dotnet, "exec", "--runtimeconfig", os.path.splitext(programa)[0] + ".runtimeconfig.json", programa]
+
+    def ambiente(self):
+        return {
+            "DOTNET_ROOT": os.path.dirname(os.path.realpath(self.dotnet)),
+            "DOTNET_CLI_TELEMETRY_OPTOUT": "1",
+            "DOTNET_gcServer": "0",
+            # O mapeamento W^X do runtime usa um arquivo em memória que esbarraria no limite de tamanho de arquivo
+            "DOTNET_EnableWriteXorExecute": "0",
+            # Limite do heap gerenciado, em hexadecimal
+            "DOTNET_GCHeapHardLimit": format(MEMORIA_LIMITE_MB * 1024 * 1024, "x"),
+        }
+
+class CompiladorMono:
+    """Compila com o mcs e executa com o mono (sem usings implícitos nem top-level statements)."""
+
+    nome = "mono"
+
+    def __init__(self, mcs, mono):
+        self.mcs = mcs
+        self.mono = mono
+        self.versao = subprocess.run([mono, "--version"], capture_output=True, text=True).stdout.split("\n")[0]
+
+    def comando_compilacao(self, fontes, saida):
+        return [self.mcs, "-target:exe", f"-out:{saida}", *fontes]
+
+    def fontes_extras(self):
+        return {}
+
+    def finalizar(self, saida):
+        pass
+
+    def comando_execucao(self, programa):
+        return [self.mono, programa]
+
+    def ambiente(self):
+        return {"MONO_GC_PARAMS": f"max-heap-size={MEMORIA_LIMITE_MB}m"}
+
+def _detectar_compilador():
+    if COMPILADOR in ("auto", "dotnet"):
+        dotnet = shutil.which("dotnet") or os.path.expanduser("~/.dotnet/dotnet")
+        if os.path.exists(dotnet):
+            try:
+                return CompiladorDotnet(dotnet)
+            except (OSError, ValueError) as e:
+                log.warning("SDK do .NET incompleto em %s: %s", dotnet, e)
+    if COMPILADOR in ("auto", "mono"):
+        mcs, mono = shutil.which("mcs"), shutil.which("mono")
+        if mcs and mono:
+            return CompiladorMono(mcs, mono)
+    return None
+
+_compilador = None
+_compilador_detectado = False
+_compilador_lock = threading.Lock()
+
+def obter_compilador():
+    """Retorna o compilador disponível (detectado no primeiro uso), ou None se não houver nenhum."""
+    global _compilador, _compilador_detectado
+    with _compilador_lock:
+        if not _compilador_detectado:
+            _compilador = _detectar_compilador()
+            _compilador_detectado = True
+        return _compilador
+
+def execucao_habilitada(pedido=None) -> bool:
+    """
+    Indica se as entregas devem ser compiladas e executadas.
+
+    Args:
+        pedido: Valor enviado pelo cliente; False desliga a execução, mas True não a
+            liga se o servidor não estiver configurado com CORRETOR_EXECUTAR_CODIGO=1
+    """
+    if pedido is False or not EXECUTAR_CODIGO:
+        return False
+    if not SANDBOX and not EXECUCAO_SEM_ISOLAMENTO:
+        log.warning("Execução do código ignorada: defina CORRETOR_SANDBOX "
+                    "(ou CORRETOR_EXECUCAO_SEM_ISOLAMENTO=1 para executar sem isolamento)")
+        return False
+    return True
+
+def _prefixo_limites():
+    # Os limites são aplicados pelo prlimit antes do exec e herdados pelo sandbox, pelo programa e por seus filhos
+    return [
+        "prlimit", f"--as={MEMORIA_VIRTUAL_MB * 1024 * 1024}", f"--fsize={SAIDA_LIMITE}", "--core=0", "--",
+        *shlex.split(SANDBOX)
+    ]
+
+_limites_disponiveis = None
+_limites_lock = threading.Lock()
+
+def limites_disponiveis() -> bool:
+    """
+    Verifica (uma vez por processo) se os limites e o prefixo de CORRETOR_SANDBOX
+    conseguem iniciar um comando; sem isso, nenhuma entrega é executada.
+    """
+    global _limites_disponiveis
+    with _limites_lock:
+        if _limites_disponiveis is None:
+            try:
+                teste = subprocess.run(
+                    _prefixo_limites() + ["true"], capture_output=True, text=True, timeout=30,
+                    env={"PATH": "/usr/bin:/bin", "LANG": "C.UTF-8"}
+                )
+                _limites_disponiveis = teste.returncode == 0
+                motivo = teste.stderr.strip()
+            except (OSError, subprocess.TimeoutExpired) as e:
+                _limites_disponiveis, motivo = False, str(e)
+            if not _limites_disponiveis:
+                log.warning("Execução do código ignorada: não foi possível aplicar os limites (prlimit) e o sandbox: %s", motivo)
+        return _limites_disponiveis
+
+def _ambiente_execucao(compilador, pasta):
+    # Ambiente mínimo: o código do aluno não enxerga tokens nem outras variáveis do servidor
+    return {"PATH": "/usr/bin:/bin", "HOME": pasta, "TMPDIR": pasta, "LANG": "C.UTF-8", **compilador.ambiente()}
+
+def compilar(compilador, arquivos_cs: dict) -> dict:
+    """
+    Compila os arquivos .cs, reaproveitando a compilação de um código idêntico já compilado.
+    O compilador roda com o mesmo prefixo de isolamento (CORRETOR_SANDBOX) da execução, e só
+    resultados definitivos ("ok" ou erro do aluno) entram no cache: uma compilação "indeterminado"
+    (tempo esgotado, SDK ou dependência ausente) é refeita na próxima vez.
+
+    Returns:
+        Dicionário com "status" ("ok", "erro" ou "indeterminado"), as mensagens do
+        compilador, o caminho do programa (se compilou) e se veio do cache
+    """
+    arquivos, _ = filtrar_arquivos(arquivos_cs)
+    fontes = {**{f"{i}_{os.path.basename(caminho.replace(chr(92), '/'))}": conteudo
+                 for i, (caminho, conteudo) in enumerate(sorted(arquivos.items()))},
+              **compilador.fontes_extras()}
+    digest = hashlib.sha256(compilador.versao.encode("utf-8"))
+    for nome, conteudo in sorted(fontes.items()):
+        digest.update(b"\0" + nome.encode("utf-8") + b"\0" + conteudo.encode("utf-8"))
+    chave = digest.hexdigest()
+    destino = os.path.join(os.path.abspath(CAMINHO_COMPILACOES), chave[:2], chave)
+    programa = os.path.join(destino, "programa.dll")
+
+    if not os.path.exists(os.path.join(destino, "compilacao.json")):
+        inicio = time.perf_counter()
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+        temporario = tempfile.mkdtemp(prefix=f".{chave[:8]}_", dir=os.path.dirname(destino))
+        try:
+            caminhos = []
+            for nome, conteudo in fontes.items():
+                caminhos.append(os.path.join(temporario, nome))
+                with open(caminhos[-1], "w", encoding="utf-8") as f:
+                    f.write(conteudo)
+            try:
+                processo = subprocess.run(
+                    shlex.split(SANDBOX) + compilador.comando_compilacao(caminhos, os.path.join(temporario, "programa.dll")),
+                    capture_output=True, text=True, timeout=120, cwd=temporario
+                )
+                mensagens = [linha.replace(temporario + os.sep, "") for linha in processo.stdout.splitlines()
+                             if " error " in linha]
+                codigos = set(_PADRAO_ERRO.findall(processo.stdout))
+                if processo.returncode == 0:
+                    status = "ok"
+                    compilador.finalizar(os.path.join(temporario, "programa.dll"))
+                else:
+                    status = "indeterminado" if not codigos or codigos & ERROS_AMBIENTE else "erro"
+            except subprocess.TimeoutExpired:
+                status, mensagens = "indeterminado", ["Tempo de compilação esgotado"]
+            except OSError as e:
+                status, mensagens = "indeterminado", [f"Não foi possível iniciar o compilador: {e}"]
+
+            resultado = {"status": status, "mensagens": mensagens[:20],
+                         "segundos": round(time.perf_counter() - inicio, 3)}
+            if status == "indeterminado":
+                # Falha do ambiente, não do código: nada é guardado, e a próxima vez compila de novo
+                return {**resultado, "em_cache": False, "programa": None}
+            with open(os.path.join(temporario, "compilacao.json"), "w", encoding="utf-8") as f:
+                json.dump(resultado, f, ensure_ascii=False)
+            # Renomear é atômico: outra thread que compilou o mesmo código ao mesmo tempo apenas descarta a sua cópia
+            try:
+                os.rename(temporario, destino)
+            except OSError:
+                pass
+        finally:
+            shutil.rmtree(temporario, ignore_errors=True)
+        em_cache = False
+    else:
+        em_cache = True
+
+    with open(os.path.join(destino, "compilacao.json"), encoding="utf-8") as f:
+        resultado = json.load(f)
+    resultado["em_cache"] = em_cache
+    resultado["programa"] = programa if resultado["status"] == "ok" else None
+    return resultado
+
+def normalizar_saida(texto: str) -> str:
+    """Minúsculas, sem acentos e com os espaços compactados, para comparar saídas."""
+    sem_acentos = "".join(c for c in unicodedata.normalize("NFKD", texto) if not unicodedata.combining(c))
+    return "\n".join(" ".join(linha.split()) for linha in sem_acentos.lower().splitlines())
+
+def tem_saida_esperada(caso: dict) -> bool:
+    """Verifica se o caso de teste tem alguma linha de saída esperada para conferir."""
+    return bool(normalizar_saida(caso.get("saida", "")).strip())
+
+def saida_confere(esperada: str, obtida: str) -> bool:
+    """
+    Verifica se cada linha esperada aparece na saída, na mesma ordem.
+    Mensagens extras do programa (ex: "Digite o nome:") são toleradas.
+    """
+    texto = normalizar_saida(obtida)
+    posicao = 0
+    for linha in normalizar_saida(esperada).splitlines():
+        if not linha:
+            continue
+        encontrada = texto.find(linha, posicao)
+        if encontrada < 0:
+            return False
+        posicao = encontrada + len(linha)
+    return True
+
+def executar_programa(compilador, programa: str, entrada: str) -> dict:
+    """
+    Executa o programa compilado em um diretório temporário, com ambiente mínimo e
+    limites de tempo, memória e tamanho da saída, aplicados antes de o programa iniciar.
+
+    Returns:
+        Dicionário com "status" ("ok", "erro_execucao", "tempo_esgotado", "saida_excedida"
+        ou "falha_ambiente", se o programa nem chegou a iniciar), a saída obtida e a duração
+    """
+    with tempfile.TemporaryDirectory(prefix="corretor_exec_") as pasta, \
+            tempfile.TemporaryFile() as arquivo_entrada, tempfile.TemporaryFile() as arquivo_saida:
+        arquivo_entrada.write(entrada.encode("utf-8"))
+        arquivo_entrada.seek(0)
+        inicio = time.perf_counter()
+        try:
+            processo = subprocess.Popen(
+                _prefixo_limites() + compilador.comando_execucao(programa),
+                stdin=arquivo_entrada, stdout=arquivo_saida, stderr=subprocess.STDOUT,
+                cwd=pasta, env=_ambiente_execucao(compilador, pasta), start_new_session=True
+            )
+        except OSError as e:
+            return {"status": "falha_ambiente", "saida": str(e), "segundos": round(time.perf_counter() - inicio, 3)}
+        try:
+            codigo = processo.wait(timeout=TEMPO_LIMITE)
+            status = "ok" if codigo == 0 else "erro_execucao"
+            if codigo == -getattr(signal, "SIGXFSZ", 0):
+                status = "saida_excedida"
+        except subprocess.TimeoutExpired:
+            status = "tempo_esgotado"
+        finally:
+            # Encerra também os processos filhos que o programa tenha criado
+            try:
+                os.killpg(processo.pid, signal.SIGKILL)
+            except AttributeError:
+                processo.kill()
+            except (ProcessLookupError, PermissionError):
+                pass
+            processo.wait()
+        arquivo_saida.seek(0)
+        saida = arquivo_saida.read(SAIDA_LIMITE).decode("utf-8", errors="replace")
+        if status == "erro_execucao" and _PADRAO_FALHA_AMBIENTE.search(saida):
+            status = "falha_ambiente"
+
+    return {"status": status, "saida": saida, "segundos": round(time.perf_counter() - inicio, 3)}
+
+def avaliar_execucao(arquivos_cs: dict, casos: list) -> dict:
+    """
+    Compila a entrega e executa cada caso de teste (entrada -> saída esperada).
+
+    O veredito só é dado quando o resultado é claro: "reprovado" se o código não
+    compila por erro do aluno ou se todos os casos terminam em erro ou tempo
+    esgotado; "aprovado" se todos os casos conferem. Nos demais casos (saída
+    diferente em parte dos casos, erro do ambiente ou programa que não chegou a
+    iniciar, nenhum caso de teste) o veredito é None e a entrega segue para o modelo. Casos sem saída esperada
+    não decidem nada (qualquer saída conferiria) e são ignorados.
+
+    Args:
+        arquivos_cs: Dicionário caminho -> conteúdo dos arquivos .cs do aluno
+        casos: Lista de {"entrada": str, "saida": str}
+
+    Returns:
+        Dicionário com "veredito", o resultado da compilação e o de cada caso
+    """
+    casos = [caso for caso in casos if tem_saida_esperada(caso)]
+    compilador = obter_compilador()
+    if compilador is None:
+        return {"veredito": None, "compilacao": {"status": "indeterminado", "mensagens": ["Nenhum compilador C# encontrado"]}}
+
+    if not limites_disponiveis():
+        return {"veredito": None, "compilacao": {
+            "status": "indeterminado", "mensagens": ["Não foi possível aplicar os limites de execução"]
+        }}
+
+    compilacao = compilar(compilador, arquivos_cs)
+    relatorio = {"veredito": None, "compilacao": {k: v for k, v in compilacao.items() if k != "programa"}, "casos": []}
+    if compilacao["status"] == "erro":
+        relatorio["veredito"] = "reprovado"
+    elif compilacao["status"] == "ok" and casos:
+        for caso in casos:
+            execucao = executar_programa(compilador, compilacao["programa"], caso.get("entrada", ""))
+            esperada = caso.get("saida", "")
+            if execucao["status"] == "ok" and not saida_confere(esperada, execucao["saida"]):
+                execucao["status"] = "saida_diferente"
+                execucao["diff"] = list(difflib.unified_diff(
+                    normalizar_saida(esperada).splitlines(), normalizar_saida(execucao["saida"]).splitlines(),
+                    "esperada", "obtida", lineterm="", n=1
+                ))[:40]
+            relatorio["casos"].append({"entrada": caso.get("entrada", ""), "esperada": esperada, **execucao})
+
+        situacoes = {caso["status"] for caso in relatorio["casos"]}
+        if situacoes == {"ok"}:
+            relatorio["veredito"] = "aprovado"
+        elif situacoes <= {"erro_execucao", "tempo_esgotado", "saida_excedida"}:
+            relatorio["veredito"] = "reprovado"
+
+    EXECUCOES_CODIGO.incrementar(veredito=relatorio["veredito"] or "indeterminado")
+    return relatorio
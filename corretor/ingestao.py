@@ -0,0 +1,97 @@
+import os
+import zipfile
+import rarfile
+
+from corretor.metricas import log, etapa, ARQUIVOS_RECEBIDOS, ARQUIVOS_CS, BYTES_CS
+
+# Pastas geradas por IDEs, compiladores e gerenciadores de pacote: nunca contêm código do aluno
+PASTAS_IGNORADAS = {"bin", "obj", ".vs", ".vscode", ".idea", ".git", "packages", "node_modules", "__macosx"}
+
+# Limites por arquivo compactado (ajustáveis via .env)
+MAX_BYTES_POR_ARQUIVO = int(os.getenv("CORRETOR_MAX_BYTES_ARQUIVO", str(5 * 1024 * 1024)))
+MAX_ARQUIVOS_CS = int(os.getenv("CORRETOR_MAX_ARQUIVOS_CS", "500"))
+
+EXTENSOES_SUPORTADAS = {".zip", ".rar"}
+
+class ErroExtracao(Exception):
+    """Levantada quando não é possível ler um arquivo compactado (inválido, formato não suportado ou sem UnRAR)."""
+
+def _membro_relevante(caminho: str) -> bool:
+    """Indica se o membro do arquivo compactado é um .cs fora das pastas ignoradas."""
+    partes = caminho.replace("\\", "/").split("/")
+    if not partes[-1].lower().endswith(".cs"):
+        return False
+    return not any(parte.lower() in PASTAS_IGNORADAS for parte in partes[:-1])
+
+def _ler_membros(compactado, membros, nome_arquivo, max_bytes, max_arquivos):
+    """Lê para a memória os membros relevantes, respeitando os limites do arquivo."""
+    codigos = {}
+    total_bytes = 0
+
+    for info, caminho, tamanho in membros:
+        if not _membro_relevante(caminho):
+            continue
+        if len(codigos) >= max_arquivos:
+            log.warning("Aviso em %s: limite de %d arquivos .cs atingido, restante ignorado", nome_arquivo, max_arquivos)
+            break
+        if total_bytes + tamanho > max_bytes:
+            log.warning("Aviso em %s: limite de %d bytes atingido, ignorando %s", nome_arquivo, max_bytes, caminho)
+            continue
+
+        conteudo = compactado.read(info)
+        total_bytes += len(conteudo)
+        codigos[caminho.replace("\\", "/")] = conteudo.decode("utf-8", errors="ignore")
+
+    ARQUIVOS_CS.incrementar(len(codigos))
+    BYTES_CS.incrementar(total_bytes)
+
+    return codigos
+
+def extrair_codigos(arquivo, nome_arquivo: str,
+                    max_bytes: int = MAX_BYTES_POR_ARQUIVO,
+                    max_arquivos: int = MAX_ARQUIVOS_CS) -> dict:
+    """
+    Lê os arquivos .cs de um ZIP/RAR diretamente do fluxo recebido, sem gravar
+    o arquivo compactado nem a árvore extraída em disco.
+
+    Args:
+        arquivo: Objeto de arquivo (com seek) contendo o ZIP/RAR
+        nome_arquivo: Nome original do arquivo (define o formato e aparece nas mensagens)
+        max_bytes: Total máximo de bytes de código .cs lidos do arquivo
+        max_arquivos: Número máximo de arquivos .cs lidos do arquivo
+
+    Returns:
+        Dicionário caminho relativo -> conteúdo de cada arquivo .cs, em ordem alfabética
+        (vazio se o arquivo não tiver nenhum .cs)
+
+    Raises:
+        ErroExtracao: Se o arquivo for inválido, de formato não suportado ou não puder ser lido
+    """
+    extensao = os.path.splitext(nome_arquivo)[1].lower()
+    ARQUIVOS_RECEBIDOS.incrementar(formato=extensao.lstrip(".") or "desconhecido")
+
+    with etapa("extracao"):
+        return _extrair(arquivo, nome_arquivo, extensao, max_bytes, max_arquivos)
+
+def _extrair(arquivo, nome_arquivo, extensao, max_bytes, max_arquivos):
+    if extensao == '.zip':
+        try:
+            with zipfile.ZipFile(arquivo, 'r') as zip_ref:
+                membros = [(info, info.filename, info.file_size) for info in zip_ref.infolist() if not info.is_dir()]
+                codigos = _ler_membros(zip_ref, sorted(membros, key=lambda m: m[1]), nome_arquivo, max_bytes, max_arquivos)
+        except zipfile.BadZipFile:
+            raise ErroExtracao(f"Erro ao extrair {nome_arquivo}: arquivo ZIP inválido")
+    elif extensao == '.rar':
+        try:
+            # Membros comprimidos ainda passam pelo UnRAR, mas apenas os .cs são lidos
+            with rarfile.RarFile(arquivo, 'r') as rar_ref:
+                membros = [(info, info.filename, info.file_size) for info in rar_ref.infolist() if not info.is_dir()]
+                codigos = _ler_membros(rar_ref, sorted(membros, key=lambda m: m[1]), nome_arquivo, max_bytes, max_arquivos)
+        except rarfile.BadRarFile:
+            raise ErroExtracao(f"Erro ao extrair {nome_arquivo}: arquivo RAR inválido")
+        except rarfile.RarCannotExec:
+            raise ErroExtracao(f"Erro ao extrair {nome_arquivo}: necessário instalar UnRAR")
+    else:
+        raise ErroExtracao(f"Formato não suportado: {extensao}")
+
+    return codigos
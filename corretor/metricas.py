@@ -0,0 +1,231 @@
+import os
+import time
+import logging
+import threading
+import contextlib
+import contextvars
+
+# Logger do pacote; mensagens de depuração só são montadas se CORRETOR_LOG=DEBUG
+log = logging.getLogger("corretor")
+
+# Limites (segundos) dos baldes dos histogramas de duração
+BALDES_PADRAO = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+def _escapar(valor) -> str:
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _rotulos_texto(rotulos) -> str:
+    if not rotulos:
+        return ""
+    return "{" + ",".join(f'{nome}="{_escapar(valor)}"' for nome, valor in rotulos) + "}"
+
+def _numero(valor) -> str:
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+class Contador:
+    """Contador monotônico com rótulos, no formato de métricas do Prometheus."""
+
+    tipo = "counter"
+
+    def __init__(self, nome, ajuda):
+        self.nome = nome
+        self.ajuda = ajuda
+        self._valores = {}
+        self._lock = threading.Lock()
+
+    def incrementar(self, valor=1, **rotulos):
+        chave = tuple(sorted(rotulos.items()))
+        with self._lock:
+            self._valores[chave] = self._valores.get(chave, 0) + valor
+
+    def valor(self, **rotulos):
+        with self._lock:
+            return self._valores.get(tuple(sorted(rotulos.items())), 0)
+
+    def amostras(self):
+        with self._lock:
+            return [(self.nome, chave, valor) for chave, valor in sorted(self._valores.items())]
+
+class Histograma:
+    """Histograma cumulativo com rótulos (baldes, soma e contagem), no formato do Prometheus."""
+
+    tipo = "histogram"
+
+    def __init__(self, nome, ajuda, baldes=BALDES_PADRAO):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.baldes = tuple(sorted(baldes))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observar(self, valor, **rotulos):
+        chave = tuple(sorted(rotulos.items()))
+        with self._lock:
+            serie = self._series.get(chave)
+            if serie is None:
+                serie = self._series[chave] = [[0] * len(self.baldes), 0.0, 0]
+            for i, limite in enumerate(self.baldes):
+                if valor <= limite:
+                    serie[0][i] += 1
+            serie[1] += valor
+            serie[2] += 1
+
+    def amostras(self):
+        amostras = []
+        with self._lock:
+            for chave, (contagens, soma, total) in sorted(self._series.items()):
+                for limite, contagem in zip(self.baldes, contagens):
+                    amostras.append((f"{self.nome}_bucket", chave + (("le", _numero(float(limite))),), contagem))
+                amostras.append((f"{self.nome}_bucket", chave + (("le", "+Inf"),), total))
+                amostras.append((f"{self.nome}_sum", chave, soma))
+                amostras.append((f"{self.nome}_count", chave, total))
+        return amostras
+
+class Medidor:
+    """Valor instantâneo calculado no momento da exportação (ex: cota restante)."""
+
+    tipo = "gauge"
+
+    def __init__(self, nome, ajuda, funcao):
+        self.nome = nome
+        self.ajuda = ajuda
+        self._funcao = funcao
+
+    def amostras(self):
+        # A função retorna um dicionário {tupla de rótulos: valor}
+        return [(self.nome, chave, valor) for chave, valor in sorted(self._funcao().items())]
+
+class RegistroMetricas:
+    """Conjunto das métricas do processo, exportadas no formato texto do Prometheus."""
+
+    def __init__(self):
+        self._metricas = {}
+        self._lock = threading.Lock()
+
+    def _registrar(self, metrica):
+        with self._lock:
+            return self._metricas.setdefault(metrica.nome, metrica)
+
+    def contador(self, nome, ajuda) -> Contador:
+        return self._registrar(Contador(nome, ajuda))
+
+    def histograma(self, nome, ajuda, baldes=BALDES_PADRAO) -> Histograma:
+        return self._registrar(Histograma(nome, ajuda, baldes))
+
+    def medidor(self, nome, ajuda, funcao) -> Medidor:
+        with self._lock:
+            self._metricas[nome] = Medidor(nome, ajuda, funcao)
+            return self._metricas[nome]
+
+    def exportar(self) -> str:
+        with self._lock:
+            metricas = list(self._metricas.values())
+        linhas = []
+        for metrica in metricas:
+            linhas.append(f"# HELP {metrica.nome} {metrica.ajuda}")
+            linhas.append(f"# TYPE {metrica.nome} {metrica.tipo}")
+            for nome, rotulos, valor in metrica.amostras():
+                linhas.append(f"{nome}{_rotulos_texto(rotulos)} {_numero(valor)}")
+        return "\n".join(linhas) + "\n"
+
+registro = RegistroMetricas()
+
+# Métricas do pipeline
+ETAPAS = registro.histograma("corretor_etapa_segundos", "Duração de cada etapa da avaliação")
+ARQUIVOS_RECEBIDOS = registro.contador("corretor_arquivos_recebidos_total", "Arquivos ZIP/RAR recebidos")
+ARQUIVOS_CS = registro.contador("corretor_arquivos_cs_total", "Arquivos .cs lidos dos arquivos compactados")
+BYTES_CS = registro.contador("corretor_bytes_cs_total", "Bytes de código .cs lidos dos arquivos compactados")
+ALUNOS = registro.contador("corretor_alunos_avaliados_total", "Alunos avaliados, por modo")
+MODELO_LATENCIA = registro.histograma("corretor_modelo_latencia_segundos", "Latência das chamadas ao modelo")
+MODELO_CHAMADAS = registro.contador("corretor_modelo_chamadas_total", "Chamadas ao modelo, por operação e resultado")
+MODELO_TOKENS = registro.contador("corretor_modelo_tokens_total", "Tokens informados pelo modelo (entrada e saída)")
+MODELO_RATE_LIMITS = registro.contador("corretor_modelo_rate_limit_total", "Respostas de rate limit do servidor")
+MODELO_RATE_LIMIT_ESPERA = registro.contador(
+    "corretor_modelo_rate_limit_espera_segundos_total", "Espera imposta por respostas de rate limit"
+)
+COTA_ESPERA = registro.histograma("corretor_cota_espera_segundos", "Espera na fila do limitador antes de cada chamada")
+COTA_ESGOTADA = registro.contador("corretor_cota_esgotada_total", "Chamadas desistidas por falta de cota")
+CACHE_CONSULTAS = registro.contador("corretor_cache_consultas_total", "Consultas ao cache de avaliações, por resultado")
+CACHE_ARQUIVOS = registro.contador(
+    "corretor_cache_arquivos_total", "Arquivos .cs resolvidos pelo cache de arquivos (acerto) ou lidos de novo (falha)"
+)
+ALUNOS_AGRUPADOS = registro.contador(
+    "corretor_alunos_agrupados_total", "Alunos que receberam a avaliação de uma entrega equivalente, por modo"
+)
+TOKENS_ECONOMIZADOS = registro.contador(
+    "corretor_tokens_economizados_total", "Tokens estimados removidos do código antes do envio ao modelo"
+)
+CRITERIOS_COMPLEMENTADOS = registro.contador(
+    "corretor_criterios_complementados_total", "Critérios ausentes na resposta do modelo pedidos de novo, por operação"
+)
+EXECUCOES_CODIGO = registro.contador(
+    "corretor_execucoes_codigo_total", "Entregas compiladas e executadas antes do modelo, por veredito"
+)
+
+class TemposExecucao:
+    """Soma das durações de cada etapa dentro de uma execução (uma requisição ou tarefa)."""
+
+    def __init__(self):
+        self._inicio = time.perf_counter()
+        self._etapas = {}
+        self._lock = threading.Lock()
+
+    def registrar(self, etapa, segundos):
+        with self._lock:
+            atual = self._etapas.setdefault(etapa, [0, 0.0])
+            atual[0] += 1
+            atual[1] += segundos
+
+    def resumo(self) -> dict:
+        """Retorna o tempo total e, por etapa, o número de ocorrências e os segundos somados."""
+        with self._lock:
+            etapas = {
+                etapa: {"ocorrencias": ocorrencias, "segundos": round(segundos, 4)}
+                for etapa, (ocorrencias, segundos) in self._etapas.items()
+            }
+        return {"total_segundos": round(time.perf_counter() - self._inicio, 4), "etapas": etapas}
+
+_execucao_atual = contextvars.ContextVar("corretor_execucao", default=None)
+
+@contextlib.contextmanager
+def execucao():
+    """
+    Delimita uma execução cujas etapas entram no resumo de tempos.
+    Se já houver uma execução em andamento no contexto, ela é reaproveitada.
+    """
+    atual = _execucao_atual.get()
+    if atual is not None:
+        yield atual
+        return
+    tempos = TemposExecucao()
+    token = _execucao_atual.set(tempos)
+    try:
+        yield tempos
+    finally:
+        _execucao_atual.reset(token)
+
+def registrar_tempo(etapa, segundos):
+    """Soma a duração ao resumo da execução atual, se houver uma."""
+    tempos = _execucao_atual.get()
+    if tempos is not None:
+        tempos.registrar(etapa, segundos)
+
+@contextlib.contextmanager
+def etapa(nome):
+    """Mede a duração do bloco no histograma de etapas e no resumo da execução atual."""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        duracao = time.perf_counter() - inicio
+        ETAPAS.observar(duracao, etapa=nome)
+        registrar_tempo(nome, duracao)
+
+def configurar_log():
+    """Configura o logger do pacote com o nível de CORRETOR_LOG (padrão: INFO)."""
+    nivel = os.getenv("CORRETOR_LOG", "INFO").upper()
+    if not log.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+        log.addHandler(handler)
+    log.setLevel(nivel)
@@ -1,23 +1,492 @@
 import os
-from dotenv import load_dotenv
-from openai import OpenAI
+import re
+import json
+import time
+import threading
 
-# Carregar variáveis de ambiente
-load_dotenv()
-
-# Token GitHub
-token = os.getenv("GITHUB_TOKEN")
-if not token:
-    raise Exception("Variável GITHUB_TOKEN não encontrada no .env")
+from corretor.cache import obter_cache, chave_avaliacao
+from corretor.cota import obter_repositorio_cotas, CAMINHO_COTA
+from corretor.criterios import obter_repositorio
+from corretor.provedores import obter_cliente, PROVEDOR_PADRAO
+from corretor.preparacao import estimar_tokens, preparar_codigo
+from corretor.avaliador import filtrar_criterios
+from corretor.resultados import texto_criterio
+from corretor.metricas import (
+    log, registro, execucao, etapa, registrar_tempo, MODELO_LATENCIA, MODELO_CHAMADAS, MODELO_TOKENS,
+    MODELO_RATE_LIMITS, MODELO_RATE_LIMIT_ESPERA, COTA_ESPERA, COTA_ESGOTADA, CACHE_CONSULTAS,
+    CRITERIOS_COMPLEMENTADOS
+)
 
-# Configuração do modelo e cliente
-endpoint = "https://models.github.ai/inference"
+# Modelo padrão (o cliente é criado sob demanda em corretor.provedores; outras cadeias em CORRETOR_MODELOS)
 model_name = "openai/gpt-4o"
 
-client = OpenAI(
-    base_url=endpoint,
-    api_key=token,
-)
+def escopo_provedor() -> str:
+    """Escopo do provedor em uso nos repositórios ("" para o provedor padrão do GitHub)."""
+    return "" if PROVEDOR_PADRAO == "github" else PROVEDOR_PADRAO
+
+def identificador_modelo(operacao: str = "avaliacao") -> str:
+    """
+    Identifica os modelos e provedores que atendem a operação, para registro e chaves de cache.
+    Avaliações de provedores ou cadeias de modelos diferentes (ex: o provedor local) nunca se misturam.
+    """
+    return "|".join(backend.identificador for backend in obter_roteador().cadeia(operacao))
+
+# Limites do GitHub Models para o gpt-4o (ajustáveis via .env)
+LIMITE_POR_MINUTO = int(os.getenv("CORRETOR_LIMITE_MINUTO", "10"))
+LIMITE_POR_DIA = int(os.getenv("CORRETOR_LIMITE_DIA", "50"))
+# Espera máxima aceitável na fila antes de desistir da chamada (segundos)
+ESPERA_MAXIMA = float(os.getenv("CORRETOR_ESPERA_MAXIMA", "300"))
+
+# Orçamento de tokens de uma requisição de avaliação em lote (0 desativa o lote)
+TOKENS_POR_LOTE = int(os.getenv("CORRETOR_TOKENS_LOTE", "6000"))
+# Número máximo de alunos em uma mesma requisição em lote
+MAX_ALUNOS_POR_LOTE = int(os.getenv("CORRETOR_ALUNOS_LOTE", "8"))
+
+# Pede a avaliação com response_format (JSON schema montado a partir do checklist)
+SAIDA_ESTRUTURADA = os.getenv("CORRETOR_SAIDA_ESTRUTURADA", "1") == "1"
+# Chamadas extras, só com os critérios que faltaram na resposta, antes de desistir do aluno
+MAX_COMPLEMENTOS = int(os.getenv("CORRETOR_COMPLEMENTOS", "1"))
+
+class CotaEsgotada(Exception):
+    """Levantada quando a próxima chamada ao modelo exigiria esperar mais que o permitido."""
+
+    def __init__(self, espera):
+        super().__init__(f"Cota de chamadas ao modelo esgotada. Próxima chamada disponível em {espera:.0f} segundos")
+        self.espera = espera
+
+class _Balde:
+    """Balde de fichas: `capacidade` chamadas, reabastecidas ao longo de `periodo` segundos."""
+
+    def __init__(self, capacidade, periodo, agora):
+        self.capacidade = capacidade
+        self.taxa = capacidade / periodo
+        self.fichas = float(capacidade)
+        self.atualizado = agora
+
+    def reabastecer(self, agora):
+        decorrido = max(0.0, agora - self.atualizado)
+        self.fichas = min(self.capacidade, self.fichas + decorrido * self.taxa)
+        self.atualizado = agora
+
+    def espera(self, n=1):
+        faltam = n - self.fichas
+        return 0.0 if faltam <= 0 else faltam / self.taxa
+
+    def consumir(self, n=1) -> bool:
+        """Consome `n` fichas (o chamador já verificou que há fichas)."""
+        self.fichas -= n
+        return True
+
+class _BaldePersistente(_Balde):
+    """
+    Balde de fichas guardado no repositório de cotas (CORRETOR_COTA): o saldo sobrevive a
+    reinícios e é um só para todos os processos. Usa o relógio de parede, não o do limitador.
+    """
+
+    def __init__(self, chave, capacidade, periodo):
+        super().__init__(capacidade, periodo, 0.0)
+        self.chave = chave
+        self.periodo = periodo
+
+    def reabastecer(self, agora):
+        # Só leitura: consultas (roteamento, /cota, /metrics) não disputam a escrita do banco
+        self.fichas = obter_repositorio_cotas().consultar(self.chave, self.capacidade, self.periodo)
+
+    def consumir(self, n=1) -> bool:
+        """Consome `n` fichas se ainda houver (outro processo pode ter consumido as últimas)."""
+        restante = obter_repositorio_cotas().consumir(self.chave, self.capacidade, self.periodo, n)
+        self.fichas = restante if restante >= 0 else n + restante
+        return restante >= 0
+
+class LimitadorTaxa:
+    """
+    Limitador de taxa compartilhado por todas as chamadas ao modelo.
+
+    Mantém um balde de fichas por minuto e outro por dia. Cada chamada consome
+    uma ficha de cada balde; quando não há fichas, a chamada aguarda na fila
+    até que o orçamento seja reabastecido, distribuindo as chamadas no tempo.
+
+    O balde por minuto é do processo. Com `chave`, o balde por dia fica no
+    repositório de cotas (CORRETOR_COTA) e é compartilhado por todos os
+    processos e reinícios; sem ela, também fica só na memória.
+
+    Args:
+        por_minuto: Chamadas permitidas por minuto
+        por_dia: Chamadas permitidas por dia
+        relogio: Função que retorna o tempo atual em segundos (substituível em testes)
+        dormir: Função usada para aguardar (substituível em testes)
+        chave: Identificador da cota diária persistente (ex: o modelo); None a mantém na memória
+    """
+
+    def __init__(self, por_minuto=LIMITE_POR_MINUTO, por_dia=LIMITE_POR_DIA,
+                 relogio=time.monotonic, dormir=time.sleep, chave=None):
+        self._relogio = relogio
+        self._dormir = dormir
+        self._chave = chave
+        self._lock = threading.Lock()
+        agora = relogio()
+        self._minuto = _Balde(por_minuto, 60, agora)
+        self._dia = self._balde_dia(por_dia, agora)
+        self._bloqueado_ate = agora
+
+    def _balde_dia(self, por_dia, agora):
+        if self._chave and CAMINHO_COTA:
+            return _BaldePersistente(self._chave, por_dia, 24 * 60 * 60)
+        return _Balde(por_dia, 24 * 60 * 60, agora)
+
+    def _espera(self, agora, n=1):
+        self._minuto.reabastecer(agora)
+        self._dia.reabastecer(agora)
+        return max(self._minuto.espera(n), self._dia.espera(n), self._bloqueado_ate - agora, 0.0)
+
+    def espera_estimada(self, n=1):
+        """Segundos até que `n` chamadas possam ser feitas em sequência."""
+        with self._lock:
+            return self._espera(self._relogio(), n)
+
+    def orcamento(self):
+        """Retorna o orçamento restante e a espera estimada para a próxima chamada."""
+        with self._lock:
+            agora = self._relogio()
+            espera = self._espera(agora)
+            return {
+                "restante_minuto": int(self._minuto.fichas),
+                "restante_dia": int(self._dia.fichas),
+                "limite_minuto": self._minuto.capacidade,
+                "limite_dia": self._dia.capacidade,
+                "espera_estimada": round(espera, 2)
+            }
+
+    def adquirir(self, espera_maxima=ESPERA_MAXIMA):
+        """
+        Reserva uma chamada, aguardando até que haja orçamento disponível.
+
+        Args:
+            espera_maxima: Espera máxima em segundos (None para aguardar indefinidamente)
+
+        Raises:
+            CotaEsgotada: Se a espera necessária ultrapassar espera_maxima
+        """
+        while True:
+            with self._lock:
+                agora = self._relogio()
+                espera = self._espera(agora)
+                if espera <= 0:
+                    if self._dia.consumir():
+                        self._minuto.consumir()
+                        return
+                    # Outro processo consumiu a última ficha do dia: recalcula a espera
+                    continue
+                if espera_maxima is not None and espera > espera_maxima:
+                    raise CotaEsgotada(espera)
+            self._dormir(espera)
+
+    def configurar(self, por_minuto, por_dia):
+        """Redefine os limites do limitador, com os baldes cheios (a cota diária persistente mantém o saldo)."""
+        with self._lock:
+            agora = self._relogio()
+            self._minuto = _Balde(por_minuto, 60, agora)
+            self._dia = self._balde_dia(por_dia, agora)
+
+    def bloquear(self, segundos):
+        """Suspende todas as chamadas por `segundos` (usado quando o servidor recusa por rate limit)."""
+        with self._lock:
+            agora = self._relogio()
+            self._bloqueado_ate = max(self._bloqueado_ate, agora + segundos)
+            # O servidor indicou que o minuto está esgotado: zera as fichas locais
+            self._minuto.reabastecer(agora)
+            self._minuto.fichas = min(self._minuto.fichas, 0.0)
+
+limitador = LimitadorTaxa(chave=model_name if PROVEDOR_PADRAO == "github" else f"{PROVEDOR_PADRAO}:{model_name}")
+
+# Cadeias de modelos, em ordem de preferência: "provedor:modelo" ou "provedor:modelo@por_minuto/por_dia",
+# separados por vírgula. CORRETOR_MODELOS vale para todas as operações; as outras substituem a camada
+MODELOS = os.getenv("CORRETOR_MODELOS", "")
+MODELOS_CRITERIOS = os.getenv("CORRETOR_MODELOS_CRITERIOS", "")
+MODELOS_AVALIACAO = os.getenv("CORRETOR_MODELOS_AVALIACAO", "")
+
+# Camada de modelos usada por cada operação
+CAMADAS = {"criterios": "criterios", "casos": "criterios", "avaliacao": "avaliacao", "avaliacao_lote": "avaliacao"}
+
+# Peso da observação mais recente nas médias móveis de latência e de erros
+PESO_OBSERVACAO = 0.3
+
+class BackendModelo:
+    """
+    Um modelo em um provedor, com cota própria e o histórico recente de latência e erros.
+
+    Args:
+        provedor: Nome do provedor registrado em corretor.provedores
+        modelo: Nome do modelo enviado na chamada
+        limitador_taxa: Limitador de taxa exclusivo deste backend
+    """
+
+    def __init__(self, provedor, modelo, limitador_taxa):
+        self.provedor = provedor
+        self.modelo = modelo
+        self.limitador = limitador_taxa
+        self.identificador = modelo if provedor == "github" else f"{provedor}:{modelo}"
+        # Passa a False se o backend recusar o response_format com JSON schema
+        self.aceita_esquema = True
+        self._latencias = {}
+        self.taxa_erros = 0.0
+        self._lock = threading.Lock()
+
+    def registrar(self, operacao, latencia, erro):
+        """Atualiza as médias móveis de latência (por operação) e de erros."""
+        with self._lock:
+            if not erro:
+                anterior = self._latencias.get(operacao)
+                self._latencias[operacao] = latencia if anterior is None else (
+                    PESO_OBSERVACAO * latencia + (1 - PESO_OBSERVACAO) * anterior
+                )
+            self.taxa_erros = PESO_OBSERVACAO * float(erro) + (1 - PESO_OBSERVACAO) * self.taxa_erros
+
+    def custo(self, operacao) -> float:
+        """Latência esperada, penalizada pela taxa de erros. Backends sem histórico custam 0 (são experimentados)."""
+        with self._lock:
+            latencia = self._latencias.get(operacao)
+            if latencia is None:
+                latencia = min(self._latencias.values(), default=0.0)
+            return latencia * (1 + 4 * self.taxa_erros)
+
+    def estado(self) -> dict:
+        with self._lock:
+            latencias = {operacao: round(valor, 3) for operacao, valor in self._latencias.items()}
+            taxa_erros = round(self.taxa_erros, 3)
+        return {
+            "latencia_media": latencias, "taxa_erros": taxa_erros, "saida_estruturada": self.aceita_esquema,
+            **self.limitador.orcamento()
+        }
+
+def _ler_cadeia(texto):
+    """Converte "provedor:modelo@por_minuto/por_dia, ..." em uma lista de (provedor, modelo, limites ou None)."""
+    cadeia = []
+    for item in texto.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        limites = None
+        if "@" in item:
+            item, _, texto_limites = item.rpartition("@")
+            por_minuto, _, por_dia = texto_limites.partition("/")
+            limites = (int(por_minuto), int(por_dia or LIMITE_POR_DIA))
+        provedor, _, modelo = item.partition(":")
+        if not modelo:
+            provedor, modelo = PROVEDOR_PADRAO, provedor
+        cadeia.append((provedor.strip(), modelo.strip(), limites))
+    return cadeia
+
+class Roteador:
+    """
+    Distribui as chamadas entre os backends de cada camada (critérios e avaliação).
+
+    Cada chamada vai para o backend de menor custo (latência observada,
+    penalizada pelos erros recentes) entre os que têm cota disponível agora;
+    a ordem da cadeia desempata. Se nenhum tiver cota, usa o que libera
+    primeiro. Um backend em rate limit fica sem cota até a espera sugerida
+    pelo servidor, e as chamadas seguem pelos demais.
+    """
+
+    def __init__(self, modelos=MODELOS, modelos_criterios=MODELOS_CRITERIOS, modelos_avaliacao=MODELOS_AVALIACAO):
+        padrao = _ler_cadeia(modelos or f"{PROVEDOR_PADRAO}:{model_name}")
+        self.backends = {}
+        self._camadas = {
+            "criterios": self._montar(_ler_cadeia(modelos_criterios) or padrao),
+            "avaliacao": self._montar(_ler_cadeia(modelos_avaliacao) or padrao),
+        }
+
+    def _montar(self, cadeia):
+        backends = []
+        for provedor, modelo, limites in cadeia:
+            chave = (provedor, modelo)
+            if chave not in self.backends:
+                if chave == (PROVEDOR_PADRAO, model_name):
+                    # O modelo padrão usa o limitador do módulo (CORRETOR_LIMITE_MINUTO/DIA, GET /cota)
+                    limitador_taxa = limitador
+                    if limites:
+                        limitador.configurar(*limites)
+                else:
+                    limitador_taxa = LimitadorTaxa(
+                        *(limites or (LIMITE_POR_MINUTO, LIMITE_POR_DIA)),
+                        chave=modelo if provedor == "github" else f"{provedor}:{modelo}"
+                    )
+                self.backends[chave] = BackendModelo(provedor, modelo, limitador_taxa)
+            elif limites:
+                # O mesmo backend em duas camadas compartilha a cota; limites explícitos prevalecem
+                self.backends[chave].limitador.configurar(*limites)
+            backends.append(self.backends[chave])
+        return backends
+
+    def cadeia(self, operacao) -> list:
+        """Backends que atendem a operação, na ordem de preferência."""
+        return self._camadas[CAMADAS.get(operacao, "avaliacao")]
+
+    def escolher(self, operacao, excluir=()):
+        """Escolhe o backend para a próxima chamada da operação, ignorando os de `excluir` se houver outros."""
+        candidatos = [backend for backend in self.cadeia(operacao) if backend not in excluir] or self.cadeia(operacao)
+        esperas = [backend.limitador.espera_estimada() for backend in candidatos]
+        disponiveis = [(backend.custo(operacao), i) for i, backend in enumerate(candidatos) if esperas[i] <= 0]
+        if disponiveis:
+            return candidatos[min(disponiveis)[1]]
+        return candidatos[min(range(len(candidatos)), key=lambda i: (esperas[i], i))]
+
+    def estado(self) -> dict:
+        """Cota, latência média e taxa de erros de cada backend, e as cadeias de cada camada."""
+        return {
+            "backends": {backend.identificador: backend.estado() for backend in self.backends.values()},
+            "camadas": {camada: [b.identificador for b in backends] for camada, backends in self._camadas.items()},
+        }
+
+_roteador = None
+_roteador_lock = threading.Lock()
+
+def obter_roteador() -> Roteador:
+    """Retorna o roteador de modelos compartilhado, criando-o no primeiro uso."""
+    global _roteador
+    with _roteador_lock:
+        if _roteador is None:
+            _roteador = Roteador()
+        return _roteador
+
+def _cota_restante():
+    restante = {}
+    for backend in obter_roteador().backends.values():
+        orcamento = backend.limitador.orcamento()
+        restante[(("janela", "minuto"), ("modelo", backend.identificador))] = orcamento["restante_minuto"]
+        restante[(("janela", "dia"), ("modelo", backend.identificador))] = orcamento["restante_dia"]
+    return restante
+
+registro.medidor("corretor_cota_restante", "Chamadas ao modelo ainda disponíveis na janela", _cota_restante)
+
+def extrair_tempo_espera(erro_str: str) -> int:
+    """Extrai o tempo de espera sugerido em uma mensagem de rate limit (padrão: 60 segundos)."""
+    wait_time_match = re.search(r'wait (\d+) seconds', erro_str)
+    if wait_time_match:
+        # Adicionar um pouco de tempo extra para segurança
+        return int(wait_time_match.group(1)) + 5
+    return 60
+
+def _registrar_tokens(resposta, operacao):
+    """Contabiliza os tokens informados pelo modelo (nem todo provedor os informa)."""
+    uso = getattr(resposta, "usage", None)
+    if uso is None:
+        return
+    MODELO_TOKENS.incrementar(getattr(uso, "prompt_tokens", 0) or 0, operacao=operacao, tipo="entrada")
+    MODELO_TOKENS.incrementar(getattr(uso, "completion_tokens", 0) or 0, operacao=operacao, tipo="saida")
+
+def executar_com_limite(func, *args, limitador_taxa=None, max_tentativas=3, operacao="chamada", **kwargs):
+    """
+    Executa uma chamada ao modelo respeitando o limitador de taxa compartilhado.
+    Se o servidor ainda assim recusar por rate limit, bloqueia o limitador
+    pelo tempo sugerido e tenta novamente.
+
+    Args:
+        func: Função que realiza a chamada ao modelo
+        limitador_taxa: Limitador a usar (padrão: limitador global do módulo)
+        max_tentativas: Número máximo de tentativas em caso de rate limit
+        operacao: Rótulo da chamada nas métricas (ex: "criterios", "avaliacao")
+
+    Returns:
+        O retorno de func
+
+    Raises:
+        CotaEsgotada: Se não houver orçamento dentro da espera máxima
+    """
+    limitador_taxa = limitador_taxa or limitador
+    modelo = kwargs.get("model", model_name)
+    for tentativa in range(max_tentativas):
+        inicio = time.perf_counter()
+        try:
+            limitador_taxa.adquirir()
+        except CotaEsgotada:
+            COTA_ESGOTADA.incrementar(operacao=operacao)
+            raise
+        finally:
+            espera = time.perf_counter() - inicio
+            COTA_ESPERA.observar(espera, operacao=operacao)
+            registrar_tempo("espera_cota", espera)
+
+        inicio = time.perf_counter()
+        try:
+            resposta = func(*args, **kwargs)
+        except Exception as e:
+            erro_str = str(e)
+            rate_limit = "RateLimitReached" in erro_str
+            MODELO_CHAMADAS.incrementar(operacao=operacao, modelo=modelo, resultado="rate_limit" if rate_limit else "erro")
+            if not rate_limit:
+                raise
+            # Bloqueia o limitador mesmo na última tentativa: o roteador deixa de enviar chamadas a este modelo
+            wait_time = extrair_tempo_espera(erro_str)
+            MODELO_RATE_LIMITS.incrementar(operacao=operacao, modelo=modelo)
+            MODELO_RATE_LIMIT_ESPERA.incrementar(wait_time, operacao=operacao, modelo=modelo)
+            limitador_taxa.bloquear(wait_time)
+            if tentativa == max_tentativas - 1:
+                raise
+            log.warning("Limite de requisições atingido. Aguardando %s segundos...", wait_time)
+        else:
+            MODELO_CHAMADAS.incrementar(operacao=operacao, modelo=modelo, resultado="ok")
+            _registrar_tokens(resposta, operacao)
+            return resposta
+        finally:
+            latencia = time.perf_counter() - inicio
+            MODELO_LATENCIA.observar(latencia, operacao=operacao, modelo=modelo)
+            registrar_tempo("chamada_modelo", latencia)
+
+def chamar_modelo(operacao, max_tentativas=3, **kwargs):
+    """
+    Envia a chamada ao backend escolhido pelo roteador para a operação. Em caso de
+    rate limit ou erro, tenta o próximo backend da cadeia; sem alternativas, tenta
+    de novo no que liberar cota primeiro.
+
+    Args:
+        operacao: Operação ("criterios", "casos", "avaliacao", "avaliacao_lote"), que define a camada
+        max_tentativas: Número mínimo de tentativas (cada backend da cadeia é tentado ao menos uma vez)
+        **kwargs: Argumentos de chat.completions.create, exceto "model". O response_format
+            é omitido nos backends que já o recusaram
+
+    Returns:
+        A resposta do modelo
+
+    Raises:
+        CotaEsgotada: Se nenhum backend tiver orçamento dentro da espera máxima
+    """
+    roteador = obter_roteador()
+    falharam = set()
+    tentativas = max(max_tentativas, len(roteador.cadeia(operacao)))
+    tentativa = 0
+    while True:
+        backend = roteador.escolher(operacao, excluir=falharam)
+        argumentos = kwargs
+        if "response_format" in kwargs and not backend.aceita_esquema:
+            argumentos = {k: v for k, v in kwargs.items() if k != "response_format"}
+        inicio = time.perf_counter()
+        try:
+            resposta = executar_com_limite(
+                obter_cliente(backend.provedor).chat.completions.create,
+                limitador_taxa=backend.limitador, max_tentativas=1, operacao=operacao,
+                model=backend.modelo, **argumentos
+            )
+        except CotaEsgotada:
+            raise
+        except Exception as e:
+            if argumentos.get("response_format") and ("response_format" in str(e) or "json_schema" in str(e)):
+                # Modelo sem suporte a saída estruturada: segue com o mesmo backend sem o schema
+                log.warning("%s não aceita response_format; usando JSON sem schema", backend.identificador)
+                backend.aceita_esquema = False
+                continue
+            backend.registrar(operacao, time.perf_counter() - inicio, erro=True)
+            tentativa += 1
+            if tentativa == tentativas:
+                raise
+            log.warning("Falha em %s (%s); tentando outro modelo...", backend.identificador, e)
+            falharam.add(backend)
+            if len(falharam) == len(roteador.cadeia(operacao)):
+                # Todos falharam: volta a considerar todos (os em rate limit aguardam a cota)
+                falharam.clear()
+        else:
+            backend.registrar(operacao, time.perf_counter() - inicio, erro=False)
+            return resposta
 
 # Função para gerar os critérios de avaliação (checklist)
 def gerar_criterios_com_ia(enunciado: str) -> str:
@@ -30,7 +499,8 @@ def gerar_criterios_com_ia(enunciado: str) -> str:
     Returns:
         String contendo os critérios de avaliação em formato de checklist
     """
-    response = client.chat.completions.create(
+    response = chamar_modelo(
+        operacao="criterios",
         messages=[
             {
                 "role": "system",
@@ -59,25 +529,136 @@ def gerar_criterios_com_ia(enunciado: str) -> str:
         ],
         temperature=0.5,
         top_p=1.0,
-        max_tokens=1500,
-        model=model_name
+        max_tokens=1500
     )
     return response.choices[0].message.content or ""
 
-# Função para avaliar o código com base no checklist gerado
-def avaliar_codigo_com_criterios(enunciado: str, checklist: str, codigo: str) -> str:
+# Função para gerar os casos de teste (entrada e saída esperada) usados na execução do código
+def gerar_casos_com_ia(enunciado: str) -> str:
     """
-    Avalia um código-fonte com base em um checklist de critérios.
-    
+    Gera casos de teste de entrada padrão e saída esperada a partir do enunciado usando IA.
+
     Args:
         enunciado: Texto do enunciado da atividade
-        checklist: Lista de critérios para avaliar o código
-        codigo: Código-fonte a ser avaliado
+
+    Returns:
+        String JSON com a lista de casos, ou "" se a resposta não for uma lista válida
+    """
+    response = chamar_modelo(
+        operacao="casos",
+        messages=[
+            {
+                "role": "system",
+                "content": (
+                    "Você é um professor de programação preparando testes automáticos para programas de console em C# "
+                    "escritos por alunos iniciantes. Cada teste fornece um texto na entrada padrão e verifica trechos da saída.\n"
+                    "Regras:\n"
+                    "1. Crie de 2 a 4 casos que cubram o comportamento essencial do enunciado.\n"
+                    "2. 'entrada' é o texto digitado pelo usuário, uma resposta por linha, na ordem em que o programa pede.\n"
+                    "3. 'saida' contém apenas os valores que qualquer solução correta imprime (números, nomes, resultados), "
+                    "um por linha, na ordem em que aparecem; nunca inclua mensagens de orientação como 'Digite...'.\n"
+                    "4. Se o enunciado não permitir prever a saída (ex: valores aleatórios), responda com uma lista vazia.\n"
+                    "Responda APENAS com uma lista JSON de objetos com as chaves 'entrada' e 'saida', sem markdown."
+                )
+            },
+            {
+                "role": "user",
+                "content": f"Crie casos de teste para este enunciado:\n\n{enunciado}",
+            }
+        ],
+        temperature=0.2,
+        top_p=1.0,
+        max_tokens=1200
+    )
+    conteudo = (response.choices[0].message.content or "").replace("```json", "").replace("```", "").strip()
+    try:
+        casos = json.loads(conteudo)
+    except json.JSONDecodeError:
+        log.warning("Casos de teste malformados: %s", conteudo[:200])
+        return ""
+    if not isinstance(casos, list):
+        return ""
+    casos = [
+        {"entrada": str(caso.get("entrada", "")), "saida": str(caso.get("saida", ""))}
+        for caso in casos if isinstance(caso, dict) and str(caso.get("saida", "")).strip()
+    ]
+    return json.dumps(casos, ensure_ascii=False)
+
+# Orientações de avaliação comuns à avaliação individual e em lote
+DIRETRIZES_AVALIACAO = (
+    "Lembre-se que são códigos de pessoas iniciando na área de programação, então:\n\n"
+    
+    "1. Seja generoso em sua avaliação, focando na funcionalidade básica:\n"
+    "   - Se o código implementa a lógica necessária e funciona, mesmo que não seja a implementação ideal, considere 'OK'\n"
+    "   - Nomes de variáveis, funções e estruturas podem ser simples ou mesmo não seguir convenções\n"
+    "   - A presença de código extra ou passos desnecessários é aceitável, desde que não prejudique a funcionalidade\n\n"
+    
+    "2. Seja muito flexível com detalhes de formato e estilo:\n"
+    "   - Pequenas variações em mensagens de saída são aceitáveis (ex: 'Olá João' vs 'Olá, João!')\n"
+    "   - É normal ter espaços extras, capitalização diferente ou pontuação variada\n"
+    "   - Mensagens de orientação ao usuário extras são permitidas (ex: 'Digite seu nome:')\n\n"
     
+    "3. Concentre-se no essencial para iniciantes:\n"
+    "   - Para entrada de dados: verifica se o código captura as informações necessárias\n"
+    "   - Para processamento: verifica se a lógica básica está presente e produz resultados corretos\n"
+    "   - Para saída: verifica se as informações essenciais são apresentadas, mesmo com formatação diferente\n\n"
+)
+
+# Funções de apoio à saída estruturada
+def numerar_checklist(itens: list) -> dict:
+    """Associa cada critério do checklist a um identificador curto ("c1", "c2", ...) usado na resposta."""
+    return {f"c{i}": item for i, item in enumerate(itens, start=1)}
+
+def _esquema_criterios(identificadores) -> dict:
+    return {
+        "type": "object",
+        "properties": {ident: {"type": "string", "enum": ["OK", "FALHA"]} for ident in identificadores},
+        "required": list(identificadores),
+        "additionalProperties": False,
+    }
+
+def formato_resposta(nome: str, esquema: dict):
+    """Parâmetro response_format que obriga o modelo a responder no JSON schema informado (ou None, se desativado)."""
+    if not SAIDA_ESTRUTURADA:
+        return None
+    return {"type": "json_schema", "json_schema": {"name": nome, "strict": True, "schema": esquema}}
+
+def _formato_opcional(nome, esquema) -> dict:
+    formato = formato_resposta(nome, esquema)
+    return {"response_format": formato} if formato else {}
+
+_RESULTADO_CRITERIO = re.compile(r'"((?:[^"\\]|\\.)+)"\s*:\s*"(OK|FALHA)"', re.IGNORECASE)
+
+def _chave(texto: str) -> str:
+    return texto_criterio(texto).lower().rstrip(".;:")
+
+def ler_resultados(texto: str, numerados: dict) -> dict:
+    """
+    Lê os pares "critério": "OK"/"FALHA" da resposta do modelo, mesmo que o JSON
+    esteja incompleto (resposta cortada por max_tokens), cercado por ```json ou
+    com os critérios por extenso no lugar dos identificadores.
+
+    Args:
+        texto: Resposta do modelo (ou o trecho de um aluno, na avaliação em lote)
+        numerados: Dicionário identificador -> critério, como em numerar_checklist
+
     Returns:
-        String em formato JSON com os resultados da avaliação
+        Dicionário critério -> 'OK'/'FALHA' com os critérios encontrados
     """
-    response = client.chat.completions.create(
+    por_texto = {_chave(item): item for item in numerados.values()}
+    resultados = {}
+    for chave, valor in _RESULTADO_CRITERIO.findall(texto):
+        item = numerados.get(chave.strip()) or por_texto.get(_chave(chave))
+        if item is not None:
+            resultados[item] = valor.upper()
+    return resultados
+
+# Função para avaliar o código com base no checklist gerado
+def _pedir_avaliacao(enunciado: str, numerados: dict, codigo: str) -> dict:
+    """Uma chamada ao modelo para os critérios informados; retorna os que vieram na resposta."""
+    checklist = "\n".join(f"{ident}: {item}" for ident, item in numerados.items())
+    response = chamar_modelo(
+        operacao="avaliacao",
         messages=[
             {
                 "role": "system",
@@ -85,25 +666,10 @@ def avaliar_codigo_com_criterios(enunciado: str, checklist: str, codigo: str) ->
                     "Você é um avaliador técnico de código em C# para estudantes iniciantes em programação. "
                     "Receberá um enunciado, um checklist técnico e o código-fonte submetido por um aluno que está começando. "
                     "Seu objetivo é avaliar se o código atende aos requisitos básicos, sem esperar soluções avançadas ou otimizadas. "
-                    "Lembre-se que são códigos de pessoas iniciando na área de programação, então:\n\n"
-                    
-                    "1. Seja generoso em sua avaliação, focando na funcionalidade básica:\n"
-                    "   - Se o código implementa a lógica necessária e funciona, mesmo que não seja a implementação ideal, considere 'OK'\n"
-                    "   - Nomes de variáveis, funções e estruturas podem ser simples ou mesmo não seguir convenções\n"
-                    "   - A presença de código extra ou passos desnecessários é aceitável, desde que não prejudique a funcionalidade\n\n"
-                    
-                    "2. Seja muito flexível com detalhes de formato e estilo:\n"
-                    "   - Pequenas variações em mensagens de saída são aceitáveis (ex: 'Olá João' vs 'Olá, João!')\n"
-                    "   - É normal ter espaços extras, capitalização diferente ou pontuação variada\n"
-                    "   - Mensagens de orientação ao usuário extras são permitidas (ex: 'Digite seu nome:')\n\n"
-                    
-                    "3. Concentre-se no essencial para iniciantes:\n"
-                    "   - Para entrada de dados: verifica se o código captura as informações necessárias\n"
-                    "   - Para processamento: verifica se a lógica básica está presente e produz resultados corretos\n"
-                    "   - Para saída: verifica se as informações essenciais são apresentadas, mesmo com formatação diferente\n\n"
-                    
+                    + DIRETRIZES_AVALIACAO +
+                    "Cada critério do checklist é precedido por um identificador (ex: 'c1'). "
                     "Responda APENAS com um objeto JSON válido sem formatação markdown, explicações adicionais ou backticks. "
-                    "O objeto JSON deve mapear cada critério para seu resultado ('OK' ou 'FALHA')."
+                    "O objeto JSON deve mapear o identificador de cada critério para seu resultado ('OK' ou 'FALHA')."
                 )
             },
             {
@@ -114,51 +680,260 @@ def avaliar_codigo_com_criterios(enunciado: str, checklist: str, codigo: str) ->
         temperature=0.25,
         top_p=1.0,
         max_tokens=1800,
-        model=model_name
+        **_formato_opcional("avaliacao", _esquema_criterios(numerados))
     )
-    return response.choices[0].message.content or ""
+    return ler_resultados(response.choices[0].message.content or "", numerados)
 
-# Função pipeline: gera checklist e avalia o código
-def pipeline_gerar_e_avaliar(enunciado: str, codigo: str) -> dict:
+def avaliar_codigo_com_criterios(enunciado: str, checklist: str, codigo: str, parcial: dict = None) -> dict:
     """
-    Pipeline completo: gera critérios de avaliação e avalia o código.
-    
+    Avalia um código-fonte com base em um checklist de critérios.
+
+    A resposta é pedida no JSON schema do checklist e lida critério a critério;
+    se faltarem critérios, apenas eles são pedidos de novo (até CORRETOR_COMPLEMENTOS
+    chamadas extras), sem refazer a avaliação inteira.
+
     Args:
         enunciado: Texto do enunciado da atividade
+        checklist: Lista de critérios para avaliar o código
         codigo: Código-fonte a ser avaliado
-    
+        parcial: Resultados já obtidos (critério -> 'OK'/'FALHA'), ex: de uma avaliação em lote
+
     Returns:
-        Dicionário contendo o checklist e a avaliação
+        Dicionário critério -> 'OK'/'FALHA', ou com a chave "erro" se a resposta
+        não trouxer todos os critérios (os obtidos ficam em "parcial")
+    """
+    itens = filtrar_criterios(checklist)
+    if not itens:
+        # Checklist fora do formato "[ ] ...": sem identificadores, vale o JSON livre do modelo
+        response = chamar_modelo(
+            operacao="avaliacao",
+            messages=[
+                {
+                    "role": "system",
+                    "content": (
+                        "Você é um avaliador técnico de código em C# para estudantes iniciantes em programação. "
+                        "Receberá um enunciado, um checklist técnico e o código-fonte submetido por um aluno. "
+                        + DIRETRIZES_AVALIACAO +
+                        "Responda APENAS com um objeto JSON válido sem formatação markdown, explicações adicionais ou backticks. "
+                        "O objeto JSON deve mapear cada critério para seu resultado ('OK' ou 'FALHA')."
+                    )
+                },
+                {"role": "user", "content": f"Enunciado:\n{enunciado}\n\nChecklist:\n{checklist}\n\nCódigo:\n{codigo}"}
+            ],
+            temperature=0.25,
+            top_p=1.0,
+            max_tokens=1800
+        )
+        return interpretar_json(response.choices[0].message.content or "")
+
+    resultados = {item: valor for item, valor in (parcial or {}).items() if item in itens}
+    for chamada in range(1 + MAX_COMPLEMENTOS):
+        faltantes = [item for item in itens if item not in resultados]
+        if not faltantes:
+            break
+        if resultados or chamada:
+            CRITERIOS_COMPLEMENTADOS.incrementar(len(faltantes), operacao="avaliacao")
+        resultados.update(_pedir_avaliacao(enunciado, numerar_checklist(faltantes), codigo))
+
+    faltantes = [item for item in itens if item not in resultados]
+    if faltantes:
+        return {
+            "erro": "Critérios ausentes na resposta",
+            "mensagem": f"{len(faltantes)} de {len(itens)} critérios sem resultado após {1 + MAX_COMPLEMENTOS} chamadas",
+            "ausentes": faltantes,
+            "parcial": resultados,
+        }
+    return {item: resultados[item] for item in itens}
+
+# Leitura de respostas em JSON livre (checklists fora do formato "[ ] ...")
+def interpretar_json(avaliacao_str: str) -> dict:
+    """
+    Converte a resposta do modelo em dicionário, removendo cercas ```json se necessário.
+
+    Returns:
+        Dicionário com a avaliação ou, se a resposta não for JSON válido, com a chave "erro"
     """
-    import json
-    
-    # Gera os critérios de avaliação
-    checklist = gerar_criterios_com_ia(enunciado)
-    
-    # Avalia o código com base nos critérios
-    avaliacao_str = avaliar_codigo_com_criterios(enunciado, checklist, codigo)
-    
-    # Processa o resultado da avaliação
-    avaliacao_json = None
     try:
         # Primeiro, tentar analisar diretamente
-        avaliacao_json = json.loads(avaliacao_str)
+        return json.loads(avaliacao_str)
     except json.JSONDecodeError:
         # Se falhar, tentar limpar a string
         try:
             cleaned_str = avaliacao_str.replace("```json", "").replace("```", "").strip()
-            avaliacao_json = json.loads(cleaned_str)
+            return json.loads(cleaned_str)
         except json.JSONDecodeError as e:
-            avaliacao_json = {
+            return {
                 "erro": "Falha ao analisar JSON",
                 "mensagem": str(e),
                 "avaliacao_raw": avaliacao_str[:200] + "..." if len(avaliacao_str) > 200 else avaliacao_str
             }
+
+# Funções de apoio à avaliação em lote
+def montar_lotes(codigos: dict, orcamento_tokens: int = TOKENS_POR_LOTE,
+                 tokens_fixos: int = 0, max_alunos: int = MAX_ALUNOS_POR_LOTE) -> list:
+    """
+    Agrupa os alunos em lotes cujo código cabe no orçamento de tokens.
+
+    Args:
+        codigos: Dicionário aluno -> código-fonte
+        orcamento_tokens: Tokens disponíveis por requisição
+        tokens_fixos: Tokens já ocupados pelo enunciado e pelo checklist
+        max_alunos: Número máximo de alunos por lote
+
+    Returns:
+        Lista de lotes, cada um uma lista de nomes de alunos (na ordem recebida).
+        Alunos cujo código sozinho excede o orçamento ficam em um lote individual.
+    """
+    # As instruções do sistema também ocupam parte do orçamento
+    disponivel = orcamento_tokens - tokens_fixos - estimar_tokens(DIRETRIZES_AVALIACAO)
+    lotes = []
+    atual, tokens_atual = [], 0
+
+    for aluno, codigo in codigos.items():
+        tokens = estimar_tokens(codigo)
+        if atual and (tokens_atual + tokens > disponivel or len(atual) >= max_alunos):
+            lotes.append(atual)
+            atual, tokens_atual = [], 0
+        atual.append(aluno)
+        tokens_atual += tokens
+
+    if atual:
+        lotes.append(atual)
+    return lotes
+
+# Função para avaliar vários alunos em uma única chamada ao modelo
+def avaliar_lote_com_criterios(enunciado: str, checklist: str, codigos: dict) -> dict:
+    """
+    Avalia o código de vários alunos em uma única requisição, enviando o
+    enunciado e o checklist apenas uma vez.
+
+    Args:
+        enunciado: Texto do enunciado da atividade
+        checklist: Lista de critérios para avaliar o código
+        codigos: Dicionário aluno -> código-fonte
+
+    Returns:
+        Dicionário aluno -> avaliação (critério -> 'OK'/'FALHA'), possivelmente
+        incompleta: os critérios que faltarem podem ser pedidos com
+        avaliar_codigo_com_criterios(..., parcial=avaliacao). Alunos sem nenhum
+        critério na resposta não aparecem e devem ser avaliados individualmente.
+    """
+    numerados = numerar_checklist(filtrar_criterios(checklist))
+    if not numerados:
+        return {}
+    # Identificadores neutros evitam que nomes de pastas confundam o modelo
+    identificadores = {f"aluno_{i}": aluno for i, aluno in enumerate(codigos, start=1)}
+    blocos = "\n\n".join(
+        f"### {ident}\n{codigos[aluno]}" for ident, aluno in identificadores.items()
+    )
+    texto_checklist = "\n".join(f"{ident}: {item}" for ident, item in numerados.items())
+    esquema_aluno = _esquema_criterios(numerados)
+    esquema = {
+        "type": "object",
+        "properties": {ident: esquema_aluno for ident in identificadores},
+        "required": list(identificadores),
+        "additionalProperties": False,
+    }
+
+    response = chamar_modelo(
+        operacao="avaliacao_lote",
+        messages=[
+            {
+                "role": "system",
+                "content": (
+                    "Você é um avaliador técnico de código em C# para estudantes iniciantes em programação. "
+                    "Receberá um enunciado, um checklist técnico e os códigos-fonte de vários alunos que estão começando, "
+                    "cada um precedido por um cabeçalho '### aluno_N'. "
+                    "Avalie cada código de forma independente, verificando se atende aos requisitos básicos, "
+                    "sem esperar soluções avançadas ou otimizadas. "
+                    + DIRETRIZES_AVALIACAO +
+                    "Cada critério do checklist é precedido por um identificador (ex: 'c1'). "
+                    "Responda APENAS com um objeto JSON válido sem formatação markdown, explicações adicionais ou backticks. "
+                    "As chaves do objeto devem ser os identificadores dos alunos (ex: 'aluno_1') e cada valor deve ser "
+                    "um objeto JSON que mapeia o identificador de cada critério para seu resultado ('OK' ou 'FALHA')."
+                )
+            },
+            {
+                "role": "user",
+                "content": f"Enunciado:\n{enunciado}\n\nChecklist:\n{texto_checklist}\n\nCódigos:\n{blocos}",
+            }
+        ],
+        temperature=0.25,
+        top_p=1.0,
+        max_tokens=min(4000, 400 * len(codigos) + 200),
+        **_formato_opcional("avaliacao_lote", esquema)
+    )
+
+    # Cada aluno é lido no trecho entre a sua chave e a do próximo: uma resposta
+    # cortada ou malformada ainda aproveita os alunos e critérios que vieram
+    conteudo = response.choices[0].message.content or ""
+    posicoes = [(m.start(), m.group(1)) for m in re.finditer(r'"(aluno_\d+)"\s*:', conteudo)]
+    avaliacoes = {}
+    for i, (inicio, ident) in enumerate(posicoes):
+        fim = posicoes[i + 1][0] if i + 1 < len(posicoes) else len(conteudo)
+        aluno = identificadores.get(ident)
+        avaliacao = ler_resultados(conteudo[inicio:fim], numerados)
+        if aluno is not None and avaliacao:
+            avaliacoes[aluno] = avaliacao
+    if not avaliacoes:
+        log.warning("Resposta do lote sem avaliações: %s", conteudo[:200])
+    return avaliacoes
+
+def obter_criterios(enunciado: str) -> str:
+    """Obtém os critérios do enunciado no repositório, gerando-os com IA se necessário."""
+    return obter_repositorio().obter_ou_gerar(
+        enunciado, gerar_criterios_com_ia, modelo=identificador_modelo("criterios"), escopo=escopo_provedor()
+    )
+
+def obter_casos(enunciado: str) -> list:
+    """Obtém os casos de teste do enunciado no repositório, gerando-os com IA se necessário."""
+    casos = obter_repositorio().obter_ou_gerar(
+        enunciado, gerar_casos_com_ia, modelo=identificador_modelo("casos"), escopo=f"casos:{escopo_provedor()}"
+    )
+    return json.loads(casos) if casos else []
+
+# Função pipeline: gera checklist e avalia o código
+def pipeline_gerar_e_avaliar(enunciado: str, codigo: str) -> dict:
+    """
+    Pipeline completo: obtém (ou gera) os critérios de avaliação e avalia o código.
+    
+    Args:
+        enunciado: Texto do enunciado da atividade
+        codigo: Código-fonte a ser avaliado
+    
+    Returns:
+        Dicionário contendo o checklist, a avaliação, os contadores do cache, o relatório
+        de preparação do código e o resumo de tempos
+    """
+    with execucao() as tempos:
+        # Obtém os critérios de avaliação (gerados apenas se o enunciado for novo)
+        with etapa("criterios"):
+            checklist = obter_criterios(enunciado)
+    
+        # Mesmo preparo do código usado na avaliação da turma (sem comentários, dentro do orçamento)
+        with etapa("preparacao"):
+            codigo, preparacao = preparar_codigo({"Program.cs": codigo})
+
+        # Reaproveita a avaliação se o mesmo código já foi avaliado com estes critérios
+        cache = obter_cache()
+        chave = chave_avaliacao(enunciado, checklist, identificador_modelo(), codigo)
+        avaliacao_json = cache.obter(chave)
+        acerto = avaliacao_json is not None
+        CACHE_CONSULTAS.incrementar(resultado="acerto" if acerto else "falha")
+
+        if not acerto:
+            # Avalia o código com base nos critérios (já interpretados e completos, ou com "erro")
+            avaliacao_json = avaliar_codigo_com_criterios(enunciado, checklist, codigo)
+            if "erro" not in avaliacao_json:
+                cache.guardar(chave, avaliacao_json)
     
     # Constrói o resultado base
     resultado = {
         "checklist": checklist,
-        "avaliacao": avaliacao_json
+        "avaliacao": avaliacao_json,
+        "cache": {"acertos": int(acerto), "falhas": int(not acerto)},
+        "preparacao": preparacao,
+        "tempos": tempos.resumo()
     }
     
     return resultado
@@ -0,0 +1,428 @@
+import time
+
+from corretor.modelo_ia import (
+    obter_criterios, obter_casos, avaliar_codigo_com_criterios, avaliar_lote_com_criterios,
+    montar_lotes, estimar_tokens, CotaEsgotada, identificador_modelo
+)
+from corretor.avaliador import avaliar_codigos, filtrar_criterios
+from corretor.agendador import executar_concorrente, executar_em_thread
+from corretor.cache import obter_cache, chave_avaliacao
+from corretor.metricas import log, execucao, etapa, ALUNOS, ALUNOS_AGRUPADOS, CACHE_CONSULTAS
+from corretor.preparacao import preparar_codigo, filtrar_arquivos
+from corretor.similaridade import agrupar, agrupar_equivalentes, grupos_relatorio
+from corretor.espaco_trabalho import EspacoTrabalho
+from corretor.resultados import texto_criterio, obter_repositorio_resultados
+from corretor.entregas import obter_repositorio_entregas
+from corretor.executor import avaliar_execucao, obter_compilador, execucao_habilitada, PARALELISMO_EXECUCAO
+
+def avaliar_codigo_aluno_ia(enunciado, criterios, aluno_pasta, codigo_completo, parcial=None):
+    """
+    Avalia por IA o código de um único aluno, com novas tentativas em caso de erro.
+    Função bloqueante: deve ser executada fora do loop de eventos.
+
+    Args:
+        enunciado: Texto descritivo da atividade
+        criterios: Checklist de critérios gerado para o enunciado
+        aluno_pasta: Nome do aluno (usado nas mensagens)
+        codigo_completo: Código-fonte concatenado do aluno
+        parcial: Critérios já avaliados (ex: na resposta do lote); só os demais vão ao modelo
+
+    Returns:
+        Dicionário com checklist e avaliação, ou com a chave "erro"
+    """
+    log.info("Avaliando %s...", aluno_pasta)
+    tentativas = 0
+    max_tentativas = 3
+
+    while tentativas < max_tentativas:
+        try:
+            return {
+                "checklist": criterios,
+                "avaliacao": avaliar_codigo_com_criterios(enunciado, criterios, codigo_completo, parcial)
+            }
+
+        except CotaEsgotada as e:
+            # Sem orçamento dentro da espera máxima: não adianta tentar novamente
+            log.warning("Erro ao avaliar %s: %s", aluno_pasta, e)
+            return {"erro": str(e)}
+        except Exception as e:
+            tentativas += 1
+            erro_str = str(e)
+            log.warning("Erro ao avaliar %s: %s", aluno_pasta, erro_str)
+
+            # Rate limits já são tratados pelo limitador; para outros erros, esperar 5 segundos
+            if tentativas < max_tentativas:
+                log.warning("Tentando novamente em 5 segundos... (tentativa %d de %d)", tentativas, max_tentativas)
+                time.sleep(5)
+
+    # Se não conseguiu avaliar após as tentativas, registrar o erro
+    return {"erro": f"Falha após {max_tentativas} tentativas: {erro_str}"}
+
+def avaliar_lote_ia(enunciado, criterios, codigos):
+    """
+    Avalia um lote de alunos em uma única chamada ao modelo. Alunos ausentes
+    da resposta são reavaliados individualmente; os que vieram com critérios
+    faltando recebem uma chamada só com esses critérios.
+
+    Args:
+        enunciado: Texto descritivo da atividade
+        criterios: Checklist de critérios gerado para o enunciado
+        codigos: Dicionário aluno -> código-fonte concatenado
+
+    Returns:
+        Dicionário aluno -> resultado, no mesmo formato de avaliar_codigo_aluno_ia
+    """
+    if len(codigos) == 1:
+        aluno_pasta, codigo_completo = next(iter(codigos.items()))
+        return {aluno_pasta: avaliar_codigo_aluno_ia(enunciado, criterios, aluno_pasta, codigo_completo)}
+
+    log.info("Avaliando em lote: %s...", ", ".join(codigos))
+    try:
+        avaliacoes = avaliar_lote_com_criterios(enunciado, criterios, codigos)
+    except CotaEsgotada as e:
+        log.warning("Erro ao avaliar lote: %s", e)
+        return {aluno_pasta: {"erro": str(e)} for aluno_pasta in codigos}
+    except Exception as e:
+        log.warning("Erro ao avaliar lote: %s", e)
+        avaliacoes = {}
+
+    itens = filtrar_criterios(criterios)
+    resultados = {}
+    for aluno_pasta, codigo_completo in codigos.items():
+        avaliacao = avaliacoes.get(aluno_pasta)
+        if avaliacao and all(item in avaliacao for item in itens):
+            resultados[aluno_pasta] = {
+                "checklist": criterios,
+                "avaliacao": {item: avaliacao[item] for item in itens}
+            }
+        elif avaliacao:
+            log.warning("%s com critérios faltando na resposta do lote, completando...", aluno_pasta)
+            resultados[aluno_pasta] = avaliar_codigo_aluno_ia(
+                enunciado, criterios, aluno_pasta, codigo_completo, parcial=avaliacao
+            )
+        else:
+            log.warning("%s ausente na resposta do lote, avaliando individualmente...", aluno_pasta)
+            resultados[aluno_pasta] = avaliar_codigo_aluno_ia(enunciado, criterios, aluno_pasta, codigo_completo)
+    return resultados
+
+async def avaliar_espaco(espaco, enunciado, usar_ia_direta=False, concorrencia=None, ao_concluir=None,
+                         criterios=None, executar_codigo=None, casos=None):
+    """
+    Avalia todas as entregas de um espaço de trabalho.
+
+    Args:
+        espaco: EspacoTrabalho com as entregas já carregadas
+        enunciado: Texto descritivo da atividade a ser avaliada
+        usar_ia_direta: Se True, usa avaliação direta por IA; se False, usa busca por palavras-chave
+        concorrencia: Número máximo de chamadas de avaliação por IA ao mesmo tempo (padrão: CORRETOR_CONCORRENCIA)
+        ao_concluir: Função opcional chamada com (aluno, resultado) assim que cada aluno é avaliado.
+            Pode ser chamada a partir de threads do pool, portanto deve ser thread-safe.
+        criterios: Checklist a usar no lugar do gerado para o enunciado (opcional)
+        executar_codigo: Se False, não compila nem executa as entregas mesmo com CORRETOR_EXECUTAR_CODIGO=1
+        casos: Casos de teste [{"entrada", "saida"}] a usar no lugar dos gerados para o enunciado (opcional)
+
+    Returns:
+        Dicionário com os critérios, o relatório (ou as avaliações por IA) de cada aluno
+        e o resumo de tempos por etapa da execução
+    """
+    # Reaproveita a execução aberta pelo chamador (ex: o /avaliar, que mede também o upload)
+    with execucao() as tempos:
+        output = await _avaliar_espaco(
+            espaco, enunciado, usar_ia_direta, concorrencia, ao_concluir, criterios, executar_codigo, casos
+        )
+        output["tempos"] = tempos.resumo()
+    return output
+
+async def _executar_entregas(enunciado, criterios, entregas, casos):
+    """
+    Compila e executa as entregas em paralelo. Retorna, por aluno, o relatório da
+    execução e, para as entregas com veredito claro, o resultado pronto (sem o modelo).
+    """
+    if obter_compilador() is None:
+        log.warning("Nenhum compilador C# (dotnet ou mono) encontrado: etapa de execução ignorada")
+        return {}, {}
+
+    with etapa("execucao_codigo"):
+        if casos is None:
+            casos = await executar_em_thread(obter_casos, enunciado)
+        alunos = list(entregas)
+        relatorios = await executar_concorrente(
+            lambda aluno: avaliar_execucao(entregas[aluno], casos), alunos, max_concorrencia=PARALELISMO_EXECUCAO
+        )
+
+    checklist = filtrar_criterios(criterios)
+    decididos = {}
+    for aluno, relatorio in zip(alunos, relatorios):
+        if relatorio["veredito"] and checklist:
+            resultado = "OK" if relatorio["veredito"] == "aprovado" else "FALHA"
+            decididos[aluno] = {
+                "checklist": criterios,
+                "avaliacao": {criterio: resultado for criterio in checklist},
+                "execucao": relatorio,
+            }
+    return dict(zip(alunos, relatorios)), decididos
+
+async def _avaliar_espaco(espaco, enunciado, usar_ia_direta, concorrencia, ao_concluir, criterios=None,
+                          executar_codigo=None, casos=None):
+    ao_concluir = ao_concluir or (lambda aluno, resultado: None)
+    entregas = espaco.entregas_ordenadas()
+
+    # Critérios vêm do repositório compartilhado; só chama o modelo para enunciados novos
+    if criterios is None:
+        with etapa("criterios"):
+            criterios = await executar_em_thread(obter_criterios, enunciado)
+        log.info("Checklist obtido com sucesso!")
+
+    if usar_ia_direta:
+        # Método de avaliação direta por IA, com vários alunos avaliados em paralelo
+        alunos = list(entregas)
+        # Código enxuto: sem arquivos gerados, duplicados, comentários e dentro do orçamento de tokens
+        codigos = {}
+        preparacao = {}
+        with etapa("preparacao"):
+            for aluno, arquivos_cs in entregas.items():
+                if arquivos_cs:
+                    codigos[aluno], preparacao[aluno] = preparar_codigo(arquivos_cs)
+
+        # Avaliações já feitas para o mesmo enunciado, checklist e código não gastam cota
+        cache = obter_cache()
+        avaliacoes = {}
+        pendentes = {}
+        with etapa("cache"):
+            chaves = {
+                aluno: chave_avaliacao(enunciado, criterios, identificador_modelo(), codigo)
+                for aluno, codigo in codigos.items()
+            }
+            for aluno, codigo in codigos.items():
+                avaliacao = cache.obter(chaves[aluno])
+                if avaliacao is not None:
+                    avaliacoes[aluno] = {"checklist": criterios, "avaliacao": avaliacao}
+                    ao_concluir(aluno, avaliacoes[aluno])
+                else:
+                    pendentes[aluno] = codigo
+        CACHE_CONSULTAS.incrementar(len(codigos) - len(pendentes), resultado="acerto")
+        CACHE_CONSULTAS.incrementar(len(pendentes), resultado="falha")
+
+        for aluno in alunos:
+            if aluno not in codigos:
+                ao_concluir(aluno, {"erro": "Nenhum arquivo .cs encontrado"})
+
+        # Entregas que claramente compilam e passam nos testes (ou claramente falham) não vão ao modelo
+        execucoes = {}
+        if pendentes and execucao_habilitada(executar_codigo):
+            execucoes, decididos = await _executar_entregas(
+                enunciado, criterios, {aluno: entregas[aluno] for aluno in pendentes}, casos
+            )
+            for aluno, resultado in decididos.items():
+                avaliacoes[aluno] = resultado
+                del pendentes[aluno]
+                ao_concluir(aluno, resultado)
+
+        # Entregas equivalentes (cópias, variáveis renomeadas) são avaliadas uma única vez; as apenas
+        # parecidas vão ao modelo separadamente e só aparecem no relatório de grupos
+        with etapa("agrupamento"):
+            equivalentes = agrupar_equivalentes(pendentes)
+            grupos = agrupar(pendentes)
+        ALUNOS_AGRUPADOS.incrementar(len(pendentes) - len(equivalentes), modo="ia")
+
+        def avaliar_lote(lote):
+            resultados_lote = avaliar_lote_ia(enunciado, criterios, {aluno: pendentes[aluno] for aluno in lote})
+            for representante, resultado in list(resultados_lote.items()):
+                # Só guarda avaliações válidas, para que falhas sejam refeitas na próxima vez. Fica apenas
+                # na chave do código avaliado: os membros do grupo podem diferir em nomes e formatação
+                if "avaliacao" in resultado and "erro" not in resultado["avaliacao"]:
+                    cache.guardar(chaves[representante], resultado["avaliacao"])
+                for aluno in equivalentes[representante]:
+                    if aluno != representante:
+                        resultados_lote[aluno] = {**resultado, "avaliado_como": representante}
+                    ao_concluir(aluno, resultados_lote[aluno])
+            return resultados_lote
+
+        # Agrupa os alunos em lotes para enviar enunciado e checklist uma única vez por chamada
+        representantes = {aluno: pendentes[aluno] for aluno in equivalentes}
+        lotes = montar_lotes(representantes, tokens_fixos=estimar_tokens(enunciado + criterios))
+        with etapa("avaliacao_ia"):
+            avaliacoes_lotes = await executar_concorrente(avaliar_lote, lotes, max_concorrencia=concorrencia)
+        for avaliacoes_lote in avaliacoes_lotes:
+            avaliacoes.update(avaliacoes_lote)
+
+        resultados = {
+            aluno: avaliacoes.get(aluno, {"erro": "Nenhum arquivo .cs encontrado"})
+            for aluno in alunos
+        }
+        # O relatório da execução acompanha também as entregas que foram ao modelo
+        for aluno, relatorio in execucoes.items():
+            if "execucao" not in resultados[aluno]:
+                resultados[aluno] = {**resultados[aluno], "execucao": relatorio}
+
+        # Construir o objeto de saída
+        output = {
+            "criterios": criterios,
+            "avaliacoes_ia": resultados,
+            "cache": {"acertos": len(codigos) - len(pendentes), "falhas": len(pendentes)},
+            "preparacao": preparacao,
+            "grupos": grupos_relatorio(grupos)
+        }
+        if execucoes:
+            vereditos = [relatorio["veredito"] or "indeterminado" for relatorio in execucoes.values()]
+            output["execucao"] = {veredito: vereditos.count(veredito) for veredito in sorted(set(vereditos))}
+        ALUNOS.incrementar(len(alunos), modo="ia")
+    else:
+        # Método tradicional de avaliação baseado em palavras-chave
+        # Arquivos gerados pelas ferramentas não são código do aluno e não contam palavras-chave
+        entregas = {aluno: filtrar_arquivos(arquivos_cs)[0] for aluno, arquivos_cs in entregas.items()}
+        with etapa("agrupamento"):
+            grupos = agrupar({
+                aluno: "\n".join(arquivos_cs.values()) for aluno, arquivos_cs in entregas.items() if arquivos_cs
+            })
+        # O resultado depende do texto exato (inclusive comentários): só cópias idênticas
+        # compartilham a avaliação; as semelhantes são apenas sinalizadas no relatório
+        primeiro_com = {}
+        representado_por = {
+            aluno: primeiro_com.setdefault(tuple(arquivos_cs.items()), aluno)
+            for aluno, arquivos_cs in entregas.items()
+        }
+        ALUNOS_AGRUPADOS.incrementar(len(entregas) - len(primeiro_com), modo="palavras_chave")
+
+        with etapa("palavras_chave"):
+            avaliados = await executar_em_thread(
+                avaliar_codigos,
+                {aluno: arquivos_cs for aluno, arquivos_cs in entregas.items() if representado_por[aluno] == aluno},
+                criterios
+            )
+        relatorio = {}
+        for aluno in entregas:
+            representante = representado_por[aluno]
+            relatorio[aluno] = avaliados[representante]
+            if representante != aluno:
+                relatorio[aluno] = {**avaliados[representante], "avaliado_como": representante}
+            ao_concluir(aluno, relatorio[aluno])
+        output = {
+            "criterios": criterios,
+            "relatorio": relatorio,
+            "grupos": grupos_relatorio(grupos)
+        }
+        ALUNOS.incrementar(len(relatorio), modo="palavras_chave")
+
+    return output
+
+def registrar_execucao(espaco, enunciado, usar_ia_direta, output, turma=None, origem=None):
+    """
+    Registra a execução: hashes das entregas e resultado de cada aluno (para futuras reavaliações)
+    e uma linha por aluno e critério no repositório de resultados (para as consultas consolidadas).
+    Função bloqueante: deve ser executada fora do loop de eventos.
+    """
+    resultados = output["avaliacoes_ia"] if usar_ia_direta else output["relatorio"]
+    obter_repositorio_entregas().registrar_execucao(
+        espaco.id, enunciado, output["criterios"], usar_ia_direta,
+        {aluno: (espaco.origens.get(aluno, []), resultado) for aluno, resultado in resultados.items()},
+        origem
+    )
+    obter_repositorio_resultados().registrar(
+        espaco.id, enunciado, "ia" if usar_ia_direta else "palavras_chave", resultados, turma, origem
+    )
+
+def _chave_criterio(criterio: str) -> str:
+    """Normaliza o texto de um critério para comparar checklists e respostas do modelo."""
+    return texto_criterio(criterio).lower().rstrip(".;:")
+
+async def reavaliar_espaco(espaco, anterior, enunciado, criterios, concorrencia=None):
+    """
+    Reavalia uma execução anterior com um novo enunciado e/ou checklist,
+    refazendo apenas o que mudou.
+
+    No modo por IA, o aluno cuja entrega não mudou reaproveita o resultado de
+    cada critério que já existia no checklist anterior, e apenas os critérios
+    novos ou alterados vão ao modelo. Alunos com entrega diferente, sem
+    resultado válido ou ausentes da execução anterior são avaliados por
+    completo. O modo por palavras-chave não gasta cota e é refeito inteiro.
+
+    Args:
+        espaco: EspacoTrabalho com as entregas e suas origens (hashes) já carregadas
+        anterior: Execução anterior, como retornada por RepositorioEntregas.obter_execucao
+        enunciado: Enunciado da reavaliação
+        criterios: Checklist da reavaliação
+        concorrencia: Número máximo de chamadas de avaliação por IA ao mesmo tempo (padrão: CORRETOR_CONCORRENCIA)
+
+    Returns:
+        Dicionário no formato de avaliar_espaco, com a chave "reavaliacao" listando
+        os alunos reaproveitados, os reavaliados só nos critérios novos e os reavaliados por completo
+    """
+    with execucao() as tempos:
+        if anterior["usar_ia_direta"]:
+            output = await _reavaliar_espaco_ia(espaco, anterior, enunciado, criterios, concorrencia)
+        else:
+            output = await _avaliar_espaco(espaco, enunciado, False, concorrencia, None, criterios)
+            output["reavaliacao"] = {
+                "origem": anterior["id"],
+                "reaproveitados": [],
+                "parciais": {},
+                "completos": list(output["relatorio"]),
+            }
+        output["tempos"] = tempos.resumo()
+    return output
+
+async def _reavaliar_espaco_ia(espaco, anterior, enunciado, criterios, concorrencia):
+    checklist = filtrar_criterios(criterios)
+    resultados = {}
+    anteriores = {}
+    completos = EspacoTrabalho(id_execucao=espaco.id)
+    # Critérios que faltam -> espaço com os alunos que precisam só deles
+    parciais = {}
+
+    for aluno, arquivos_cs in espaco.entregas_ordenadas().items():
+        registro = anterior["alunos"].get(aluno) or {}
+        avaliacao = (registro.get("resultado") or {}).get("avaliacao")
+        mesma_entrega = bool(registro.get("hashes")) and registro["hashes"] == espaco.origens.get(aluno)
+        if not checklist or not mesma_entrega or not isinstance(avaliacao, dict) or "erro" in avaliacao:
+            completos.adicionar_entrega(aluno, arquivos_cs)
+            continue
+
+        anteriores[aluno] = {_chave_criterio(c): resultado for c, resultado in avaliacao.items()}
+        faltantes = tuple(c for c in checklist if _chave_criterio(c) not in anteriores[aluno])
+        if faltantes:
+            parciais.setdefault(faltantes, EspacoTrabalho(id_execucao=espaco.id)).adicionar_entrega(aluno, arquivos_cs)
+        else:
+            resultados[aluno] = {
+                "checklist": criterios,
+                "avaliacao": {c: anteriores[aluno][_chave_criterio(c)] for c in checklist},
+            }
+    reaproveitados = list(resultados)
+
+    saidas = []
+    if completos.entregas:
+        saida = await _avaliar_espaco(completos, enunciado, True, concorrencia, None, criterios)
+        resultados.update(saida["avaliacoes_ia"])
+        saidas.append(saida)
+
+    # O checklist enviado contém apenas os critérios que faltam; o restante vem da execução anterior
+    for faltantes, parcial in parciais.items():
+        saida = await _avaliar_espaco(parcial, enunciado, True, concorrencia, None, "\n".join(faltantes))
+        for aluno, resultado in saida["avaliacoes_ia"].items():
+            if "avaliacao" not in resultado or "erro" in resultado["avaliacao"]:
+                resultados[aluno] = resultado
+                continue
+            novos = {**anteriores[aluno], **{_chave_criterio(c): r for c, r in resultado["avaliacao"].items()}}
+            resultados[aluno] = {
+                **resultado,
+                "checklist": criterios,
+                "avaliacao": {c: novos[_chave_criterio(c)] for c in checklist if _chave_criterio(c) in novos},
+            }
+        saidas.append(saida)
+
+    return {
+        "criterios": criterios,
+        "avaliacoes_ia": {aluno: resultados[aluno] for aluno in espaco.entregas_ordenadas()},
+        "cache": {
+            "acertos": sum(saida["cache"]["acertos"] for saida in saidas),
+            "falhas": sum(saida["cache"]["falhas"] for saida in saidas),
+        },
+        "preparacao": {aluno: rel for saida in saidas for aluno, rel in saida["preparacao"].items()},
+        "grupos": [grupo for saida in saidas for grupo in saida["grupos"]],
+        "reavaliacao": {
+            "origem": anterior["id"],
+            "reaproveitados": reaproveitados,
+            "parciais": {aluno: list(faltantes) for faltantes, parcial in parciais.items() for aluno in parcial.entregas},
+            "completos": list(completos.entregas),
+        },
+    }
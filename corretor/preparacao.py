@@ -0,0 +1,166 @@
+import os
+import re
+import hashlib
+
+from corretor.metricas import TOKENS_ECONOMIZADOS
+
+# Orçamento de tokens do código de cada aluno enviado ao modelo (ajustável via .env; 0 = sem limite)
+TOKENS_POR_ALUNO = int(os.getenv("CORRETOR_TOKENS_ALUNO", "4000"))
+
+# Strings são capturadas para que "//" ou "/*" dentro delas não sejam tratados como comentário
+_PADRAO_COMENTARIOS = re.compile(
+    r'(@"(?:""|[^"])*"|"(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\')|//[^\n]*|/\*.*?\*/',
+    re.DOTALL
+)
+
+# Arquivos gerados pelo Visual Studio / MSBuild: nunca foram escritos pelo aluno
+_PADRAO_GERADOS = re.compile(
+    r'(^|/)(assemblyinfo\.cs|[^/]*\.designer\.cs|[^/]*\.g\.cs|[^/]*\.g\.i\.cs|[^/]*\.assemblyattributes\.cs'
+    r'|temporarygeneratedfile_[^/]*\.cs)$'
+)
+_PASTAS_GERADAS = {"bin", "obj"}
+
+# Declarações mantidas quando um arquivo precisa ser resumido (tipos e assinaturas de métodos)
+_MODIFICADORES = r'(?:(?:public|private|protected|internal|static|abstract|virtual|override|async|sealed|partial|readonly)\s+)*'
+_PADRAO_DECLARACAO = re.compile(
+    r'^\s*(?:\[[^\]]*\]\s*)?' + _MODIFICADORES +
+    r'(?:(?:class|struct|interface|enum|record|namespace)\s+\w+'
+    r'|[\w<>\[\],.?]+\s+\w+\s*\([^;{]*\)?)\s*(?:[:{].*)?$'
+)
+_PALAVRAS_NAO_METODO = ("if", "for", "foreach", "while", "switch", "catch", "using", "return", "else", "new", "lock")
+
+def estimar_tokens(texto: str) -> int:
+    """Estimativa simples de tokens (~4 caracteres por token), suficiente para dimensionar lotes."""
+    return len(texto) // 4 + 1
+
+def remover_comentarios(codigo: str) -> str:
+    """Remove comentários de linha e de bloco do código C#, preservando strings."""
+    return _PADRAO_COMENTARIOS.sub(lambda m: m.group(1) or " ", codigo)
+
+def compactar_codigo(codigo: str) -> str:
+    """Remove comentários, espaços no fim das linhas e linhas em branco, mantendo a indentação."""
+    linhas = remover_comentarios(codigo).replace("\t", "    ").split("\n")
+    return "\n".join(linha.rstrip() for linha in linhas if linha.strip())
+
+def caminho_gerado(caminho: str) -> bool:
+    """Indica, só pelo caminho, se o arquivo foi gerado por ferramentas (AssemblyInfo.cs, *.Designer.cs, obj/ etc.)."""
+    normalizado = caminho.replace("\\", "/").lower()
+    if any(parte in _PASTAS_GERADAS for parte in normalizado.split("/")[:-1]):
+        return True
+    return bool(_PADRAO_GERADOS.search(normalizado))
+
+def conteudo_gerado(conteudo: str) -> bool:
+    """Indica se o conteúdo traz o cabeçalho "// <auto-generated" das ferramentas."""
+    return conteudo.lstrip("﻿ \r\n").startswith("// <auto-generated")
+
+def arquivo_gerado(caminho: str, conteudo: str) -> bool:
+    """Indica se o arquivo foi gerado por ferramentas (AssemblyInfo.cs, *.Designer.cs, obj/ etc.)."""
+    return caminho_gerado(caminho) or conteudo_gerado(conteudo)
+
+def filtrar_arquivos(arquivos_cs: dict) -> tuple:
+    """
+    Descarta arquivos gerados e cópias do mesmo arquivo (ex: projeto enviado duas vezes no ZIP).
+
+    Returns:
+        Tupla (arquivos mantidos, caminhos descartados)
+    """
+    mantidos = {}
+    descartados = []
+    vistos = set()
+    for caminho, conteudo in arquivos_cs.items():
+        if arquivo_gerado(caminho, conteudo):
+            descartados.append(caminho)
+            continue
+        # Cópias que diferem apenas em comentários ou formatação também são descartadas
+        assinatura = hashlib.sha256(" ".join(remover_comentarios(conteudo).split()).encode("utf-8")).digest()
+        if assinatura in vistos:
+            descartados.append(caminho)
+            continue
+        vistos.add(assinatura)
+        mantidos[caminho] = conteudo
+    return mantidos, descartados
+
+def resumir_arquivo(codigo: str) -> str:
+    """Mantém apenas as declarações de tipos e as assinaturas de métodos do arquivo."""
+    declaracoes = []
+    for linha in codigo.split("\n"):
+        texto = linha.strip()
+        if texto.split("(")[0].split(" ")[0] in _PALAVRAS_NAO_METODO:
+            continue
+        if _PADRAO_DECLARACAO.match(linha):
+            declaracoes.append(linha.split("{")[0].rstrip())
+    return "\n".join(declaracoes)
+
+def _prioridade(item):
+    caminho, codigo = item
+    # O arquivo com o Main vem primeiro: é onde costuma estar a lógica pedida no enunciado
+    return (0 if re.search(r'\bstatic\s+(?:async\s+)?\w+\s+Main\s*\(', codigo) else 1, caminho)
+
+def preparar_codigo(arquivos_cs: dict, orcamento_tokens: int = TOKENS_POR_ALUNO) -> tuple:
+    """
+    Prepara o código de um aluno para o prompt: descarta arquivos gerados e
+    duplicados, remove comentários e linhas em branco e, se o resultado
+    exceder o orçamento, resume (apenas declarações) ou trunca os arquivos
+    de menor prioridade.
+
+    Args:
+        arquivos_cs: Dicionário caminho -> conteúdo dos arquivos .cs do aluno
+        orcamento_tokens: Tokens disponíveis para o código (0 = sem limite)
+
+    Returns:
+        Tupla (código preparado, relatório com os tokens originais, enviados e
+        economizados, os arquivos descartados, resumidos e truncados)
+    """
+    tokens_originais = sum(estimar_tokens(conteudo + "\n\n") for conteudo in arquivos_cs.values())
+    mantidos, descartados = filtrar_arquivos(arquivos_cs)
+
+    compactados = sorted(
+        ((caminho, compactar_codigo(conteudo)) for caminho, conteudo in mantidos.items()),
+        key=_prioridade
+    )
+
+    partes = []
+    resumidos = []
+    truncados = []
+    restante = orcamento_tokens
+    # Com um único arquivo, o cabeçalho com o caminho só gastaria tokens
+    def cabecalho(caminho, nota=""):
+        if len(compactados) == 1 and not nota:
+            return ""
+        return f"// Arquivo: {caminho}{nota}\n"
+
+    for caminho, codigo in compactados:
+        bloco = f"{cabecalho(caminho)}{codigo}\n"
+        if orcamento_tokens and estimar_tokens(bloco) > restante:
+            # No arquivo do Main o corpo é o que interessa: ele é truncado, nunca resumido
+            resumo = resumir_arquivo(codigo) if _prioridade((caminho, codigo))[0] else ""
+            bloco_resumo = f"{cabecalho(caminho, ' (resumido: apenas declarações)')}{resumo}\n"
+            if resumo and estimar_tokens(bloco_resumo) <= restante:
+                bloco = bloco_resumo
+                resumidos.append(caminho)
+            else:
+                # Nem o resumo cabe: envia o início do arquivo até esgotar o orçamento
+                limite = max(0, (restante - 1) * 4 - 40)
+                if limite <= 0:
+                    truncados.append(caminho)
+                    continue
+                # Corta na última quebra de linha, para não enviar uma linha pela metade
+                inicio = codigo[:limite].rsplit("\n", 1)[0] if "\n" in codigo[:limite] else codigo[:limite]
+                bloco = f"{cabecalho(caminho, ' (truncado)')}{inicio}\n"
+                truncados.append(caminho)
+        partes.append(bloco)
+        restante -= estimar_tokens(bloco)
+
+    codigo_preparado = "\n".join(partes)
+    tokens_enviados = estimar_tokens(codigo_preparado) if partes else 0
+    economizados = max(0, tokens_originais - tokens_enviados)
+    TOKENS_ECONOMIZADOS.incrementar(economizados)
+
+    return codigo_preparado, {
+        "tokens_originais": tokens_originais,
+        "tokens_enviados": tokens_enviados,
+        "tokens_economizados": economizados,
+        "arquivos_descartados": descartados,
+        "arquivos_resumidos": resumidos,
+        "arquivos_truncados": truncados,
+    }
@@ -0,0 +1,277 @@
+import os
+import time
+
+from corretor.banco import RepositorioSQLite, compartilhado
+
+# Arquivo do repositório de resultados consolidados (ajustável via .env)
+CAMINHO_RESULTADOS = os.getenv("CORRETOR_RESULTADOS", "./results/resultados.db")
+
+def texto_criterio(criterio: str) -> str:
+    """Texto do critério sem o marcador "[ ]" e sem espaços extras, para agrupar entre execuções."""
+    texto = criterio.strip().lstrip("-• ")
+    if texto[:3] in ("[ ]", "[x]", "[X]"):
+        texto = texto[3:]
+    return " ".join(texto.split())
+
+def veredictos(resultado) -> tuple:
+    """
+    Extrai os critérios de um resultado de aluno, em qualquer dos modos de avaliação.
+
+    Returns:
+        Tupla (dicionário critério -> aprovado, mensagem de erro ou None)
+    """
+    if not isinstance(resultado, dict):
+        return {}, "Resultado ausente"
+    if "erro" in resultado:
+        return {}, str(resultado["erro"])
+    # Avaliação por IA usa "avaliacao"; por palavras-chave, "criterios"
+    avaliacao = resultado.get("avaliacao", resultado.get("criterios"))
+    if not isinstance(avaliacao, dict):
+        return {}, "Resultado sem critérios"
+    if "erro" in avaliacao:
+        return {}, str(avaliacao.get("mensagem") or avaliacao["erro"])
+    return {
+        texto_criterio(criterio): str(valor).strip().upper() == "OK"
+        for criterio, valor in avaliacao.items()
+    }, None
+
+def _taxa(aprovados, total):
+    return round(aprovados / total, 4) if total else None
+
+class RepositorioResultados(RepositorioSQLite):
+    """
+    Repositório (SQLite) dos resultados consolidados, com uma linha por aluno
+    × critério em cada execução. Permite responder perguntas sobre muitas
+    turmas (ex: qual critério mais falha) com consultas indexadas, sem ler os
+    JSON de cada execução.
+
+    Args:
+        caminho: Arquivo do banco SQLite (":memory:" para um repositório temporário)
+    """
+
+    def __init__(self, caminho=CAMINHO_RESULTADOS):
+        super().__init__(caminho, (
+            "CREATE TABLE IF NOT EXISTS execucoes ("
+            " id TEXT PRIMARY KEY,"
+            " turma TEXT,"
+            " enunciado TEXT NOT NULL,"
+            " modo TEXT NOT NULL,"
+            " origem TEXT,"
+            " criado_em REAL NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS alunos ("
+            " execucao_id TEXT NOT NULL,"
+            " aluno TEXT NOT NULL,"
+            " aprovados INTEGER NOT NULL,"
+            " total INTEGER NOT NULL,"
+            " erro TEXT,"
+            " PRIMARY KEY (execucao_id, aluno));"
+            "CREATE TABLE IF NOT EXISTS criterios ("
+            " execucao_id TEXT NOT NULL,"
+            " aluno TEXT NOT NULL,"
+            " criterio TEXT NOT NULL,"
+            " aprovado INTEGER NOT NULL,"
+            " PRIMARY KEY (execucao_id, aluno, criterio));"
+            "CREATE INDEX IF NOT EXISTS idx_execucoes_turma ON execucoes (turma, criado_em);"
+            "CREATE INDEX IF NOT EXISTS idx_execucoes_criado ON execucoes (criado_em);"
+            "CREATE INDEX IF NOT EXISTS idx_alunos_aluno ON alunos (aluno);"
+            "CREATE INDEX IF NOT EXISTS idx_criterios_criterio ON criterios (criterio, aprovado);"
+        ))
+
+    def registrar(self, id_execucao, enunciado, modo, resultados: dict, turma=None, origem=None):
+        """
+        Registra (ou substitui) os resultados de uma execução.
+
+        Args:
+            id_execucao: Identificador da execução
+            enunciado: Texto do enunciado avaliado
+            modo: "ia" ou "palavras_chave"
+            resultados: Dicionário aluno -> resultado, como retornado pelo pipeline
+            turma: Rótulo opcional da turma, usado nos resumos por turma
+            origem: Id da execução reavaliada, se for uma reavaliação
+        """
+        alunos = []
+        criterios = []
+        for aluno, resultado in resultados.items():
+            aprovacoes, erro = veredictos(resultado)
+            alunos.append((id_execucao, aluno, sum(aprovacoes.values()), len(aprovacoes), erro))
+            criterios.extend(
+                (id_execucao, aluno, criterio, int(aprovado)) for criterio, aprovado in aprovacoes.items()
+            )
+
+        with self._lock:
+            self._conn.execute("DELETE FROM alunos WHERE execucao_id = ?", (id_execucao,))
+            self._conn.execute("DELETE FROM criterios WHERE execucao_id = ?", (id_execucao,))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO execucoes (id, turma, enunciado, modo, origem, criado_em) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (id_execucao, turma, enunciado, modo, origem, time.time())
+            )
+            self._conn.executemany(
+                "INSERT INTO alunos (execucao_id, aluno, aprovados, total, erro) VALUES (?, ?, ?, ?, ?)", alunos
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO criterios (execucao_id, aluno, criterio, aprovado) VALUES (?, ?, ?, ?)",
+                criterios
+            )
+            self._conn.commit()
+
+    def turma_da_execucao(self, id_execucao):
+        """Retorna o rótulo de turma registrado para a execução, ou None."""
+        with self._lock:
+            linha = self._conn.execute("SELECT turma FROM execucoes WHERE id = ?", (id_execucao,)).fetchone()
+        return linha[0] if linha else None
+
+    def taxas_criterios(self, turma=None, desde=None, limite=50) -> list:
+        """
+        Taxa de aprovação de cada critério, do que mais falha para o que menos falha.
+
+        Args:
+            turma: Considera apenas as execuções desta turma (opcional)
+            desde: Considera apenas as execuções a partir deste timestamp (opcional)
+            limite: Número máximo de critérios retornados
+        """
+        filtros = []
+        parametros = []
+        if turma is not None:
+            filtros.append("e.turma = ?")
+            parametros.append(turma)
+        if desde is not None:
+            filtros.append("e.criado_em >= ?")
+            parametros.append(desde)
+
+        if filtros:
+            consulta = (
+                "SELECT c.criterio, COUNT(*), SUM(c.aprovado) FROM criterios c "
+                "JOIN execucoes e ON e.id = c.execucao_id WHERE " + " AND ".join(filtros) +
+                " GROUP BY c.criterio"
+            )
+        else:
+            # Sem filtros, a consulta é respondida só pelo índice (criterio, aprovado)
+            consulta = "SELECT criterio, COUNT(*), SUM(aprovado) FROM criterios GROUP BY criterio"
+        consulta += " ORDER BY CAST(SUM(aprovado) AS REAL) / COUNT(*), COUNT(*) DESC LIMIT ?"
+
+        with self._lock:
+            linhas = self._conn.execute(consulta, (*parametros, limite)).fetchall()
+        return [
+            {"criterio": criterio, "avaliacoes": total, "aprovados": aprovados, "taxa_aprovacao": _taxa(aprovados, total)}
+            for criterio, total, aprovados in linhas
+        ]
+
+    def historico_aluno(self, aluno: str, limite=100) -> list:
+        """Execuções em que o aluno foi avaliado, da mais recente para a mais antiga, com os critérios em falha."""
+        with self._lock:
+            execucoes = self._conn.execute(
+                "SELECT a.execucao_id, e.turma, e.enunciado, e.modo, e.criado_em, a.aprovados, a.total, a.erro "
+                "FROM alunos a JOIN execucoes e ON e.id = a.execucao_id "
+                "WHERE a.aluno = ? ORDER BY e.criado_em DESC LIMIT ?",
+                (aluno, limite)
+            ).fetchall()
+            falhas = {}
+            for id_execucao, *_ in execucoes:
+                falhas[id_execucao] = [
+                    linha[0] for linha in self._conn.execute(
+                        "SELECT criterio FROM criterios WHERE execucao_id = ? AND aluno = ? AND aprovado = 0 "
+                        "ORDER BY criterio",
+                        (id_execucao, aluno)
+                    )
+                ]
+
+        return [
+            {
+                "id_execucao": id_execucao,
+                "turma": turma,
+                "enunciado": enunciado,
+                "modo": modo,
+                "criado_em": criado_em,
+                "aprovados": aprovados,
+                "total": total,
+                "nota": _taxa(aprovados, total),
+                "erro": erro,
+                "falhas": falhas[id_execucao],
+            }
+            for id_execucao, turma, enunciado, modo, criado_em, aprovados, total, erro in execucoes
+        ]
+
+    def resumo_execucao(self, id_execucao):
+        """
+        Resumo de uma execução: nota de cada aluno, média e taxa de aprovação por critério.
+
+        Returns:
+            Dicionário com o resumo, ou None se a execução não existir
+        """
+        with self._lock:
+            execucao = self._conn.execute(
+                "SELECT turma, enunciado, modo, origem, criado_em FROM execucoes WHERE id = ?", (id_execucao,)
+            ).fetchone()
+            if execucao is None:
+                return None
+            alunos = self._conn.execute(
+                "SELECT aluno, aprovados, total, erro FROM alunos WHERE execucao_id = ? ORDER BY aluno",
+                (id_execucao,)
+            ).fetchall()
+            criterios = self._conn.execute(
+                "SELECT criterio, COUNT(*), SUM(aprovado) FROM criterios WHERE execucao_id = ? "
+                "GROUP BY criterio ORDER BY CAST(SUM(aprovado) AS REAL) / COUNT(*), criterio",
+                (id_execucao,)
+            ).fetchall()
+
+        turma, enunciado, modo, origem, criado_em = execucao
+        notas = [_taxa(aprovados, total) for _, aprovados, total, erro in alunos if total and not erro]
+        return {
+            "id_execucao": id_execucao,
+            "turma": turma,
+            "enunciado": enunciado,
+            "modo": modo,
+            "origem": origem,
+            "criado_em": criado_em,
+            "alunos": len(alunos),
+            "erros": sum(1 for *_, erro in alunos if erro),
+            "nota_media": round(sum(notas) / len(notas), 4) if notas else None,
+            "criterios": [
+                {"criterio": criterio, "avaliacoes": total, "aprovados": aprovados, "taxa_aprovacao": _taxa(aprovados, total)}
+                for criterio, total, aprovados in criterios
+            ],
+            "notas": {
+                aluno: {"aprovados": aprovados, "total": total, "nota": _taxa(aprovados, total), "erro": erro}
+                for aluno, aprovados, total, erro in alunos
+            },
+        }
+
+    def resumo_turma(self, turma: str, limite_criterios=50):
+        """
+        Resumo de uma turma: suas execuções (com média e número de alunos) e a
+        taxa de aprovação de cada critério em todas elas.
+
+        Returns:
+            Dicionário com o resumo, ou None se a turma não tiver execuções
+        """
+        with self._lock:
+            execucoes = self._conn.execute(
+                "SELECT e.id, e.enunciado, e.modo, e.criado_em, COUNT(a.aluno),"
+                " SUM(CASE WHEN a.erro IS NOT NULL THEN 1 ELSE 0 END),"
+                " AVG(CASE WHEN a.erro IS NULL AND a.total > 0 THEN CAST(a.aprovados AS REAL) / a.total END) "
+                "FROM execucoes e LEFT JOIN alunos a ON a.execucao_id = e.id "
+                "WHERE e.turma = ? GROUP BY e.id ORDER BY e.criado_em",
+                (turma,)
+            ).fetchall()
+        if not execucoes:
+            return None
+
+        return {
+            "turma": turma,
+            "execucoes": [
+                {
+                    "id_execucao": id_execucao,
+                    "enunciado": enunciado,
+                    "modo": modo,
+                    "criado_em": criado_em,
+                    "alunos": alunos,
+                    "erros": erros or 0,
+                    "nota_media": round(media, 4) if media is not None else None,
+                }
+                for id_execucao, enunciado, modo, criado_em, alunos, erros, media in execucoes
+            ],
+            "criterios": self.taxas_criterios(turma=turma, limite=limite_criterios),
+        }
+
+obter_repositorio_resultados = compartilhado(RepositorioResultados, "o repositório de resultados")
@@ -0,0 +1,190 @@
+import os
+import re
+import heapq
+import hashlib
+
+from corretor.preparacao import remover_comentarios
+
+# Similaridade mínima (0 a 1) para que entregas sejam apontadas como quase cópias no relatório (0 desativa)
+LIMIAR_SIMILARIDADE = float(os.getenv("CORRETOR_LIMIAR_SIMILARIDADE", "0.95"))
+
+# Número de tokens por trecho comparado e tamanho da assinatura MinHash (bottom-k)
+TAMANHO_TRECHO = 5
+TAMANHO_ASSINATURA = 128
+# Quantos dos menores hashes de cada assinatura entram no índice de candidatos
+HASHES_INDEXADOS = 8
+
+_PADRAO_TOKENS = re.compile(
+    r'@?"(?:""|\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'|\d[\w.]*|[A-Za-z_]\w*|[^\sA-Za-z_\d]'
+)
+
+PALAVRAS_RESERVADAS = frozenset("""
+abstract as base bool break byte case catch char checked class const continue decimal default delegate do
+double else enum event explicit extern false finally fixed float for foreach goto if implicit in int interface
+internal is lock long namespace new null object operator out override params private protected public readonly
+ref return sbyte sealed short sizeof stackalloc static string struct switch this throw true try typeof uint ulong
+unchecked unsafe ushort using var virtual void volatile while async await get set value
+""".split())
+
+def tokens_normalizados(codigo: str, sem_comentarios: bool = False) -> list:
+    """
+    Quebra o código C# em tokens, ignorando comentários e formatação.
+
+    Nomes de variáveis (identificadores iniciados em minúscula que não são
+    palavras reservadas nem membros acessados com ".") viram "ID" e textos
+    entre aspas viram "STR": renomear variáveis ou trocar mensagens não
+    altera o resultado. Tipos, métodos e membros (ex: Console.WriteLine,
+    fila.Add) são mantidos, pois distinguem o que o código faz.
+
+    Args:
+        codigo: Código-fonte C#
+        sem_comentarios: Se True, o código já está sem comentários
+    """
+    tokens = []
+    anterior = ""
+    for token in _PADRAO_TOKENS.findall(codigo if sem_comentarios else remover_comentarios(codigo)):
+        inicial = token[0]
+        if inicial in "\"'@":
+            tokens.append("STR")
+        elif (inicial.islower() or inicial == "_") and token not in PALAVRAS_RESERVADAS and anterior != ".":
+            tokens.append("ID")
+        else:
+            tokens.append(token)
+        anterior = token
+    return tokens
+
+def tokens_equivalentes(codigo: str, sem_comentarios: bool = False) -> list:
+    """
+    Quebra o código C# em tokens que só ignoram comentários, formatação e
+    nomes de variáveis: códigos com os mesmos tokens fazem exatamente o mesmo.
+
+    Ao contrário de tokens_normalizados, textos, números e operadores são
+    mantidos, e cada nome de variável vira "ID1", "ID2", ... pela ordem em
+    que aparece pela primeira vez (trocar `a - b` por `b - a` muda o resultado).
+
+    Args:
+        codigo: Código-fonte C#
+        sem_comentarios: Se True, o código já está sem comentários
+    """
+    tokens = []
+    nomes = {}
+    anterior = ""
+    for token in _PADRAO_TOKENS.findall(codigo if sem_comentarios else remover_comentarios(codigo)):
+        inicial = token[0]
+        if (inicial.islower() or inicial == "_") and token not in PALAVRAS_RESERVADAS and anterior != ".":
+            tokens.append(nomes.setdefault(token, f"ID{len(nomes) + 1}"))
+        else:
+            tokens.append(token)
+        anterior = token
+    return tokens
+
+class ImpressaoDigital:
+    """
+    Impressão digital de uma entrega: hash do código normalizado (cópias exatas),
+    hash dos tokens com as variáveis renomeadas (códigos equivalentes) e assinatura
+    MinHash bottom-k dos trechos de tokens (cópias aproximadas).
+    """
+
+    def __init__(self, codigo: str):
+        codigo = remover_comentarios(codigo)
+        self.exata = hashlib.sha256(" ".join(codigo.split()).encode("utf-8")).hexdigest()
+        self.equivalente = hashlib.sha256(
+            "\0".join(tokens_equivalentes(codigo, sem_comentarios=True)).encode("utf-8")
+        ).hexdigest()
+        tokens = tokens_normalizados(codigo, sem_comentarios=True)
+        # hash() basta: as impressões só são comparadas dentro do mesmo processo
+        trechos = {
+            hash(tuple(tokens[i:i + TAMANHO_TRECHO]))
+            for i in range(max(1, len(tokens) - TAMANHO_TRECHO + 1))
+        } if tokens else set()
+        menores = heapq.nsmallest(TAMANHO_ASSINATURA, trechos)
+        self.assinatura = frozenset(menores)
+        self.prefixo = menores[:HASHES_INDEXADOS]
+
+    def similaridade(self, outra) -> float:
+        """Estimativa da similaridade de Jaccard entre os trechos das duas entregas (0 a 1)."""
+        if self.exata == outra.exata:
+            return 1.0
+        if not self.assinatura or not outra.assinatura:
+            return 0.0
+        # Estimador bottom-k: entre os k menores hashes da união, a fração presente nas duas
+        uniao = sorted(self.assinatura | outra.assinatura)[:TAMANHO_ASSINATURA]
+        comuns = self.assinatura & outra.assinatura
+        return sum(1 for h in uniao if h in comuns) / len(uniao)
+
+def agrupar_equivalentes(codigos: dict) -> dict:
+    """
+    Agrupa entregas equivalentes: cópias e códigos que diferem apenas em
+    comentários, formatação ou nomes de variáveis (ver tokens_equivalentes).
+    Só esses grupos podem compartilhar uma avaliação.
+
+    Args:
+        codigos: Dicionário aluno -> código-fonte (na ordem de avaliação)
+
+    Returns:
+        Dicionário representante -> lista de alunos do grupo (começando pelo
+        representante), incluindo grupos de um único aluno
+    """
+    grupos = {}
+    por_hash = {}
+    for aluno, codigo in codigos.items():
+        representante = por_hash.setdefault(ImpressaoDigital(codigo).equivalente, aluno)
+        grupos.setdefault(representante, []).append(aluno)
+    return grupos
+
+def agrupar(codigos: dict, limiar: float = LIMIAR_SIMILARIDADE) -> dict:
+    """
+    Agrupa entregas parecidas (cópias aproximadas, para o relatório de plágio).
+    Cada aluno entra no grupo do primeiro representante com similaridade >= limiar;
+    assim, todos os membros são próximos do representante (a semelhança não se
+    propaga em cadeia). Membros parecidos não são necessariamente equivalentes:
+    use agrupar_equivalentes para compartilhar avaliações.
+
+    Args:
+        codigos: Dicionário aluno -> código-fonte (na ordem de avaliação)
+        limiar: Similaridade mínima para agrupar (0 desativa o agrupamento)
+
+    Returns:
+        Dicionário representante -> {aluno: similaridade com o representante},
+        incluindo grupos de um único aluno
+    """
+    grupos = {}
+    impressoes = {}
+    por_hash = {}
+    # Índice invertido: um dos menores hashes de trecho -> representantes que o têm.
+    # Entregas quase iguais têm quase os mesmos menores hashes, então sempre se encontram
+    indice = {}
+
+    for aluno, codigo in codigos.items():
+        impressao = ImpressaoDigital(codigo)
+        representante = por_hash.get(impressao.exata)
+
+        if representante is None and limiar > 0:
+            candidatos = {r for h in impressao.prefixo for r in indice.get(h, ())}
+            melhor = 0.0
+            for candidato in candidatos:
+                # A similaridade estimada nunca passa de (trechos em comum) / (maior assinatura)
+                outra = impressoes[candidato].assinatura
+                if len(impressao.assinatura & outra) < limiar * max(len(impressao.assinatura), len(outra)):
+                    continue
+                similaridade = impressao.similaridade(impressoes[candidato])
+                if similaridade >= limiar and similaridade > melhor:
+                    representante, melhor = candidato, similaridade
+
+        if representante is None or limiar <= 0:
+            grupos[aluno] = {aluno: 1.0}
+            impressoes[aluno] = impressao
+            por_hash.setdefault(impressao.exata, aluno)
+            for h in impressao.prefixo:
+                indice.setdefault(h, []).append(aluno)
+        else:
+            grupos[representante][aluno] = round(impressao.similaridade(impressoes[representante]), 3)
+
+    return grupos
+
+def grupos_relatorio(grupos: dict) -> list:
+    """Lista, para o relatório, os grupos com mais de um aluno."""
+    return [
+        {"representante": representante, "membros": membros}
+        for representante, membros in grupos.items() if len(membros) > 1
+    ]
@@ -0,0 +1,319 @@
+import os
+import json
+import time
+import socket
+import asyncio
+import uuid
+
+from corretor.banco import RepositorioSQLite, compartilhado
+from corretor.espaco_trabalho import EspacoTrabalho
+from corretor.pipeline import avaliar_espaco, registrar_execucao
+from corretor.agendador import executar_em_thread
+from corretor.metricas import log
+
+# Arquivo do repositório de tarefas de avaliação (ajustável via .env)
+CAMINHO_TAREFAS = os.getenv("CORRETOR_TAREFAS", "./results/tarefas.db")
+
+# Prazo da posse de uma tarefa (segundos): o dono a renova enquanto executa; sem renovação
+# nesse prazo (processo encerrado, máquina desligada), outro processo pode retomá-la
+TEMPO_ABANDONO = float(os.getenv("CORRETOR_TAREFA_ABANDONO", "120"))
+INTERVALO_RENOVACAO = TEMPO_ABANDONO / 4
+
+# Identifica o processo dono de uma tarefa em execução (único mesmo com PIDs reaproveitados)
+DONO_ATUAL = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+class RepositorioTarefas(RepositorioSQLite):
+    """
+    Repositório persistente (SQLite) das tarefas de avaliação assíncronas.
+
+    Cada tarefa guarda o enunciado, as opções da avaliação e, para cada aluno,
+    o código enviado e o resultado (quando concluído). Assim, se o servidor
+    reiniciar, apenas os alunos ainda pendentes são avaliados novamente.
+
+    Args:
+        caminho: Arquivo do banco SQLite (":memory:" para um repositório temporário)
+    """
+
+    def __init__(self, caminho=CAMINHO_TAREFAS):
+        super().__init__(caminho, (
+            "CREATE TABLE IF NOT EXISTS tarefas ("
+            " id TEXT PRIMARY KEY,"
+            " enunciado TEXT NOT NULL,"
+            " usar_ia_direta INTEGER NOT NULL,"
+            " concorrencia INTEGER,"
+            " status TEXT NOT NULL,"
+            " criterios TEXT,"
+            " turma TEXT,"
+            " executar_codigo INTEGER,"
+            " casos TEXT,"
+            " erro TEXT,"
+            " dono TEXT,"
+            " criado_em REAL NOT NULL,"
+            " atualizado_em REAL NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS tarefas_alunos ("
+            " tarefa_id TEXT NOT NULL,"
+            " aluno TEXT NOT NULL,"
+            " arquivos TEXT NOT NULL,"
+            " hashes TEXT,"
+            " status TEXT NOT NULL,"
+            " resultado TEXT,"
+            " concluido_em REAL,"
+            " PRIMARY KEY (tarefa_id, aluno));"
+            "CREATE INDEX IF NOT EXISTS idx_tarefas_status ON tarefas (status);"
+        ))
+
+    def criar(self, id_tarefa, enunciado, usar_ia_direta, concorrencia, entregas, turma=None,
+              executar_codigo=None, casos=None, origens=None):
+        """
+        Registra uma nova tarefa com todos os alunos pendentes.
+
+        Args:
+            id_tarefa: Identificador da tarefa
+            enunciado: Texto descritivo da atividade
+            usar_ia_direta: Se True, usa avaliação direta por IA; se False, usa busca por palavras-chave
+            concorrencia: Número máximo de chamadas de avaliação por IA ao mesmo tempo
+            entregas: Dicionário aluno -> arquivos .cs
+            turma: Rótulo opcional da turma, usado nos resumos de /resultados/turmas
+            executar_codigo: Se False, não executa as entregas mesmo com CORRETOR_EXECUTAR_CODIGO=1
+            casos: Casos de teste [{"entrada", "saida"}] (padrão: gerados a partir do enunciado)
+            origens: Dicionário aluno -> hashes dos arquivos compactados, para reavaliações da execução
+        """
+        origens = origens or {}
+        agora = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO tarefas (id, enunciado, usar_ia_direta, concorrencia, turma, executar_codigo, casos,"
+                " status, criado_em, atualizado_em) VALUES (?, ?, ?, ?, ?, ?, ?, 'pendente', ?, ?)",
+                (
+                    id_tarefa, enunciado, int(usar_ia_direta), concorrencia, turma,
+                    None if executar_codigo is None else int(executar_codigo),
+                    None if casos is None else json.dumps(casos, ensure_ascii=False), agora, agora
+                )
+            )
+            self._conn.executemany(
+                "INSERT INTO tarefas_alunos (tarefa_id, aluno, arquivos, hashes, status) VALUES (?, ?, ?, ?, 'pendente')",
+                [
+                    (id_tarefa, aluno, json.dumps(arquivos, ensure_ascii=False), json.dumps(origens.get(aluno, [])))
+                    for aluno, arquivos in entregas.items()
+                ]
+            )
+            self._conn.commit()
+
+    def obter(self, id_tarefa):
+        """
+        Retorna o estado da tarefa com o status e o resultado parcial de cada aluno.
+
+        Returns:
+            Dicionário com o estado da tarefa, ou None se ela não existir
+        """
+        with self._lock:
+            tarefa = self._conn.execute(
+                "SELECT enunciado, usar_ia_direta, concorrencia, status, criterios, erro, criado_em, atualizado_em,"
+                " turma, executar_codigo, casos FROM tarefas WHERE id = ?", (id_tarefa,)
+            ).fetchone()
+            if tarefa is None:
+                return None
+            alunos = self._conn.execute(
+                "SELECT aluno, status, resultado, hashes FROM tarefas_alunos WHERE tarefa_id = ? ORDER BY aluno",
+                (id_tarefa,)
+            ).fetchall()
+
+        concluidos = sum(1 for _, status, *_ in alunos if status == "concluido")
+        return {
+            "id": id_tarefa,
+            "enunciado": tarefa[0],
+            "usar_ia_direta": bool(tarefa[1]),
+            "concorrencia": tarefa[2],
+            "status": tarefa[3],
+            "criterios": tarefa[4],
+            "erro": tarefa[5],
+            "criado_em": tarefa[6],
+            "atualizado_em": tarefa[7],
+            "turma": tarefa[8],
+            "executar_codigo": None if tarefa[9] is None else bool(tarefa[9]),
+            "casos": json.loads(tarefa[10]) if tarefa[10] else None,
+            "progresso": {"concluidos": concluidos, "total": len(alunos)},
+            "alunos": {
+                aluno: {
+                    "status": status,
+                    "resultado": json.loads(resultado) if resultado else None,
+                    "hashes": json.loads(hashes) if hashes else [],
+                }
+                for aluno, status, resultado, hashes in alunos
+            }
+        }
+
+    def entregas_pendentes(self, id_tarefa) -> dict:
+        """Retorna aluno -> arquivos .cs dos alunos ainda não avaliados."""
+        with self._lock:
+            linhas = self._conn.execute(
+                "SELECT aluno, arquivos FROM tarefas_alunos WHERE tarefa_id = ? AND status = 'pendente'",
+                (id_tarefa,)
+            ).fetchall()
+        return {aluno: json.loads(arquivos) for aluno, arquivos in linhas}
+
+    def status(self, id_tarefa):
+        """Retorna apenas o status da tarefa, ou None se ela não existir."""
+        with self._lock:
+            linha = self._conn.execute("SELECT status FROM tarefas WHERE id = ?", (id_tarefa,)).fetchone()
+        return linha[0] if linha else None
+
+    def resultados_desde(self, id_tarefa, desde: float) -> list:
+        """Retorna (aluno, resultado, concluido_em) dos alunos concluídos a partir de `desde`, em ordem de conclusão."""
+        with self._lock:
+            linhas = self._conn.execute(
+                "SELECT aluno, resultado, concluido_em FROM tarefas_alunos "
+                "WHERE tarefa_id = ? AND status = 'concluido' AND concluido_em >= ? ORDER BY concluido_em, aluno",
+                (id_tarefa, desde)
+            ).fetchall()
+        return [(aluno, json.loads(resultado), concluido_em) for aluno, resultado, concluido_em in linhas]
+
+    def registrar_resultado(self, id_tarefa, aluno, resultado):
+        """Marca o aluno como concluído e guarda seu resultado."""
+        agora = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE tarefas_alunos SET status = 'concluido', resultado = ?, concluido_em = ? "
+                "WHERE tarefa_id = ? AND aluno = ?",
+                (json.dumps(resultado, ensure_ascii=False), agora, id_tarefa, aluno)
+            )
+            self._conn.execute("UPDATE tarefas SET atualizado_em = ? WHERE id = ?", (agora, id_tarefa))
+            self._conn.commit()
+
+    def atualizar(self, id_tarefa, status, criterios=None, erro=None):
+        """Atualiza o status da tarefa (e, se informados, os critérios ou a mensagem de erro)."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE tarefas SET status = ?, criterios = COALESCE(?, criterios), erro = ?, atualizado_em = ? "
+                "WHERE id = ?",
+                (status, criterios, erro, time.time(), id_tarefa)
+            )
+            self._conn.commit()
+
+    def reivindicar(self, id_tarefa) -> bool:
+        """
+        Torna este processo o dono da tarefa, se ela não pertencer a outro processo com a posse
+        em dia (renovada há menos de TEMPO_ABANDONO). Evita que vários workers executem a
+        mesma tarefa após um reinício.
+        """
+        agora = time.time()
+        with self._lock:
+            linha = self._conn.execute(
+                "SELECT dono, atualizado_em FROM tarefas WHERE id = ?", (id_tarefa,)
+            ).fetchone()
+            if linha is None:
+                return False
+            dono, atualizado_em = linha
+            if dono and dono != DONO_ATUAL and agora - atualizado_em < TEMPO_ABANDONO:
+                return False
+            cursor = self._conn.execute(
+                "UPDATE tarefas SET dono = ?, atualizado_em = ? WHERE id = ? AND dono IS ?",
+                (DONO_ATUAL, agora, id_tarefa, dono)
+            )
+            self._conn.commit()
+            return cursor.rowcount == 1
+
+    def renovar(self, id_tarefa) -> bool:
+        """Renova a posse da tarefa por este processo. Retorna False se ela passou a outro dono."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE tarefas SET atualizado_em = ? WHERE id = ? AND dono = ?", (time.time(), id_tarefa, DONO_ATUAL)
+            )
+            self._conn.commit()
+            return cursor.rowcount == 1
+
+    def inacabadas(self) -> list:
+        """Retorna os ids das tarefas que ainda não terminaram."""
+        with self._lock:
+            linhas = self._conn.execute(
+                "SELECT id FROM tarefas WHERE status IN ('pendente', 'executando') ORDER BY criado_em"
+            ).fetchall()
+        return [linha[0] for linha in linhas]
+
+async def executar_tarefa(repositorio: RepositorioTarefas, id_tarefa: str):
+    """
+    Avalia os alunos pendentes de uma tarefa, registrando cada resultado assim que fica pronto.
+    As operações do repositório (SQLite, bloqueantes) rodam fora do loop de eventos.
+
+    Returns:
+        Estado final da tarefa (ver RepositorioTarefas.obter), ou None se outro processo a concluiu
+        ou assumiu a posse durante a execução
+    """
+    # Tarefa com outro dono: aguarda a conclusão ou o fim da posse (dono encerrado) para retomá-la
+    while not await executar_em_thread(repositorio.reivindicar, id_tarefa):
+        if await executar_em_thread(repositorio.status, id_tarefa) not in ("pendente", "executando"):
+            return None
+        await asyncio.sleep(INTERVALO_RENOVACAO)
+    avaliacao = asyncio.create_task(_executar_tarefa(repositorio, id_tarefa))
+    renovacao = asyncio.create_task(_renovar_posse(repositorio, id_tarefa, avaliacao))
+    try:
+        return await avaliacao
+    except asyncio.CancelledError:
+        # Cancelada pela renovação: o novo dono conclui a tarefa e grava o status final
+        if renovacao.done() and not renovacao.cancelled():
+            return None
+        raise
+    finally:
+        renovacao.cancel()
+
+async def _renovar_posse(repositorio, id_tarefa, avaliacao):
+    """Renova periodicamente a posse da tarefa; se outro processo a assumiu, cancela a avaliação."""
+    while True:
+        await asyncio.sleep(INTERVALO_RENOVACAO)
+        if not await executar_em_thread(repositorio.renovar, id_tarefa):
+            log.warning("Tarefa %s: posse assumida por outro processo, avaliação interrompida", id_tarefa)
+            avaliacao.cancel()
+            return
+
+async def _executar_tarefa(repositorio, id_tarefa):
+    """Executa a tarefa já reivindicada por este processo (ver executar_tarefa)."""
+    loop = asyncio.get_running_loop()
+    tarefa = await executar_em_thread(repositorio.obter, id_tarefa)
+    await executar_em_thread(repositorio.atualizar, id_tarefa, "executando")
+
+    # ao_concluir é chamado no loop (cache, palavras-chave) ou em threads do pool (avaliação por IA);
+    # no loop, a gravação vai para uma thread e é aguardada antes de encerrar a tarefa
+    gravacoes = []
+
+    def registrar_resultado(aluno, resultado):
+        try:
+            no_loop = asyncio.get_running_loop() is loop
+        except RuntimeError:
+            no_loop = False
+        if no_loop:
+            gravacoes.append(loop.run_in_executor(None, repositorio.registrar_resultado, id_tarefa, aluno, resultado))
+        else:
+            repositorio.registrar_resultado(id_tarefa, aluno, resultado)
+
+    with EspacoTrabalho(id_execucao=id_tarefa) as espaco:
+        for aluno, arquivos in (await executar_em_thread(repositorio.entregas_pendentes, id_tarefa)).items():
+            espaco.adicionar_entrega(aluno, arquivos)
+        log.info("Tarefa %s: %d aluno(s) pendente(s)", id_tarefa, len(espaco.entregas))
+
+        try:
+            output = await avaliar_espaco(
+                espaco, tarefa["enunciado"], tarefa["usar_ia_direta"], tarefa["concorrencia"],
+                ao_concluir=registrar_resultado, executar_codigo=tarefa["executar_codigo"], casos=tarefa["casos"]
+            )
+        except Exception as e:
+            log.error("Erro na tarefa %s: %s", id_tarefa, e)
+            await asyncio.gather(*gravacoes, return_exceptions=True)
+            await executar_em_thread(repositorio.atualizar, id_tarefa, "erro", None, str(e))
+            return await executar_em_thread(repositorio.obter, id_tarefa)
+        await asyncio.gather(*gravacoes)
+
+        # Registra a execução como as do /avaliar (reavaliação, consultas consolidadas), com todos os
+        # alunos, inclusive os avaliados antes de um reinício, cujos resultados só estão nesta tarefa
+        final = await executar_em_thread(repositorio.obter, id_tarefa)
+        for aluno, estado in final["alunos"].items():
+            espaco.origens[aluno] = estado["hashes"]
+        chave = "avaliacoes_ia" if tarefa["usar_ia_direta"] else "relatorio"
+        output = {**output, chave: {aluno: estado["resultado"] for aluno, estado in final["alunos"].items()}}
+        await executar_em_thread(
+            registrar_execucao, espaco, tarefa["enunciado"], tarefa["usar_ia_direta"], output, tarefa["turma"]
+        )
+
+    await executar_em_thread(repositorio.atualizar, id_tarefa, "concluida", output["criterios"])
+    return await executar_em_thread(repositorio.obter, id_tarefa)
+
+obter_repositorio_tarefas = compartilhado(RepositorioTarefas, "o repositório de tarefas")
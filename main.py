@@ -1,17 +1,37 @@
-from typing import List
-from fastapi import FastAPI, File, UploadFile, Form
-from fastapi.responses import JSONResponse
+from typing import List, Optional
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, File, UploadFile, Form, HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-import os, shutil, zipfile, rarfile, json
+from fastapi.concurrency import run_in_threadpool
+import os, uuid, rarfile, json, asyncio
 from datetime import datetime
-import time  # Importar o módulo time para gerenciar esperas
 
 rarfile.UNRAR_TOOL = r"C:\\Program Files\\WinRAR\\unrar.exe"
 
-from corretor.modelo_ia import gerar_criterios_com_ia, avaliar_codigo_com_criterios, pipeline_gerar_e_avaliar
-from corretor.avaliador import avaliar_entregas
+from corretor.modelo_ia import pipeline_gerar_e_avaliar, obter_criterios, obter_roteador, CotaEsgotada, limitador
+from corretor.espaco_trabalho import EspacoTrabalho
+from corretor.pipeline import avaliar_espaco, reavaliar_espaco, registrar_execucao
+from corretor.entregas import obter_repositorio_entregas, ler_entrega
+from corretor.ingestao import ErroExtracao
+from corretor.resultados import obter_repositorio_resultados
+from corretor.tarefas import obter_repositorio_tarefas, executar_tarefa
+from corretor.metricas import registro, execucao, etapa, configurar_log, log
 
-app = FastAPI()
+configurar_log()
+
+# Referências às tarefas assíncronas em execução (evita que sejam coletadas pelo GC)
+tarefas_em_execucao = set()
+
+@asynccontextmanager
+async def lifespan(app):
+    # Retoma tarefas interrompidas por um reinício; só os alunos pendentes são avaliados
+    for id_tarefa in obter_repositorio_tarefas().inacabadas():
+        log.info("Retomando tarefa %s...", id_tarefa)
+        iniciar_tarefa(id_tarefa)
+    yield
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -21,67 +41,69 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-UPLOAD_DIR = "./uploads"
 RESULT_DIR = "./results"
 
-os.makedirs(UPLOAD_DIR, exist_ok=True)
 os.makedirs(RESULT_DIR, exist_ok=True)
 
-def get_cached_or_generate_criteria(enunciado):
-    """Get criteria from cache or generate new ones"""
-    import hashlib
-    
-    # Create a unique identifier for this prompt
-    prompt_hash = hashlib.md5(enunciado.encode()).hexdigest()
-    cache_file = os.path.join(RESULT_DIR, f"criteria_cache_{prompt_hash}.txt")
-    
-    # Check if we have cached criteria
-    if os.path.exists(cache_file):
-        with open(cache_file, "r", encoding="utf-8") as f:
-            return f.read()
-    
-    # Generate new criteria
-    criterios = gerar_criterios_com_ia(enunciado)
-    
-    # Cache the result
-    with open(cache_file, "w", encoding="utf-8") as f:
-        f.write(criterios)
-    
-    return criterios
+async def carregar_uploads(espaco, arquivos):
+    """
+    Lê apenas os .cs de cada arquivo direto do upload para o espaço de trabalho, sem gravar nada em disco.
+    Os .cs ficam guardados pelo hash do arquivo compactado: um arquivo já recebido não é extraído de novo.
+    """
+    with etapa("upload"):
+        for arquivo in arquivos:
+            if not arquivo.filename:
+                continue
 
-def execute_with_rate_limit(func, *args, **kwargs):
-    """Execute a function with rate limit handling"""
-    import re
-    import time
-    
-    max_attempts = 3
-    for attempt in range(max_attempts):
-        try:
-            return func(*args, **kwargs)
-        except Exception as e:
-            error_str = str(e)
-            
-            # Check if it's a rate limit error
-            if "RateLimitReached" in error_str:
-                wait_time_match = re.search(r'wait (\d+) seconds', error_str)
-                if wait_time_match:
-                    wait_time = min(int(wait_time_match.group(1)) + 5, 60)
-                else:
-                    wait_time = 60
-                
-                print(f"Rate limit reached. Waiting {wait_time} seconds...")
-                time.sleep(wait_time)
-                
-                if attempt == max_attempts - 1:
-                    raise Exception(f"Failed after {max_attempts} attempts due to rate limits")
-            else:
-                # For other errors, don't retry
-                raise
+            nome_arquivo = str(arquivo.filename)
+            aluno_pasta = os.path.splitext(os.path.basename(nome_arquivo))[0]
+            try:
+                hash_conteudo, arquivos_cs = await run_in_threadpool(ler_entrega, arquivo.file, nome_arquivo)
+            except ErroExtracao as e:
+                # O aluno continua na resposta, sem código; o arquivo não é guardado
+                log.warning("%s", e)
+                hash_conteudo, arquivos_cs = None, {}
+            espaco.adicionar_entrega(aluno_pasta, arquivos_cs, origem=hash_conteudo)
+
+def salvar_resultado(output, id_execucao):
+    """Salva o resultado final com timestamp e id da execução (evita sobrescrita entre requisições simultâneas)"""
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    output_filename = f"resultado_avaliacao_{timestamp}_{id_execucao}.json"
+    output_path = os.path.join(RESULT_DIR, output_filename)
+
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(output, f, indent=2, ensure_ascii=False)
+
+def ler_casos(casos):
+    """Valida a lista JSON de casos de teste enviada no formulário (None se não enviada)"""
+    if not casos:
+        return None
+    try:
+        lista = json.loads(casos)
+    except json.JSONDecodeError as e:
+        raise HTTPException(status_code=400, detail=f"Casos de teste inválidos: {e}")
+    if not isinstance(lista, list) or not all(isinstance(caso, dict) for caso in lista):
+        raise HTTPException(status_code=400, detail="Casos de teste devem ser uma lista de objetos com 'entrada' e 'saida'")
+    # Casos sem saída esperada não têm o que conferir
+    return [
+        {"entrada": str(caso.get("entrada", "")), "saida": str(caso.get("saida", ""))}
+        for caso in lista if str(caso.get("saida", "")).strip()
+    ]
+
+def iniciar_tarefa(id_tarefa):
+    """Agenda a execução da tarefa em segundo plano, mantendo uma referência até ela terminar"""
+    tarefa = asyncio.create_task(executar_tarefa(obter_repositorio_tarefas(), id_tarefa))
+    tarefas_em_execucao.add(tarefa)
+    tarefa.add_done_callback(tarefas_em_execucao.discard)
 
 @app.post("/avaliar")
 async def avaliar(enunciado: str = Form(...), 
                   arquivos: List[UploadFile] = File(...), 
-                  usar_ia_direta: bool = Form(False)):
+                  usar_ia_direta: bool = Form(False),
+                  concorrencia: Optional[int] = Form(None),
+                  turma: Optional[str] = Form(None),
+                  executar_codigo: Optional[bool] = Form(None),
+                  casos: Optional[str] = Form(None)):
     """
     Endpoint principal para avaliar entregas de alunos com base em um enunciado.
     
@@ -89,162 +111,93 @@ async def avaliar(enunciado: str = Form(...),
         enunciado: Texto descritivo da atividade a ser avaliada
         arquivos: Lista de arquivos ZIP/RAR contendo os códigos dos alunos
         usar_ia_direta: Se True, usa avaliação direta por IA; se False, usa busca por palavras-chave
+        concorrencia: Número máximo de chamadas de avaliação por IA ao mesmo tempo (padrão: CORRETOR_CONCORRENCIA)
+        turma: Rótulo opcional da turma, usado nos resumos de /resultados/turmas
+        executar_codigo: Se False, não executa as entregas; não liga a execução se CORRETOR_EXECUTAR_CODIGO=0
+        casos: Lista JSON de casos de teste [{"entrada": ..., "saida": ...}] (padrão: gerados a partir do enunciado)
     """
-    # Limpa apenas o diretório de uploads, mantendo o histórico de resultados
-    shutil.rmtree(UPLOAD_DIR, ignore_errors=True)
-    os.makedirs(UPLOAD_DIR, exist_ok=True)
-    
+    casos = ler_casos(casos)
+
     # Garantir que o diretório de resultados existe, sem remover seu conteúdo
     os.makedirs(RESULT_DIR, exist_ok=True)
 
-    for arquivo in arquivos:
-        if not arquivo.filename:
-            continue
+    # Cada requisição tem seu próprio espaço de trabalho: requisições simultâneas não interferem entre si
+    # O resumo de tempos da execução inclui o upload
+    with execucao(), EspacoTrabalho() as espaco:
+        await carregar_uploads(espaco, arquivos)
+        output = await avaliar_espaco(
+            espaco, enunciado, usar_ia_direta, concorrencia, executar_codigo=executar_codigo, casos=casos
+        )
+        await run_in_threadpool(registrar_execucao, espaco, enunciado, usar_ia_direta, output, turma)
+        output = {"id_execucao": espaco.id, **output}
+
+    salvar_resultado(output, espaco.id)
+    return JSONResponse(output)
 
-        nome_arquivo = str(arquivo.filename)
-        arquivo_path = os.path.join(UPLOAD_DIR, nome_arquivo)
-        extensao = os.path.splitext(nome_arquivo)[1].lower()
-        aluno_dir = os.path.join(UPLOAD_DIR, os.path.splitext(nome_arquivo)[0])
+@app.get("/execucoes/{id_execucao}")
+async def consultar_execucao(id_execucao: str):
+    """
+    Retorna uma execução registrada: enunciado, checklist e, por aluno, os
+    hashes das entregas e o resultado.
+    """
+    anterior = await run_in_threadpool(obter_repositorio_entregas().obter_execucao, id_execucao)
+    if anterior is None:
+        raise HTTPException(status_code=404, detail="Execução não encontrada")
+    return JSONResponse(anterior)
 
-        with open(arquivo_path, "wb") as f:
-            shutil.copyfileobj(arquivo.file, f)
+@app.post("/execucoes/{id_execucao}/reavaliar")
+async def reavaliar(id_execucao: str,
+                    enunciado: Optional[str] = Form(None),
+                    criterios: Optional[str] = Form(None),
+                    arquivos: List[UploadFile] = File(None),
+                    concorrencia: Optional[int] = Form(None)):
+    """
+    Reavalia uma execução anterior com um novo enunciado e/ou checklist,
+    sem reenviar as entregas (que ficam guardadas pelo hash do arquivo).
+    Apenas o que mudou é avaliado novamente.
 
-        os.makedirs(aluno_dir, exist_ok=True)
+    Args:
+        id_execucao: Id da execução a reavaliar (retornado por /avaliar)
+        enunciado: Novo enunciado (padrão: o da execução anterior)
+        criterios: Checklist a usar (padrão: o gerado para o novo enunciado ou, se o
+            enunciado não mudou, o da execução anterior)
+        arquivos: Entregas novas ou corrigidas (opcional); substituem as do mesmo aluno
+        concorrencia: Número máximo de chamadas de avaliação por IA ao mesmo tempo (padrão: CORRETOR_CONCORRENCIA)
+    """
+    repositorio = obter_repositorio_entregas()
+    anterior = await run_in_threadpool(repositorio.obter_execucao, id_execucao)
+    if anterior is None:
+        raise HTTPException(status_code=404, detail="Execução não encontrada")
 
-        if extensao == '.zip':
-            try:
-                with zipfile.ZipFile(arquivo_path, 'r') as zip_ref:
-                    zip_ref.extractall(aluno_dir)
-            except zipfile.BadZipFile:
-                print(f"Erro ao extrair {nome_arquivo}: arquivo ZIP inválido")
-        elif extensao == '.rar':
-            try:
-                with rarfile.RarFile(arquivo_path, 'r') as rar_ref:
-                    rar_ref.extractall(aluno_dir)
-            except rarfile.BadRarFile:
-                print(f"Erro ao extrair {nome_arquivo}: arquivo RAR inválido")
-            except rarfile.RarCannotExec:
-                print(f"Erro ao extrair {nome_arquivo}: necessário instalar UnRAR")
+    enunciado = enunciado or anterior["enunciado"]
+    if not criterios:
+        if enunciado == anterior["enunciado"] and anterior["criterios"]:
+            criterios = anterior["criterios"]
         else:
-            print(f"Formato não suportado: {extensao}")
-
-    # Only generate criteria if needed
-    if usar_ia_direta:
-        # Generate criteria for AI-direct approach
-        criterios = gerar_criterios_com_ia(enunciado)
-        print("Checklist gerado com sucesso!")
-        
-        # Proceed with AI evaluation...
-    else:
-        # For keyword-based approach, either:
-        # 1. Use simpler criteria that don't need AI generation
-        criterios = """
-        ### Checklist básico
-        [ ] Item 1
-        [ ] Item 2
-        """
-        # OR 2. Generate criteria if needed for keyword extraction
-        criterios = get_cached_or_generate_criteria(enunciado)
-        
-        # Proceed with keyword-based evaluation...
-
-    if usar_ia_direta:
-        # Método de avaliação direta por IA
-        resultados = {}
-
-        # Para cada pasta de aluno
-        for aluno_pasta in os.listdir(UPLOAD_DIR):
-            aluno_path = os.path.join(UPLOAD_DIR, aluno_pasta)
-            if not os.path.isdir(aluno_path):
-                continue
+            with etapa("criterios"):
+                criterios = await run_in_threadpool(obter_criterios, enunciado)
 
-            print(f"Avaliando {aluno_pasta}...")
-            codigo_completo = ""
-            for root, _, files in os.walk(aluno_path):
-                for file in files:
-                    if file.endswith(".cs"):
-                        with open(os.path.join(root, file), encoding="utf-8", errors="ignore") as f:
-                            codigo_completo += f.read() + "\n\n"
-
-            if codigo_completo:
-                tentativas = 0
-                max_tentativas = 3
-                sucesso = False
-                
-                while not sucesso and tentativas < max_tentativas:
-                    try:
-                        avaliacao_str = avaliar_codigo_com_criterios(enunciado, criterios, codigo_completo)
-                        try:
-                            avaliacao_json = json.loads(avaliacao_str)
-                        except json.JSONDecodeError:
-                            try:
-                                cleaned_str = avaliacao_str.replace("```json", "").replace("```", "").strip()
-                                avaliacao_json = json.loads(cleaned_str)
-                            except json.JSONDecodeError as e:
-                                avaliacao_json = {
-                                    "erro": "Falha ao analisar JSON",
-                                    "mensagem": str(e),
-                                    "avaliacao_raw": avaliacao_str[:200] + "..." if len(avaliacao_str) > 200 else avaliacao_str
-                                }
-                        resultados[aluno_pasta] = {
-                            "checklist": criterios,
-                            "avaliacao": avaliacao_json
-                        }
-                        
-                        sucesso = True  # Se chegou aqui, foi bem sucedido
-                        
-                    except Exception as e:
-                        tentativas += 1
-                        erro_str = str(e)
-                        print(f"Erro ao avaliar {aluno_pasta}: {erro_str}")
-                        
-                        # Se for um erro de rate limit, esperar o tempo sugerido
-                        if "RateLimitReached" in erro_str:
-                            # Extrair o tempo de espera da mensagem (em segundos)
-                            import re
-                            wait_time_match = re.search(r'wait (\d+) seconds', erro_str)
-                            if wait_time_match:
-                                wait_time = int(wait_time_match.group(1))
-                                # Adicionar um pouco de tempo extra para segurança
-                                wait_time = min(wait_time + 5, 60)  # Limitar a 60 segundos no máximo
-                                print(f"Limite de requisições atingido. Aguardando {wait_time} segundos...")
-                                time.sleep(wait_time)
-                            else:
-                                # Se não conseguir extrair o tempo, esperar 60 segundos
-                                print("Limite de requisições atingido. Aguardando 60 segundos...")
-                                time.sleep(60)
-                        elif tentativas < max_tentativas:
-                            # Para outros erros, esperar apenas 5 segundos
-                            print(f"Tentando novamente em 5 segundos... (tentativa {tentativas} de {max_tentativas})")
-                            time.sleep(5)
-                
-                # Se não conseguiu avaliar após as tentativas, registrar o erro
-                if not sucesso:
-                    resultados[aluno_pasta] = {"erro": f"Falha após {max_tentativas} tentativas: {erro_str}"}
-            else:
-                resultados[aluno_pasta] = {"erro": "Nenhum arquivo .cs encontrado"}
-
-        # Construir o objeto de saída
-        output = {
-            "criterios": criterios,
-            "avaliacoes_ia": resultados
-        }
-    else:
-        # Método tradicional de avaliação baseado em palavras-chave
-        relatorio = avaliar_entregas(UPLOAD_DIR, criterios)
-        output = {
-            "criterios": criterios,
-            "relatorio": relatorio
-        }
-
-    # Salvar resultado final com timestamp
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    output_filename = f"resultado_avaliacao_{timestamp}.json"
-    output_path = os.path.join(RESULT_DIR, output_filename)
+    with execucao(), EspacoTrabalho() as espaco:
+        for aluno, entrada in anterior["alunos"].items():
+            arquivos_cs = {}
+            for hash_conteudo in entrada["hashes"]:
+                arquivos_cs.update(await run_in_threadpool(repositorio.obter_arquivo, hash_conteudo) or {})
+            espaco.substituir_entrega(aluno, arquivos_cs, entrada["hashes"])
 
-    with open(output_path, "w", encoding="utf-8") as f:
-        json.dump(output, f, indent=2, ensure_ascii=False)
+        # Reenvios substituem a entrega anterior do aluno, em vez de se somar a ela
+        with EspacoTrabalho(id_execucao=espaco.id) as reenvios:
+            await carregar_uploads(reenvios, arquivos or [])
+            for aluno, arquivos_cs in reenvios.entregas.items():
+                espaco.substituir_entrega(aluno, arquivos_cs, reenvios.origens[aluno])
+
+        output = await reavaliar_espaco(espaco, anterior, enunciado, criterios, concorrencia)
+        turma = await run_in_threadpool(obter_repositorio_resultados().turma_da_execucao, id_execucao)
+        await run_in_threadpool(
+            registrar_execucao, espaco, enunciado, anterior["usar_ia_direta"], output, turma, id_execucao
+        )
+        output = {"id_execucao": espaco.id, **output}
 
+    salvar_resultado(output, espaco.id)
     return JSONResponse(output)
 
 @app.post("/avaliar-ia")
@@ -264,27 +217,20 @@ async def avaliar_ia(enunciado: str = Form(...),
     
     while resultado is None and tentativas < max_tentativas:
         try:
-            resultado = pipeline_gerar_e_avaliar(enunciado, codigo)
+            resultado = await run_in_threadpool(pipeline_gerar_e_avaliar, enunciado, codigo)
+        except CotaEsgotada as e:
+            # Sem orçamento dentro da espera máxima: não adianta tentar novamente
+            print(f"Erro ao avaliar código: {e}")
+            resultado = {"erro": str(e)}
         except Exception as e:
             tentativas += 1
             erro_str = str(e)
             print(f"Erro ao avaliar código: {erro_str}")
             
-            # Se for um erro de rate limit, esperar o tempo sugerido
-            if "RateLimitReached" in erro_str:
-                import re
-                wait_time_match = re.search(r'wait (\d+) seconds', erro_str)
-                if wait_time_match:
-                    wait_time = int(wait_time_match.group(1))
-                    wait_time = min(wait_time + 5, 60)
-                    print(f"Limite de requisições atingido. Aguardando {wait_time} segundos...")
-                    time.sleep(wait_time)
-                else:
-                    print("Limite de requisições atingido. Aguardando 60 segundos...")
-                    time.sleep(60)
-            elif tentativas < max_tentativas:
+            # Rate limits já são tratados pelo limitador; para outros erros, esperar 5 segundos
+            if tentativas < max_tentativas:
                 print(f"Tentando novamente em 5 segundos... (tentativa {tentativas} de {max_tentativas})")
-                time.sleep(5)
+                await asyncio.sleep(5)
     
     # Se todas as tentativas falharem
     if resultado is None:
@@ -292,10 +238,130 @@ async def avaliar_ia(enunciado: str = Form(...),
     
     # Salvar também este resultado com timestamp
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    output_filename = f"resultado_ia_direta_{timestamp}.json"
+    output_filename = f"resultado_ia_direta_{timestamp}_{uuid.uuid4().hex[:12]}.json"
     output_path = os.path.join(RESULT_DIR, output_filename)
     
     with open(output_path, "w", encoding="utf-8") as f:
         json.dump(resultado, f, indent=2, ensure_ascii=False)
     
     return JSONResponse(resultado)
+
+@app.get("/cota")
+async def cota():
+    """
+    Retorna o orçamento restante de chamadas ao modelo padrão (por minuto e por dia)
+    e a espera estimada até a próxima chamada disponível. Em "modelos", traz a cota,
+    a latência média e a taxa de erros de cada backend das cadeias configuradas.
+    """
+    # A cota diária é lida do repositório de cotas (SQLite): fora do loop de eventos
+    orcamento = await run_in_threadpool(limitador.orcamento)
+    return JSONResponse({**orcamento, "modelos": await run_in_threadpool(obter_roteador().estado)})
+
+@app.get("/metrics")
+async def metrics():
+    """
+    Métricas do processo no formato texto do Prometheus: duração das etapas,
+    chamadas ao modelo (latência, tokens, rate limits), espera e cota restante.
+    """
+    texto = await run_in_threadpool(registro.exportar)
+    return PlainTextResponse(texto, media_type="text/plain; version=0.0.4")
+
+@app.get("/resultados/criterios")
+async def taxas_criterios(turma: Optional[str] = None, desde: Optional[float] = None, limite: int = 50):
+    """
+    Taxa de aprovação de cada critério em todas as execuções (ou nas de uma
+    turma / a partir de um timestamp), do critério que mais falha para o que menos falha.
+    """
+    return JSONResponse(await run_in_threadpool(obter_repositorio_resultados().taxas_criterios, turma, desde, limite))
+
+@app.get("/resultados/alunos/{aluno}")
+async def historico_aluno(aluno: str, limite: int = 100):
+    """
+    Histórico do aluno: nota e critérios em falha em cada execução, da mais recente para a mais antiga.
+    """
+    return JSONResponse(await run_in_threadpool(obter_repositorio_resultados().historico_aluno, aluno, limite))
+
+@app.get("/resultados/execucoes/{id_execucao}")
+async def resumo_execucao(id_execucao: str):
+    """
+    Resumo de uma execução: nota de cada aluno, média e taxa de aprovação por critério.
+    """
+    resumo = await run_in_threadpool(obter_repositorio_resultados().resumo_execucao, id_execucao)
+    if resumo is None:
+        raise HTTPException(status_code=404, detail="Execução não encontrada")
+    return JSONResponse(resumo)
+
+@app.get("/resultados/turmas/{turma}")
+async def resumo_turma(turma: str):
+    """
+    Resumo de uma turma: média de cada execução e taxa de aprovação por critério em todas elas.
+    """
+    resumo = await run_in_threadpool(obter_repositorio_resultados().resumo_turma, turma)
+    if resumo is None:
+        raise HTTPException(status_code=404, detail="Turma não encontrada")
+    return JSONResponse(resumo)
+
+@app.post("/jobs", status_code=202)
+async def criar_job(enunciado: str = Form(...), 
+                    arquivos: List[UploadFile] = File(...), 
+                    usar_ia_direta: bool = Form(False),
+                    concorrencia: Optional[int] = Form(None),
+                    turma: Optional[str] = Form(None),
+                    executar_codigo: Optional[bool] = Form(None),
+                    casos: Optional[str] = Form(None)):
+    """
+    Cria uma tarefa de avaliação assíncrona e retorna seu id imediatamente.
+    Recebe os mesmos parâmetros de /avaliar; o progresso pode ser acompanhado
+    em GET /jobs/{id} ou GET /jobs/{id}/stream.
+    """
+    casos = ler_casos(casos)
+    with EspacoTrabalho() as espaco:
+        await carregar_uploads(espaco, arquivos)
+        total_alunos = len(espaco.entregas)
+        await run_in_threadpool(
+            obter_repositorio_tarefas().criar,
+            espaco.id, enunciado, usar_ia_direta, concorrencia, espaco.entregas_ordenadas(),
+            turma, executar_codigo, casos, espaco.origens
+        )
+
+    iniciar_tarefa(espaco.id)
+    return JSONResponse({"id": espaco.id, "status": "pendente", "alunos": total_alunos}, status_code=202)
+
+@app.get("/jobs/{id_tarefa}")
+async def consultar_job(id_tarefa: str):
+    """
+    Retorna o status da tarefa, o progresso e o resultado parcial de cada aluno.
+    """
+    tarefa = await run_in_threadpool(obter_repositorio_tarefas().obter, id_tarefa)
+    if tarefa is None:
+        raise HTTPException(status_code=404, detail="Tarefa não encontrada")
+    return JSONResponse(tarefa)
+
+@app.get("/jobs/{id_tarefa}/stream")
+async def acompanhar_job(id_tarefa: str):
+    """
+    Transmite em NDJSON o resultado de cada aluno assim que ele é concluído.
+    A última linha traz o status final da tarefa.
+    """
+    repositorio = obter_repositorio_tarefas()
+    if await run_in_threadpool(repositorio.status, id_tarefa) is None:
+        raise HTTPException(status_code=404, detail="Tarefa não encontrada")
+
+    async def eventos():
+        enviados = set()
+        desde = 0.0
+        while True:
+            # Lê o status antes dos resultados: se já terminou, esta é a última leitura
+            status = await run_in_threadpool(repositorio.status, id_tarefa)
+            for aluno, resultado, concluido_em in await run_in_threadpool(repositorio.resultados_desde, id_tarefa, desde):
+                desde = concluido_em
+                if aluno in enviados:
+                    continue
+                enviados.add(aluno)
+                yield json.dumps({"aluno": aluno, "resultado": resultado}, ensure_ascii=False) + "\n"
+            if status not in ("pendente", "executando"):
+                yield json.dumps({"status": status}) + "\n"
+                return
+            await asyncio.sleep(0.5)
+
+    return StreamingResponse(eventos(), media_type="application/x-ndjson")